@@ -2,13 +2,29 @@ from enum import auto
 import streamlit as st
 import requests
 import folium
-from streamlit_folium import st_folium
+from folium.elements import JSCSSMixin
+from folium.map import Layer
+from folium.plugins import MarkerCluster
+from folium.template import Template
 from streamlit_autorefresh import st_autorefresh
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import json
 import os
+import re
+import gzip
+import time
+import uuid
+import pickle
+import inspect
+import hashlib
+import threading
+import functools
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_futures
 
 import ee
 from google.oauth2 import service_account
@@ -24,6 +40,1040 @@ st.set_page_config(
 )
 st_autorefresh(interval=300000)
 
+# ==================== Performance Instrumentation ====================
+
+# Dashboard section the current rerun is in and the log of this rerun's
+# upstream calls; pool threads inherit both via contextvars.copy_context
+current_section = contextvars.ContextVar('current_section', default='setup')
+current_run_log = contextvars.ContextVar('current_run_log', default=None)
+cache_computed = contextvars.ContextVar('cache_computed', default=None)
+
+# Open the debug panel with ?debug=1 or DASHBOARD_DEBUG=1; set
+# DASHBOARD_METRICS_TEXTFILE to export metrics for a Prometheus textfile collector
+DEBUG_PANEL_ENABLED = st.query_params.get('debug') == '1' or os.environ.get('DASHBOARD_DEBUG') == '1'
+METRICS_TEXTFILE = os.environ.get('DASHBOARD_METRICS_TEXTFILE')
+
+UPSTREAM_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_DESCRIPTIONS = {
+    'delhi_heat_reruns_total': ('counter', 'Completed dashboard reruns'),
+    'delhi_heat_section_seconds_total': ('counter', 'Wall time spent in each dashboard section'),
+    'delhi_heat_upstream_requests_total': ('counter', 'Earth Engine and HTTP round-trips'),
+    'delhi_heat_upstream_seconds_total': ('counter', 'Time spent waiting on upstream round-trips'),
+    'delhi_heat_upstream_bytes_total': ('counter', 'Upstream response payload bytes'),
+    'delhi_heat_upstream_duration_seconds': ('histogram', 'Upstream round-trip duration'),
+    'delhi_heat_cache_requests_total': ('counter', 'Cached function calls by result'),
+    'delhi_heat_cache_seconds_total': ('counter', 'Time spent in cached function calls by result'),
+}
+
+# Process-wide counters shared by every session, rendered as Prometheus text
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name and labels"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+    
+    def inc(self, name, labels, value=1.0):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+    
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            buckets, total, count = self.histograms.get(key, ((0,) * len(UPSTREAM_DURATION_BUCKETS), 0.0, 0))
+            buckets = tuple(n + (value <= bound) for n, bound in zip(buckets, UPSTREAM_DURATION_BUCKETS))
+            self.histograms[key] = (buckets, total + value, count + 1)
+    
+    def to_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        # Backslash, double quote and newline are escaped in label values, as the format requires
+        def escape(value):
+            return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        
+        def fmt(labels):
+            if not labels:
+                return ''
+            pairs = (f'{k}="{escape(str(v))}"' for k, v in labels)
+            return '{' + ','.join(pairs) + '}'
+        
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+        
+        lines = []
+        for name, (metric_type, description) in METRIC_DESCRIPTIONS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (metric, labels), value in counters:
+                if metric == name:
+                    lines.append(f"{name}{fmt(labels)} {value:g}")
+            for (metric, labels), (buckets, total, count) in histograms:
+                if metric != name:
+                    continue
+                for bound, n in zip(UPSTREAM_DURATION_BUCKETS, buckets):
+                    lines.append(f"{name}_bucket{fmt(labels + (('le', f'{bound:g}'),))} {n}")
+                lines.append(f"{name}_bucket{fmt(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{fmt(labels)} {total:g}")
+                lines.append(f"{name}_count{fmt(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+@st.cache_resource
+def get_metrics_registry():
+    """Metrics registry shared across sessions for the life of the process"""
+    return MetricsRegistry()
+
+metrics = get_metrics_registry()
+
+# Start this rerun's log; each entry is one upstream call, cache lookup or section
+run_log = {'calls': [], 'sections': [], 'section_started': time.perf_counter()}
+current_run_log.set(run_log)
+current_section.set('setup')
+
+# Function to close the current section's timer and open the next one
+def start_section(name):
+    """Attribute following work to the named dashboard section"""
+    now = time.perf_counter()
+    previous = current_section.get()
+    elapsed = now - run_log['section_started']
+    run_log['sections'].append({'section': previous, 'seconds': elapsed})
+    metrics.inc('delhi_heat_section_seconds_total', {'section': previous}, elapsed)
+    run_log['section_started'] = now
+    current_section.set(name)
+
+# Function to record one upstream round-trip
+def record_upstream(service, operation, seconds, payload_bytes, outcome):
+    section = current_section.get()
+    labels = {'section': section, 'service': service, 'operation': operation}
+    metrics.inc('delhi_heat_upstream_requests_total', {**labels, 'outcome': outcome})
+    metrics.inc('delhi_heat_upstream_seconds_total', labels, seconds)
+    metrics.inc('delhi_heat_upstream_bytes_total', labels, payload_bytes)
+    metrics.observe('delhi_heat_upstream_duration_seconds', {'service': service, 'operation': operation}, seconds)
+    log = current_run_log.get()
+    if log is not None:
+        log['calls'].append({
+            'Section': section, 'Kind': service, 'Name': operation, 'Result': outcome,
+            'Seconds': seconds, 'Bytes': payload_bytes
+        })
+
+# ==================== Shared Cache ====================
+
+# Results shared by every replica behind the load balancer. Set
+# DASHBOARD_SHARED_CACHE to a redis:// URL, or to "local" for an in-process
+# stand-in with the same interface; unset, each process only uses st.cache_data.
+# Values are pickled, so the Redis instance must only be reachable by replicas.
+SHARED_CACHE_URL = os.environ.get('DASHBOARD_SHARED_CACHE', '')
+SHARED_CACHE_PREFIX = os.environ.get('DASHBOARD_SHARED_CACHE_PREFIX', 'delhi-heat:')
+SHARED_CACHE_FILL_TIMEOUT = 120
+EE_RESULT_TTL = 3600
+TILE_URL_TTL = 3600
+WEATHER_SNAPSHOT_TTL = 300
+
+METRIC_DESCRIPTIONS['delhi_heat_shared_cache_requests_total'] = (
+    'counter', 'Shared cache lookups by result (hit, fill, wait_hit, timeout, error)'
+)
+
+# Lock handed out by LocalRedis.lock, mirroring redis-py's Lock
+class LocalRedisLock:
+    """Expiring lock owned by a random token"""
+    
+    def __init__(self, client, name, timeout):
+        self.client = client
+        self.name = name
+        self.timeout = timeout
+        self.token = None
+    
+    def acquire(self, blocking=True, blocking_timeout=None):
+        token = uuid.uuid4().hex
+        deadline = None if blocking_timeout is None else time.monotonic() + blocking_timeout
+        while True:
+            if self.client.set(self.name, token, nx=True, px=int(self.timeout * 1000) if self.timeout else None):
+                self.token = token
+                return True
+            if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                return False
+            time.sleep(0.05)
+    
+    def release(self):
+        with self.client.lock_:
+            entry = self.client.data.get(self.name)
+            if entry is None or entry[0] != self.token:
+                raise RuntimeError(f"Lock {self.name} is no longer owned")
+            del self.client.data[self.name]
+        self.token = None
+
+# In-process stand-in for the subset of the Redis client the shared cache uses
+class LocalRedis:
+    """Thread-safe dict with Redis get/set/delete/lock semantics and expiry"""
+    
+    def __init__(self):
+        self.lock_ = threading.Lock()
+        self.data = {}
+    
+    def _live(self, name):
+        entry = self.data.get(name)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[name]
+            return None
+        return entry
+    
+    def get(self, name):
+        with self.lock_:
+            entry = self._live(name)
+            return None if entry is None else entry[0]
+    
+    def set(self, name, value, ex=None, px=None, nx=False):
+        expires = time.monotonic() + (px / 1000 if px else ex) if (px or ex) else None
+        with self.lock_:
+            if nx and self._live(name) is not None:
+                return None
+            self.data[name] = (value, expires)
+            return True
+    
+    def delete(self, *names):
+        with self.lock_:
+            return sum(self.data.pop(name, None) is not None for name in names)
+    
+    def lock(self, name, timeout=None):
+        return LocalRedisLock(self, name, timeout)
+
+# Read-through cache on a Redis-compatible client; one replica fills a missing
+# entry under a lock while the others wait for its result
+class SharedCache:
+    """Cross-process result cache with single-flight fills"""
+    
+    def __init__(self, client, prefix):
+        self.client = client
+        self.prefix = prefix
+    
+    # Values are stored wrapped in a 1-tuple, so a cached None is told apart from a
+    # miss; anything else, such as an entry from an older release, is a miss
+    def _load(self, name):
+        raw = self.client.get(name)
+        if raw is None:
+            return None
+        entry = pickle.loads(raw)
+        return entry if isinstance(entry, tuple) and len(entry) == 1 else None
+    
+    def get_or_fill(self, namespace, key, ttl, compute):
+        name = f"{self.prefix}{namespace}:{key}"
+        labels = {'cache': namespace}
+        try:
+            cached = self._load(name)
+        except Exception:
+            metrics.inc('delhi_heat_shared_cache_requests_total', {**labels, 'result': 'error'})
+            return compute()
+        if cached is not None:
+            metrics.inc('delhi_heat_shared_cache_requests_total', {**labels, 'result': 'hit'})
+            return cached[0]
+        
+        lock = self.client.lock(f"{name}:lock", timeout=SHARED_CACHE_FILL_TIMEOUT)
+        deadline = time.monotonic() + SHARED_CACHE_FILL_TIMEOUT
+        while True:
+            try:
+                acquired = lock.acquire(blocking=False)
+            except Exception:
+                metrics.inc('delhi_heat_shared_cache_requests_total', {**labels, 'result': 'error'})
+                return compute()
+            if acquired:
+                try:
+                    # Another replica may have filled it between our read and the lock
+                    cached = self._load(name)
+                    if cached is not None:
+                        metrics.inc('delhi_heat_shared_cache_requests_total', {**labels, 'result': 'wait_hit'})
+                        return cached[0]
+                    value = compute()
+                    self.client.set(name, pickle.dumps((value,)), px=int(ttl * 1000))
+                    metrics.inc('delhi_heat_shared_cache_requests_total', {**labels, 'result': 'fill'})
+                    return value
+                finally:
+                    try:
+                        lock.release()
+                    except Exception:
+                        pass
+            time.sleep(0.1)
+            cached = self._load(name)
+            if cached is not None:
+                metrics.inc('delhi_heat_shared_cache_requests_total', {**labels, 'result': 'wait_hit'})
+                return cached[0]
+            if time.monotonic() >= deadline:
+                metrics.inc('delhi_heat_shared_cache_requests_total', {**labels, 'result': 'timeout'})
+                return compute()
+
+@st.cache_resource
+def get_shared_cache(url, prefix):
+    """Shared cache client for this process, or None when not configured"""
+    if not url:
+        return None
+    if url == 'local':
+        return SharedCache(LocalRedis(), prefix)
+    try:
+        import redis
+        return SharedCache(redis.Redis.from_url(url), prefix)
+    except ImportError:
+        st.warning("⚠️ DASHBOARD_SHARED_CACHE is set but the redis package is not installed; using per-process caches only")
+        return None
+
+shared_cache = get_shared_cache(SHARED_CACHE_URL, SHARED_CACHE_PREFIX)
+
+# Function to build a stable shared cache key from arguments
+def shared_cache_key(*values):
+    digest = hashlib.sha256()
+    for value in values:
+        if isinstance(value, pd.DataFrame):
+            digest.update(json.dumps(list(map(str, value.columns))).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        else:
+            digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+        digest.update(b'|')
+    return digest.hexdigest()[:32]
+
+# Decorator sharing a function's results across replicas; arguments starting
+# with an underscore are left out of the key, as with st.cache_data
+def shared_cached(namespace, ttl):
+    def decorate(func):
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            if shared_cache is None:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = shared_cache_key(*(v for k, v in bound.arguments.items() if not k.startswith('_')))
+            return shared_cache.get_or_fill(namespace, key, ttl, lambda: func(*args, **kwargs))
+        return call
+    return decorate
+
+# ==================== Record / Replay ====================
+
+# DASHBOARD_CASSETTE_MODE=record saves every upstream response to the cassette;
+# =replay serves them back without network access or credentials, optionally
+# sleeping for the recorded latency when DASHBOARD_CASSETTE_LATENCY=1
+CASSETTE_MODE = os.environ.get('DASHBOARD_CASSETTE_MODE', '').lower()
+CASSETTE_PATH = os.environ.get('DASHBOARD_CASSETTE', 'cassettes/dashboard.json.gz')
+CASSETTE_REPLAY_LATENCY = os.environ.get('DASHBOARD_CASSETTE_LATENCY') == '1'
+
+if CASSETTE_MODE not in ('', 'record', 'replay'):
+    st.error(f"❌ Unknown DASHBOARD_CASSETTE_MODE '{CASSETTE_MODE}', expected 'record' or 'replay'")
+    st.stop()
+
+# Upstream responses keyed by request fingerprint, stored as gzipped JSON
+class Cassette:
+    """Recorded EE and weather responses for deterministic offline reruns"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.algorithms = None
+        self.dirty = False
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                stored = json.load(f)
+            self.entries = stored.get('entries', {})
+            self.algorithms = stored.get('algorithms')
+    
+    @staticmethod
+    def fingerprint(service, operation, request_key):
+        return hashlib.sha256(f"{service}|{operation}|{request_key}".encode()).hexdigest()[:24]
+    
+    def record(self, key, service, operation, response, latency):
+        with self.lock:
+            self.entries[key] = {
+                'service': service, 'operation': operation,
+                'latency': round(latency, 4), 'response': response
+            }
+            self.dirty = True
+    
+    def record_algorithms(self, algorithms):
+        with self.lock:
+            self.algorithms = algorithms
+            self.dirty = True
+    
+    def replay(self, key, operation):
+        entry = self.entries.get(key)
+        if entry is None:
+            raise KeyError(f"No recorded response for {operation} ({key}); record the cassette again")
+        if CASSETTE_REPLAY_LATENCY:
+            time.sleep(entry['latency'])
+        return entry['response']
+    
+    def replay_algorithms(self):
+        if self.algorithms is None:
+            raise KeyError("Cassette has no Earth Engine algorithm catalogue; record it first")
+        return self.algorithms
+    
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = {'version': 1, 'algorithms': self.algorithms, 'entries': self.entries}
+            self.dirty = False
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+@st.cache_resource
+def get_cassette(path):
+    """Cassette shared by all sessions in this process"""
+    return Cassette(path)
+
+cassette = get_cassette(CASSETTE_PATH) if CASSETTE_MODE else None
+
+# Function to size an upstream response: arrays by their buffer, decoded
+# JSON by its encoded length
+def payload_size(response):
+    """Response payload size in bytes"""
+    if isinstance(response, np.ndarray):
+        return response.nbytes
+    return len(json.dumps(response, default=str))
+
+# Function to make one instrumented upstream round-trip, recording or replaying
+# it when a cassette is active
+def upstream_call(service, operation, request_key, fetch):
+    """Run fetch() and record duration, payload size and outcome"""
+    key = Cassette.fingerprint(service, operation, request_key) if cassette else None
+    started = time.perf_counter()
+    if CASSETTE_MODE == 'replay':
+        try:
+            response = cassette.replay(key, operation)
+        except KeyError:
+            record_upstream(service, operation, time.perf_counter() - started, 0, 'replay_miss')
+            raise
+        record_upstream(service, operation, time.perf_counter() - started, payload_size(response), 'replay')
+        return response
+    
+    try:
+        response = fetch()
+    except Exception:
+        record_upstream(service, operation, time.perf_counter() - started, 0, 'error')
+        raise
+    elapsed = time.perf_counter() - started
+    record_upstream(service, operation, elapsed, payload_size(response), 'ok')
+    if CASSETTE_MODE == 'record':
+        cassette.record(key, service, operation,
+                        response.tolist() if isinstance(response, np.ndarray) else response, elapsed)
+    return response
+
+# Function to run an Earth Engine getInfo() round-trip
+def ee_get_info(ee_object, operation):
+    """Evaluate an EE object on the server"""
+    request_key = ee_object.serialize()
+    fetch = lambda: upstream_call('ee', operation, request_key, ee_object.getInfo)
+    if shared_cache is None:
+        return fetch()
+    return shared_cache.get_or_fill('ee_result', shared_cache_key(request_key), EE_RESULT_TTL, fetch)
+
+# Function to evaluate one band of an Earth Engine image on a pixel grid
+def ee_compute_pixels(ee_image, band, grid, operation):
+    """Band values on the grid as a 2D array"""
+    request_key = ee_image.serialize() + json.dumps(grid, sort_keys=True)
+    fetch = lambda: upstream_call('ee', operation, request_key, lambda: np.asarray(ee.data.computePixels({
+        'expression': ee_image,
+        'fileFormat': 'NUMPY_NDARRAY',
+        'bandIds': [band],
+        'grid': grid,
+    })[band], dtype=np.float64))
+    if shared_cache is None:
+        return np.array(fetch(), dtype=np.float64)
+    return np.array(shared_cache.get_or_fill('ee_pixels', shared_cache_key(request_key), EE_RESULT_TTL, fetch), dtype=np.float64)
+
+# Function to fetch the tile URL template for an Earth Engine image
+def ee_get_tile_url(ee_image, vis_params):
+    """Request map tiles for an EE image and return the URL template"""
+    request_key = ee_image.serialize() + json.dumps(vis_params, sort_keys=True, default=str)
+    fetch = lambda: upstream_call(
+        'ee', 'getMapId', request_key,
+        lambda: ee_image.getMapId(vis_params)['tile_fetcher'].url_format
+    )
+    if shared_cache is None:
+        return fetch()
+    return shared_cache.get_or_fill('tile_url', shared_cache_key(request_key), TILE_URL_TTL, fetch)
+
+# Function to GET a JSON document; API keys are left out of the fingerprint
+def http_get_json(http, url, operation, timeout=10):
+    """GET a URL and decode the JSON response"""
+    return upstream_call(
+        'http', operation, re.sub(r'(appid|key)=[^&]*', r'\1=', url),
+        lambda: http.get(url, timeout=timeout).json()
+    )
+
+# Decorator combining st.cache_data with hit/miss accounting; the wrapped
+# function only runs on a miss, which is how misses are detected
+def instrumented_cache(cache_name, **cache_kwargs):
+    def decorate(func):
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            cache_computed.set(True)
+            return func(*args, **kwargs)
+        
+        cached = st.cache_data(**cache_kwargs)(compute)
+        
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            token = cache_computed.set(False)
+            started = time.perf_counter()
+            try:
+                return cached(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                result = 'miss' if cache_computed.get() else 'hit'
+                cache_computed.reset(token)
+                labels = {'section': current_section.get(), 'cache': cache_name, 'result': result}
+                metrics.inc('delhi_heat_cache_requests_total', labels)
+                metrics.inc('delhi_heat_cache_seconds_total', labels, elapsed)
+                log = current_run_log.get()
+                if log is not None:
+                    log['calls'].append({
+                        'Section': labels['section'], 'Kind': 'cache', 'Name': cache_name, 'Result': result,
+                        'Seconds': elapsed, 'Bytes': 0
+                    })
+        
+        call.clear = cached.clear
+        call.uncached = func
+        return call
+    return decorate
+
+# Function to close out the rerun's metrics and export them
+def finish_run():
+    start_section('done')
+    metrics.inc('delhi_heat_reruns_total', {})
+    if CASSETTE_MODE == 'record':
+        try:
+            cassette.save()
+        except OSError as e:
+            st.warning(f"⚠️ Could not save cassette to {CASSETTE_PATH}: {e}")
+    if METRICS_TEXTFILE:
+        try:
+            tmp_path = f"{METRICS_TEXTFILE}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(metrics.to_prometheus())
+            os.replace(tmp_path, METRICS_TEXTFILE)
+        except OSError as e:
+            st.warning(f"⚠️ Could not write metrics to {METRICS_TEXTFILE}: {e}")
+
+# Function to show this rerun's timings and upstream calls
+def render_debug_panel():
+    with st.expander("🛠️ Performance Debug", expanded=True):
+        df_sections = pd.DataFrame(run_log['sections']).groupby('section', sort=False)['seconds'].sum()
+        df_calls = pd.DataFrame(run_log['calls'], columns=['Section', 'Kind', 'Name', 'Result', 'Seconds', 'Bytes'])
+        
+        summary = pd.DataFrame({'Wall (s)': df_sections})
+        upstream = df_calls[df_calls['Kind'] != 'cache']
+        caches = df_calls[df_calls['Kind'] == 'cache']
+        for kind, label in (('ee', 'EE'), ('http', 'HTTP')):
+            calls = upstream[upstream['Kind'] == kind].groupby('Section')
+            summary[f'{label} calls'] = calls.size()
+            summary[f'{label} (s)'] = calls['Seconds'].sum()
+        summary['Payload (kB)'] = upstream.groupby('Section')['Bytes'].sum() / 1024
+        summary['Cache hits'] = caches[caches['Result'] == 'hit'].groupby('Section').size()
+        summary['Cache misses'] = caches[caches['Result'] == 'miss'].groupby('Section').size()
+        summary = summary.fillna(0).round(3)
+        
+        st.metric("Rerun Time", f"{summary['Wall (s)'].sum():.2f} s")
+        st.dataframe(summary, width='stretch')
+        st.dataframe(df_calls.round({'Seconds': 3}), width='stretch', hide_index=True)
+        if precompute.enabled:
+            st.dataframe(pd.DataFrame(precompute.status()), width='stretch', hide_index=True)
+        st.download_button(
+            "Download Prometheus metrics",
+            data=metrics.to_prometheus(),
+            file_name="delhi_heat_metrics.prom",
+            mime="text/plain"
+        )
+
+# ==================== Deadlines & Cancellation ====================
+
+# Long upstream calls run on a shared pool while the script thread polls them.
+# Each poll updates a status line, which is where Streamlit interrupts a rerun
+# superseded by a widget change, so the new rerun starts immediately.
+EE_CALL_DEADLINE_SECONDS = float(os.environ.get('DASHBOARD_EE_DEADLINE', 60))
+EE_CALL_POLL_SECONDS = 0.25
+EE_CALL_RETENTION_SECONDS = 600
+
+# Placeholder for results of awaited calls that have not finished yet
+UPSTREAM_PENDING = object()
+
+METRIC_DESCRIPTIONS['delhi_heat_upstream_abandoned_total'] = (
+    'counter', 'Awaited upstream calls left unfinished by deadline or superseded rerun'
+)
+
+# Raised when awaited upstream work misses its deadline; the work keeps running
+class UpstreamDeadlineExceeded(TimeoutError):
+    """Upstream call did not finish within its deadline"""
+
+# Raised with whatever finished when only part of a split request is ready
+class PartialResult(Exception):
+    """Some pieces of a split upstream request finished before the deadline"""
+    
+    def __init__(self, value, done, total):
+        super().__init__(f"{done} of {total} parts finished")
+        self.value = value
+        self.done = done
+        self.total = total
+
+# In-flight and recent upstream calls keyed by request, shared by all sessions
+class UpstreamCallRegistry:
+    """Deduplicates awaited calls and cancels queued ones nobody waits for"""
+    
+    def __init__(self, max_workers=8):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upstream')
+        self.lock = threading.Lock()
+        self.calls = {}
+    
+    def acquire(self, key, compute, pinned=False, fresh=False):
+        """Future for key, attaching to a running or recent call when there is one
+        
+        A pinned call is background work nobody waits on; it is never cancelled.
+        A fresh call attaches only to one still running, never to a finished one.
+        """
+        now = time.monotonic()
+        with self.lock:
+            for stale_key in [k for k, c in self.calls.items()
+                              if c['finished'] and now - c['finished'] > EE_CALL_RETENTION_SECONDS]:
+                del self.calls[stale_key]
+            call = self.calls.get(key)
+            if call is None or call['future'].cancelled() or (call['future'].done() and (fresh or call['future'].exception())):
+                future = self.pool.submit(contextvars.copy_context().run, compute)
+                call = {'future': future, 'waiters': 0, 'finished': None, 'pinned': False}
+                self.calls[key] = call
+                future.add_done_callback(lambda f, call=call: call.update(finished=time.monotonic()))
+            if pinned:
+                call['pinned'] = True
+            else:
+                call['waiters'] += 1
+            return call['future']
+    
+    def running(self, key):
+        """Whether a call for key is queued or in progress"""
+        with self.lock:
+            call = self.calls.get(key)
+            return call is not None and not call['future'].done()
+    
+    def release(self, key, future):
+        """Drop a waiter; a call still queued with no waiters left is cancelled"""
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None or call['future'] is not future:
+                return
+            call['waiters'] -= 1
+            if call['waiters'] <= 0 and not future.done() and not call['pinned']:
+                metrics.inc('delhi_heat_upstream_abandoned_total', {'section': current_section.get()})
+                if future.cancel():
+                    del self.calls[key]
+
+@st.cache_resource(on_release=lambda registry: registry.pool.shutdown(wait=False, cancel_futures=True))
+def get_upstream_registry():
+    """Upstream call registry shared by all sessions in this process"""
+    return UpstreamCallRegistry()
+
+upstream_calls = get_upstream_registry()
+
+# Function to wait for several upstream calls without blocking reruns
+def await_upstream_many(label, requests_by_key, deadline=EE_CALL_DEADLINE_SECONDS):
+    """Await (key, compute) pairs; returns results in order, UPSTREAM_PENDING where unfinished"""
+    calls = []
+    for key, compute in requests_by_key:
+        fingerprint = shared_cache_key(*key)
+        calls.append((fingerprint, upstream_calls.acquire(fingerprint, compute)))
+    status = st.empty()
+    started = time.monotonic()
+    try:
+        while True:
+            pending = [future for _, future in calls if not future.done()]
+            elapsed = time.monotonic() - started
+            if not pending or elapsed >= deadline:
+                break
+            wait_futures(pending, timeout=EE_CALL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            if elapsed >= 1:
+                progress = f" ({len(calls) - len(pending)}/{len(calls)})" if len(calls) > 1 else ""
+                status.caption(f"⏳ {label}{progress}… {elapsed:.0f}s")
+            else:
+                status.empty()
+    finally:
+        for fingerprint, future in calls:
+            upstream_calls.release(fingerprint, future)
+    status.empty()
+    
+    return [future.result() if future.done() and not future.cancelled() else UPSTREAM_PENDING
+            for _, future in calls]
+
+# Function to wait for one upstream call without blocking reruns
+def await_upstream(label, key, compute, deadline=EE_CALL_DEADLINE_SECONDS):
+    """Run compute on the shared pool and wait for it cooperatively"""
+    result, = await_upstream_many(label, [(key, compute)], deadline)
+    if result is UPSTREAM_PENDING:
+        raise UpstreamDeadlineExceeded(f"{label} did not finish within {deadline:.0f}s")
+    return result
+
+# ==================== Tiled Reductions ====================
+
+# Region-wide statistics are reduced tile by tile on a shared pool, so no single
+# request comes near Earth Engine's pixel or time limits however large the
+# region or fine the scale. Tiles are cut along the pixel grid of the requested
+# scale and reduced unweighted, so each pixel is counted by exactly one tile and
+# the merged result equals one whole-region reduction on the same grid.
+REDUCTION_MAX_PIXELS_PER_TILE = int(os.environ.get('DASHBOARD_TILE_PIXELS', 4000000))
+METERS_PER_DEGREE = 111320.0
+
+# Mergeable reducers: each tile's partial result combines exactly with the others
+TILED_REDUCERS = {
+    'min_max': lambda: ee.Reducer.minMax(),
+    'mean': lambda: ee.Reducer.sum().combine(ee.Reducer.count(), sharedInputs=True).unweighted(),
+    'histogram': lambda: ee.Reducer.frequencyHistogram().unweighted(),
+}
+
+@st.cache_resource(on_release=lambda pool: pool.shutdown(wait=False, cancel_futures=True))
+def get_reduction_pool():
+    """Thread pool for tile reductions shared by all sessions in this process"""
+    return ThreadPoolExecutor(max_workers=16, thread_name_prefix='reduce')
+
+reduction_pool = get_reduction_pool()
+
+# Function to split a lon/lat outline into pixel-aligned tiles
+def reduction_tiles(region_shape, step, max_pixels=REDUCTION_MAX_PIXELS_PER_TILE):
+    """(bounds, crsTransform) for each tile of a grid with step-degree pixels that touches the region"""
+    from shapely.geometry import box
+    
+    min_x, min_y, max_x, max_y = region_shape.bounds
+    origin_x, origin_y = float(np.floor(min_x / step) * step), float(np.ceil(max_y / step) * step)
+    width, height = int(np.ceil((max_x - origin_x) / step)), int(np.ceil((origin_y - min_y) / step))
+    side = max(int(np.sqrt(max_pixels)), 1)
+    transform = [step, 0, origin_x, 0, -step, origin_y]
+    
+    tiles = []
+    for col in range(0, width, side):
+        for row in range(0, height, side):
+            bounds = (origin_x + col * step, origin_y - min(row + side, height) * step,
+                      origin_x + min(col + side, width) * step, origin_y - row * step)
+            if region_shape.intersects(box(*bounds)):
+                tiles.append((bounds, transform))
+    return tiles
+
+# Function to combine per-tile reducer outputs into the whole-region result
+def merge_tile_stats(kind, parts):
+    """Merge partial min/max, sum/count or histogram dictionaries"""
+    merged = {}
+    for part in parts:
+        for name, value in (part or {}).items():
+            previous = merged.get(name)
+            if value is None or previous is None:
+                merged[name] = previous if value is None else value
+            elif kind == 'histogram':
+                merged[name] = {k: previous.get(k, 0) + value.get(k, 0) for k in set(previous) | set(value)}
+            elif kind == 'min_max':
+                merged[name] = min(previous, value) if name.endswith('_min') else max(previous, value)
+            else:
+                merged[name] = previous + value
+    
+    if kind == 'mean':
+        # Report the mean with the pixel count it was taken over
+        for name in [n[:-len('_sum')] for n in merged if n.endswith('_sum')]:
+            total, count = merged.pop(f'{name}_sum'), merged.get(f'{name}_count')
+            merged[f'{name}_mean'] = total / count if total is not None and count else None
+    return merged
+
+# Function to reduce an image over a region in parallel tiles
+def tiled_reduce_region(image, kind, geometry, region_shape, scale, operation, pixel_degrees=None):
+    """Region statistics for kind ('min_max', 'mean' or 'histogram') merged across tiles
+    
+    The grid has pixel_degrees pixels when given, so it can follow a product's
+    own grid; otherwise its pixels are scale metres at the equator.
+    """
+    reducer = TILED_REDUCERS[kind]()
+    image = ee.Image(image).clip(geometry)
+    
+    def reduce_tile(bounds, transform):
+        return ee_get_info(image.reduceRegion(
+            reducer=reducer,
+            geometry=ee.Geometry.Rectangle(list(bounds), 'EPSG:4326', False),
+            crs='EPSG:4326',
+            crsTransform=transform,
+            maxPixels=1e9
+        ), operation)
+    
+    futures = [reduction_pool.submit(contextvars.copy_context().run, reduce_tile, bounds, transform)
+               for bounds, transform in reduction_tiles(region_shape, pixel_degrees or scale / METERS_PER_DEGREE)]
+    return merge_tile_stats(kind, [future.result() for future in futures])
+
+# ==================== Background Precompute ====================
+
+# Default views most visitors see; a background worker keeps their results
+# fresh so page loads with these inputs never wait on Earth Engine or OpenWeather
+MODIS_DEFAULT_START = datetime(2025, 12, 31).date()
+MODIS_DEFAULT_END = datetime(2026, 1, 30).date()
+CORR_DEFAULT_START = datetime(2025, 12, 31).date()
+CORR_DEFAULT_END = datetime(2026, 1, 30).date()
+TIMESERIES_DEFAULT_DAYS = 60
+
+PRECOMPUTE_ENABLED = os.environ.get('DASHBOARD_PRECOMPUTE', '1') != '0'
+DEFAULT_VIEW_REFRESH_SECONDS = 1800
+WEATHER_REFRESH_SECONDS = 240
+PRECOMPUTE_IDLE_EXPIRY_SECONDS = 86400
+PRECOMPUTE_RETRY_SECONDS = 60
+
+METRIC_DESCRIPTIONS['delhi_heat_precompute_runs_total'] = (
+    'counter', 'Background refreshes of default-view results by outcome'
+)
+
+# Scheduler thread owned by the server process rather than any browser session
+class PrecomputeWorker:
+    """Refreshes registered default-view results on a schedule"""
+    
+    def __init__(self, enabled=True, max_workers=4):
+        self.enabled = enabled
+        self.lock = threading.Condition()
+        self.jobs = {}
+        self.stopped = False
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='precompute')
+        if enabled:
+            threading.Thread(target=self.run, name='precompute-scheduler', daemon=True).start()
+    
+    def get(self, name, key_args, compute, interval, run_inline=None):
+        """Latest result for a default view, computing it inline only the first time
+        
+        Later calls return the stored result straight away while the worker
+        refreshes it every interval seconds. The first computation goes through
+        run_inline; if it is interrupted or times out, the worker finishes it.
+        """
+        run_inline = run_inline or (lambda fn: fn())
+        if not self.enabled:
+            return run_inline(compute)
+        key = (name, shared_cache_key(*key_args))
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is None:
+                # The fingerprint is the upstream key the default inline path awaits, so
+                # a refresh and a session computing the same view share one call
+                job = {'name': name, 'fingerprint': shared_cache_key(name, *key_args),
+                       'compute': compute, 'interval': interval, 'next_run': 0.0,
+                       'has_value': False, 'value': None, 'running': False, 'computed_at': None}
+                self.jobs[key] = job
+            job['compute'] = compute
+            job['last_requested'] = time.monotonic()
+            if job['has_value']:
+                return job['value']
+            # Keep the scheduler from starting a duplicate while this caller computes
+            job['running'] = True
+        try:
+            value = run_inline(compute)
+        except BaseException:
+            with self.lock:
+                job['running'] = False
+                # Hand the job to the worker, but not sooner than its retry after a failure
+                job['next_run'] = max(time.monotonic(), job.get('retry_after', 0.0))
+                self.lock.notify_all()
+            raise
+        self._store(job, value, 'inline')
+        return value
+    
+    def _refresh(self, job):
+        # The refresh runs on the upstream pool under the view's key, joining a
+        # session's call still in flight. A job may wait there on another upstream
+        # call, but no more jobs wait at once than this pool has threads, which
+        # is fewer than the upstream pool's
+        try:
+            value = upstream_calls.acquire(job['fingerprint'], job['compute'], pinned=True, fresh=True).result()
+        except Exception:
+            with self.lock:
+                job['running'] = False
+                job['next_run'] = job['retry_after'] = time.monotonic() + min(job['interval'], PRECOMPUTE_RETRY_SECONDS)
+                self.lock.notify_all()
+            metrics.inc('delhi_heat_precompute_runs_total', {'job': job['name'], 'outcome': 'error'})
+            return
+        self._store(job, value, 'ok')
+    
+    def _store(self, job, value, outcome):
+        with self.lock:
+            job.update(value=value, has_value=True, running=False, computed_at=time.time(),
+                       next_run=time.monotonic() + job['interval'])
+            self.lock.notify_all()
+        metrics.inc('delhi_heat_precompute_runs_total', {'job': job['name'], 'outcome': outcome})
+    
+    def run(self):
+        current_section.set('precompute')
+        while True:
+            with self.lock:
+                if self.stopped:
+                    return
+                now = time.monotonic()
+                # Forget views nobody has asked for in a day, e.g. yesterday's 60-day window
+                for key in [k for k, j in self.jobs.items()
+                            if not j['running'] and now - j['last_requested'] > PRECOMPUTE_IDLE_EXPIRY_SECONDS]:
+                    del self.jobs[key]
+                due = [j for j in self.jobs.values() if not j['running'] and j['next_run'] <= now]
+                for job in due:
+                    job['running'] = True
+                if not due:
+                    next_run = min((j['next_run'] for j in self.jobs.values() if not j['running']), default=now + 60)
+                    self.lock.wait(timeout=min(max(next_run - now, 1.0), 60))
+                    continue
+            for job in due:
+                self.pool.submit(contextvars.copy_context().run, self._refresh, job)
+    
+    def latest(self, name, key_args):
+        """Stored result of a default view, or None before its first computation"""
+        with self.lock:
+            job = self.jobs.get((name, shared_cache_key(*key_args)))
+            return job['value'] if job is not None and job['has_value'] else None
+    
+    def status(self):
+        """One row per scheduled view for the debug panel"""
+        with self.lock:
+            return [{
+                'Job': j['name'], 'Every (s)': j['interval'], 'Running': j['running'],
+                'Last refresh': datetime.fromtimestamp(j['computed_at']).strftime('%H:%M:%S') if j['computed_at'] else '-'
+            } for j in self.jobs.values()]
+    
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            self.lock.notify_all()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+@st.cache_resource(on_release=lambda worker: worker.stop())
+def get_precompute_worker(enabled):
+    """Background worker shared by all sessions in this process"""
+    return PrecomputeWorker(enabled)
+
+precompute = get_precompute_worker(PRECOMPUTE_ENABLED)
+
+# Function to fetch a view's result: precomputed for default inputs, otherwise
+# awaited under a deadline; on a timeout this session's previous result for the
+# same inputs is shown
+def default_view(name, key_args, compute, is_default=True, interval=DEFAULT_VIEW_REFRESH_SECONDS,
+                 label=None, run_inline=None):
+    """Result for a view, falling back to this session's last result for the same inputs on a timeout"""
+    label = label or f"Loading {name.replace('_', ' ')}"
+    run_inline = run_inline or (lambda fn: await_upstream(label, (name,) + tuple(key_args), fn))
+    # One entry per view, kept with the inputs it was computed for
+    fingerprint = shared_cache_key(name, *key_args)
+    try:
+        if is_default:
+            value = precompute.get(name, key_args, compute, interval, run_inline=run_inline)
+        else:
+            value = run_inline(compute)
+    except UpstreamDeadlineExceeded:
+        last = st.session_state.get(f'_last_result_{name}')
+        # A result for other inputs, such as the previous dates or region, is never shown in their place
+        if last is None or last[0] != fingerprint:
+            raise
+        st.warning(f"⏳ {label} is taking longer than {EE_CALL_DEADLINE_SECONDS}s; showing the previous result until it finishes.")
+        return last[1]
+    st.session_state[f'_last_result_{name}'] = (fingerprint, value)
+    return value
+
+# ==================== Progressive Views ====================
+
+# Statistics that are slow at full resolution are first computed at a coarse
+# scale and shown straight away; finer levels run in the background and the
+# page reruns as each one finishes, updating the display in place
+PROGRESSIVE_POLL_SECONDS = 1.0
+
+# (fingerprint, future) of refinements still running for this run's views
+progressive_pending = []
+
+# Raised in place of computing, to look up a cached final level
+class ProgressiveMiss(Exception):
+    """No cached final level for a progressive view"""
+
+# Final levels are cached like other Earth Engine results, so a refinement
+# outlives the upstream registry's short retention
+@instrumented_cache('progressive_final', ttl=EE_RESULT_TTL, max_entries=64, show_spinner=False)
+def progressive_final(fingerprint, _compute):
+    """Final level of a progressive view, or ProgressiveMiss from a lookup"""
+    return _compute()
+
+# Compute function for a lookup-only call of progressive_final
+def raise_progressive_miss():
+    raise ProgressiveMiss()
+
+# Function to get this session's recent refinement failures
+def progressive_failures():
+    """Error message by level fingerprint; a failed level is not retried until it expires"""
+    failures = st.session_state.setdefault('_progressive_failures', {})
+    now = time.monotonic()
+    for fingerprint in [k for k, (failed, _) in failures.items() if now - failed > EE_CALL_RETENTION_SECONDS]:
+        del failures[fingerprint]
+    return failures
+
+# Function to note the failed futures among a view's levels
+def record_progressive_failures(futures_by_fingerprint):
+    """Add the levels whose futures raised to this session's failures"""
+    failures = st.session_state.setdefault('_progressive_failures', {})
+    for fingerprint, future in futures_by_fingerprint:
+        if future.done() and not future.cancelled() and future.exception() is not None:
+            failures[fingerprint] = (time.monotonic(), str(future.exception()))
+
+# Function to fetch a view level by level, coarsest first
+def progressive_view(name, key_args, levels, is_default=True, label=None):
+    """Finest finished level of a view; levels are (description, compute) from coarse to final"""
+    label = label or f"Loading {name.replace('_', ' ')}"
+    keys = [(name, description) + tuple(key_args) for description, _ in levels]
+    fingerprints = [shared_cache_key(*key) for key in keys]
+    final_key, final_fingerprint = keys[-1], fingerprints[-1]
+    
+    def fill_final():
+        if shared_cache is None:
+            return levels[-1][1]()
+        return shared_cache.get_or_fill('progressive_final', final_fingerprint, EE_RESULT_TTL, levels[-1][1])
+    
+    def final_compute():
+        return progressive_final(final_fingerprint, fill_final)
+    
+    computes = [compute for _, compute in levels[:-1]] + [final_compute]
+    failed_final = []
+    
+    def submit(fingerprint, compute):
+        return upstream_calls.acquire(fingerprint, compute, pinned=True)
+    
+    def run_inline(_compute):
+        # A lookup would wait on the cache's lock while the final level is computing
+        if not upstream_calls.running(final_fingerprint):
+            try:
+                return progressive_final(final_fingerprint, raise_progressive_miss)
+            except ProgressiveMiss:
+                pass
+        # Levels that failed recently are left out rather than submitted again
+        failures = progressive_failures()
+        futures = [None if fingerprint in failures else submit(fingerprint, compute)
+                   for fingerprint, compute in zip(fingerprints, computes)]
+        live = [f for f in futures if f is not None]
+        if not any(f.done() and not f.cancelled() and f.exception() is None for f in live) and futures[0] is not None:
+            try:
+                await_upstream(label, keys[0], computes[0])
+            except UpstreamDeadlineExceeded:
+                raise
+            except Exception:
+                pass
+        record_progressive_failures([(fp, f) for fp, f in zip(fingerprints, futures) if f is not None])
+        finished = [i for i, f in enumerate(futures) if f is not None and f.done() and not f.cancelled() and f.exception() is None]
+        if finished and finished[-1] == len(futures) - 1:
+            return futures[-1].result()
+        progressive_pending.extend((fp, f) for fp, f in zip(fingerprints, futures) if f is not None and not f.done())
+        if final_fingerprint in failures:
+            failed_final.append(failures[final_fingerprint][1])
+        if not finished:
+            # Every coarse level failed; wait for the final one as a regular view would
+            return await_upstream(label, final_key, final_compute)
+        raise PartialResult(futures[finished[-1]].result(), finished[-1] + 1, len(futures))
+    
+    try:
+        # The background worker and the inline levels share the final call
+        return default_view(name, key_args, lambda: submit(final_fingerprint, final_compute).result(),
+                            is_default=is_default, label=label, run_inline=run_inline)
+    except PartialResult as partial:
+        if failed_final:
+            st.warning(f"⚠️ {label}: the {levels[-1][0]} result failed ({failed_final[0]}); showing the {levels[partial.done - 1][0]} estimate")
+        else:
+            st.caption(f"⏳ {label}: showing the {levels[partial.done - 1][0]} estimate while {levels[-1][0]} is computed…")
+        return partial.value
+
 # Add responsive CSS for mobile devices
 st.markdown("""
 <style>
@@ -72,7 +1122,9 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-st.title("Delhi-NCR Urban Heat Monitoring Dashboard")
+# The title names the selected region, which is only known after the selector below
+dashboard_title = st.empty()
+dashboard_title.title("Urban Heat Monitoring Dashboard")
 
 # Add info expander for better mobile experience
 with st.expander("ℹ️ About this Dashboard", expanded=False):
@@ -88,169 +1140,60 @@ with st.expander("ℹ️ About this Dashboard", expanded=False):
     **🔄 Auto-refresh:** Data updates every 5 minutes automatically.
     """)
 
-API_KEY = st.secrets["OPENWEATHER_API_KEY"]
-
-# Load Earth Engine credentials
-service_account_info = {
-    "type": "service_account",
-    "client_email": st.secrets["GEE_SERVICE_ACCOUNT"],
-    "private_key": st.secrets["GEE_PRIVATE_KEY"],
-    "token_uri": "https://oauth2.googleapis.com/token",
-}
-
-credentials = service_account.Credentials.from_service_account_info(
-    service_account_info,
-    scopes=["https://www.googleapis.com/auth/earthengine"]
-)
-
-ee.Initialize(credentials)
+if CASSETTE_MODE == 'replay':
+    # Replay runs offline: no API key is sent and the EE algorithm catalogue
+    # comes from the cassette instead of the server
+    API_KEY = ""
+    ee.data.getAlgorithms = cassette.replay_algorithms
+    ee.Initialize(credentials=None, project="cassette-replay")
+else:
+    API_KEY = st.secrets["OPENWEATHER_API_KEY"]
+    
+    # Load Earth Engine credentials
+    service_account_info = {
+        "type": "service_account",
+        "client_email": st.secrets["GEE_SERVICE_ACCOUNT"],
+        "private_key": st.secrets["GEE_PRIVATE_KEY"],
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+    
+    credentials = service_account.Credentials.from_service_account_info(
+        service_account_info,
+        scopes=["https://www.googleapis.com/auth/earthengine"]
+    )
+    
+    ee.Initialize(credentials)
+    if CASSETTE_MODE == 'record' and cassette.algorithms is None:
+        cassette.record_algorithms(ee.data.getAlgorithms())
 
-# Create a merged geometry from all NCR districts for accurate clipping
-@st.cache_data
-def create_delhi_region_geometry():
-    """Create merged geometry from all 11 Delhi districts only"""
-    try:
-        geoboundaries_path = "geoBoundaries-IND-ADM2-all/geoBoundaries-IND-ADM2_simplified.geojson"
-        
-        if not os.path.exists(geoboundaries_path):
-            # Fallback to Delhi rectangle if file not found
-            return ee.Geometry.Rectangle([76.84, 27.39, 78.57, 28.88])
-        
-        with open(geoboundaries_path, 'r', encoding='utf-8') as f:
-            districts_data = json.load(f)
-        
-        # Filter to only Delhi districts (11 districts)
-        delhi_districts = [
-            'Central Delhi', 'East Delhi', 'New Delhi', 'North Delhi', 'North East Delhi', 
-            'North West Delhi', 'Shahdara', 'South Delhi', 'South East Delhi', 'South West Delhi', 'West Delhi'
-        ]
-        
-        # Extract and merge all Delhi district geometries
-        merged_geometry = None
-        for feature in districts_data.get('features', []):
-            district_name = feature.get('properties', {}).get('shapeName', '')
-            if district_name in delhi_districts:
-                geom = ee.Geometry(feature['geometry'])
-                if merged_geometry is None:
-                    merged_geometry = geom
-                else:
-                    merged_geometry = merged_geometry.union(geom)
-        
-        if merged_geometry is not None:
-            return merged_geometry
-        else:
-            # Fallback to Delhi rectangle if no districts found
-            return ee.Geometry.Rectangle([76.84, 27.39, 78.57, 28.88])
-    except Exception as e:
-        # Fallback to Delhi rectangle if any error occurs
-        return ee.Geometry.Rectangle([76.84, 27.39, 78.57, 28.88])
+# ==================== Region & District Boundaries ====================
 
-# Define region for Delhi only
-region = create_delhi_region_geometry()
+# District boundary pack built offline by scripts/build_boundary_pack.py and
+# simplified once, so full-resolution outlines are never loaded or simplified at
+# runtime. The shipped pack has Delhi's 11 districts; one built with --adm2 adds
+# the other 24 NCR districts
+BOUNDARY_PACK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ncr_districts.geojson")
+DELHI_BOUNDARIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "delhi_admin.geojson")
 
-# Cache geoBoundaries data for efficient loading
-@st.cache_data
-def load_geoboundaries():
-    """Load and filter geoBoundaries for Delhi-NCR states"""
-    try:
-        # Use simplified version for better performance
-        geoboundaries_path = "geoBoundaries-IND-ADM1-all/geoBoundaries-IND-ADM1_simplified.geojson"
-        
-        if not os.path.exists(geoboundaries_path):
-            return None
-        
-        with open(geoboundaries_path, 'r', encoding='utf-8') as f:
-            geoboundaries_data = json.load(f)
-        
-        # Filter to only Delhi + NCR states
-        ncr_states = ['Delhi', 'Haryana', 'Uttar Pradesh', 'Rajasthan']
-        filtered_features = [
-            feature for feature in geoboundaries_data.get('features', [])
-            if feature.get('properties', {}).get('shapeName', '') in ncr_states
-        ]
-        
-        if filtered_features:
-            return {
-                'type': 'FeatureCollection',
-                'features': filtered_features
-            }
-        return None
-    except Exception as e:
-        return None
+# Regions offered by the selector, as the pack Region values each includes
+REGIONS = {
+    'Delhi': ('Delhi',),
+    'Delhi-NCR': ('Delhi', 'NCR'),
+}
 
 # Cache district boundaries for efficient loading
 @st.cache_data
 def load_district_boundaries():
-    """Load and filter district boundaries for NCR region"""
+    """Load the bundled district boundary pack"""
     try:
-        geoboundaries_path = "geoBoundaries-IND-ADM2-all/geoBoundaries-IND-ADM2_simplified.geojson"
+        import geopandas as gpd
         
-        if not os.path.exists(geoboundaries_path):
+        if not os.path.exists(BOUNDARY_PACK_PATH):
             return None
-        
-        with open(geoboundaries_path, 'r', encoding='utf-8') as f:
-            districts_data = json.load(f)
-        
-        # Filter to only NCR districts - Official 35 Districts
-        ncr_districts = [
-            # Delhi (11 districts)
-            'Central Delhi', 'East Delhi', 'New Delhi', 'North Delhi', 'North East Delhi', 
-            'North West Delhi', 'Shahdara', 'South Delhi', 'South East Delhi', 'South West Delhi', 'West Delhi',
-            # Haryana (14 districts)
-            'Faridabad', 'Gurugram', 'Gurgaon', 'Nuh', 'Mewat', 'Rohtak', 'Sonipat', 'Rewari', 
-            'Jhajjar', 'Panipat', 'Palwal', 'Bhiwani', 'Charkhi Dadri', 'Mahendragarh', 'Jind', 'Karnal',
-            # Uttar Pradesh (8 districts)
-            'Meerut', 'Ghaziabad', 'Gautam Budh Nagar', 'Bulandshahr', 'Baghpat', 'Hapur', 'Shamli', 'Muzaffarnagar',
-            # Rajasthan (2 districts)
-            'Alwar', 'Bharatpur'
-        ]
-        
-        filtered_features = [
-            feature for feature in districts_data.get('features', [])
-            if feature.get('properties', {}).get('shapeName', '') in ncr_districts
-        ]
-        
-        if filtered_features:
-            return {
-                'type': 'FeatureCollection',
-                'features': filtered_features
-            }
-        return None
+        return gpd.read_file(BOUNDARY_PACK_PATH)
     except Exception as e:
         return None
 
-st.subheader("MODIS Satellite-Derived Daily Land Surface Temperature (LST)")
-
-# Date selection controls for MODIS layers
-st.markdown("### 📅 Select Date Range for Satellite Data")
-
-col1, col2 = st.columns([1, 1], gap="medium")
-
-with col1:
-    modis_start_date = st.date_input(
-        "Start Date",
-        value=datetime(2025, 12, 31).date(),
-        min_value=datetime(2000, 1, 1).date(),
-        max_value=datetime.now().date(),
-        key="modis_start"
-    )
-
-with col2:
-    modis_end_date = st.date_input(
-        "End Date",
-        value=datetime(2026, 1, 30).date(),
-        min_value=datetime(2000, 1, 1).date(),
-        max_value=datetime.now().date(),
-        key="modis_end"
-    )
-
-# Validate date ranges
-if modis_start_date >= modis_end_date:
-    st.error("⚠️ Start Date must be before End Date")
-
-# Display selected date range
-st.info(f"📊 Loading satellite data (LST & NDVI) from **{modis_start_date}** to **{modis_end_date}** ({(modis_end_date - modis_start_date).days} days)")
-
 # Function to load Delhi districts from GeoJSON file
 @st.cache_data
 def load_delhi_districts_from_kml():
@@ -287,18 +1230,84 @@ def load_delhi_districts_from_kml():
         st.code(traceback.format_exc())
         return None
 
-# Function to create merged district geometry from KML for Earth Engine
-def get_districts_ee_geometry():
-    """Get merged EE geometry for Delhi from KML file"""
+# Function to get a region's districts with District, State and Region columns
+def load_region_districts(region_name):
+    """Districts of a region from the pack, or Delhi's full-resolution file without one"""
+    districts = load_district_boundaries()
+    if districts is not None:
+        return districts[districts['Region'].isin(REGIONS[region_name])]
+    
+    delhi_gdf = load_delhi_districts_from_kml()
+    if delhi_gdf is None or delhi_gdf.empty:
+        return None
+    names = delhi_gdf.get('District', delhi_gdf.get('Name')).astype(str).str.title()
+    return delhi_gdf.assign(District=names, State='Delhi', Region='Delhi')
+
+# Signature of the district boundary files, used to key cached renders and indexes
+def get_boundaries_signature():
+    path = BOUNDARY_PACK_PATH if os.path.exists(BOUNDARY_PACK_PATH) else DELHI_BOUNDARIES_PATH
     try:
-        delhi_gdf = load_delhi_districts_from_kml()
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+# District outlines of one region with an STR-tree for point lookups
+class DistrictIndex:
+    """Spatial index over a region's districts"""
+    
+    def __init__(self, gdf):
+        import shapely
         
-        if delhi_gdf is None or delhi_gdf.empty:
-            # Fallback to bounding box if KML loading fails
+        self.gdf = gdf.reset_index(drop=True)
+        self.names = self.gdf['District'].to_numpy(dtype=object)
+        self.tree = shapely.STRtree(self.gdf.geometry.values)
+        self.shape = self.gdf.union_all()
+        shapely.prepare(self.shape)
+    
+    def locate(self, lons, lats):
+        """District name for each point, 'Unassigned' outside every district"""
+        import shapely
+        
+        point_idx, district_idx = self.tree.query(shapely.points(lons, lats), predicate='within')
+        names = np.full(len(lons), 'Unassigned', dtype=object)
+        # Reversed so the first district listed wins where simplified outlines overlap
+        names[point_idx[::-1]] = self.names[district_idx[::-1]]
+        return names
+    
+    def intersecting(self, geometry):
+        """Names of the districts a geometry intersects, in listing order"""
+        return self.names[np.sort(self.tree.query(geometry, predicate='intersects'))].tolist()
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_district_index(region_name, boundaries_key):
+    """District index for a region, rebuilt when the boundary files change"""
+    gdf = load_region_districts(region_name)
+    if gdf is None or gdf.empty:
+        return None
+    return DistrictIndex(gdf)
+
+# Function to convert a shapely outline to an Earth Engine geometry
+def ee_geometry_from_shape(shape):
+    """EE Polygon or MultiPolygon for a shapely outline; None for other geometry types"""
+    # Coordinates as [lon, lat] pairs, ignoring z if present
+    if shape.geom_type == 'Polygon':
+        return ee.Geometry.Polygon([[[x, y] for x, y, *_ in shape.exterior.coords]])
+    if shape.geom_type == 'MultiPolygon':
+        # Each polygon needs to be wrapped in a list
+        return ee.Geometry.MultiPolygon([[[[x, y] for x, y, *_ in poly.exterior.coords]] for poly in shape.geoms])
+    return None
+
+# Function to convert the region outline to an Earth Engine geometry
+def get_districts_ee_geometry(district_index):
+    """Get merged EE geometry for the selected region's districts"""
+    try:
+        if district_index is None:
+            # Fallback to bounding box if no boundaries could be loaded
             return ee.Geometry.Rectangle([76.8388, 28.4044, 77.3465, 28.8833])
         
         # Merge all district geometries and fix any invalid geometries
-        merged_geom = delhi_gdf.union_all()
+        merged_geom = district_index.shape
         
         # Validate and fix geometry if needed
         if not merged_geom.is_valid:
@@ -309,18 +1318,8 @@ def get_districts_ee_geometry():
         merged_geom = merged_geom.simplify(0.001, preserve_topology=True)
         
         # Convert to Earth Engine geometry based on type
-        if merged_geom.geom_type == 'Polygon':
-            # Extract coordinates as list of [lon, lat] pairs (ignore z if present)
-            coords = [[coord[0], coord[1]] for coord in merged_geom.exterior.coords]
-            ee_geom = ee.Geometry.Polygon([coords])
-        elif merged_geom.geom_type == 'MultiPolygon':
-            # Extract coordinates for each polygon
-            polygons = []
-            for poly in merged_geom.geoms:
-                coords = [[coord[0], coord[1]] for coord in poly.exterior.coords]
-                polygons.append([coords])  # Each polygon needs to be wrapped in a list
-            ee_geom = ee.Geometry.MultiPolygon(polygons)
-        else:
+        ee_geom = ee_geometry_from_shape(merged_geom)
+        if ee_geom is None:
             return ee.Geometry.Rectangle([76.8388, 28.4044, 77.3465, 28.8833])
         
         return ee_geom
@@ -329,29 +1328,97 @@ def get_districts_ee_geometry():
         # Fallback to bounding box
         return ee.Geometry.Rectangle([76.8388, 28.4044, 77.3465, 28.8833])
 
-# Get district geometry for clipping
-districts_geometry = get_districts_ee_geometry()
+# Region selector; Delhi-NCR is offered once the pack includes the NCR districts
+district_boundaries = load_district_boundaries()
+packed_regions = set(district_boundaries['Region']) if district_boundaries is not None else {'Delhi'}
+available_regions = [name for name, parts in REGIONS.items() if set(parts) <= packed_regions]
+selected_region = st.radio(
+    "🗺️ Region",
+    available_regions,
+    horizontal=True,
+    key="region",
+    help=("Delhi's 11 districts, or all 35 districts of the National Capital Region" if len(available_regions) == len(REGIONS)
+          else "Delhi's 11 districts. The shipped boundary pack has no NCR districts, so Delhi-NCR is unavailable")
+)
+if len(available_regions) < len(REGIONS):
+    st.caption("Delhi-NCR is unavailable: the shipped boundary pack covers Delhi only. Rebuild ncr_districts.geojson with `scripts/build_boundary_pack.py --adm2 ...` to add the NCR districts")
+
+dashboard_title.title(f"{selected_region} Urban Heat Monitoring Dashboard")
+
+boundaries_key = get_boundaries_signature()
+district_index = get_district_index(selected_region, boundaries_key)
+region_gdf = district_index.gdf if district_index is not None else None
+
+# Get district geometry for clipping, and the same outline in lon/lat for
+# splitting reductions into tiles
+districts_geometry = get_districts_ee_geometry(district_index)
+region = districts_geometry
+if district_index is not None:
+    districts_shape = district_index.shape
+else:
+    from shapely.geometry import box
+    districts_shape = box(76.8388, 28.4044, 77.3465, 28.8833)
+
+start_section("lst")
+st.subheader("MODIS Satellite-Derived Daily Land Surface Temperature (LST)")
+
+# Date selection controls for MODIS layers
+st.markdown("### 📅 Select Date Range for Satellite Data")
+
+col1, col2 = st.columns([1, 1], gap="medium")
+
+with col1:
+    modis_start_date = st.date_input(
+        "Start Date",
+        value=MODIS_DEFAULT_START,
+        min_value=datetime(2000, 1, 1).date(),
+        max_value=datetime.now().date(),
+        key="modis_start"
+    )
+
+with col2:
+    modis_end_date = st.date_input(
+        "End Date",
+        value=MODIS_DEFAULT_END,
+        min_value=datetime(2000, 1, 1).date(),
+        max_value=datetime.now().date(),
+        key="modis_end"
+    )
+
+# Validate date ranges
+if modis_start_date >= modis_end_date:
+    st.error("⚠️ Start Date must be before End Date")
+
+# The default range is kept warm by the background worker
+modis_is_default = (modis_start_date, modis_end_date) == (MODIS_DEFAULT_START, MODIS_DEFAULT_END)
 
-# Create a plain Folium map
-m = folium.Map(location=[28.6139, 77.2090], zoom_start=10)
+# Display selected date range
+st.info(f"📊 Loading satellite data (LST & NDVI) from **{modis_start_date}** to **{modis_end_date}** ({(modis_end_date - modis_start_date).days} days)")
 
-# Function to add Earth Engine layer to Folium
-def add_ee_layer(self, ee_image_object, vis_params, name, opacity=1.0):
+# Earth Engine tile layers for the main map, collected as (url, name, opacity)
+# and rendered together once all sections have added theirs
+map_layers = []
+
+# Cache tile URLs per image expression so the map HTML stays identical across reruns
+@instrumented_cache('tile_url', ttl=3600, show_spinner=False)
+def get_tile_url(image_key, vis_params, _ee_image):
+    """Fetch the EE tile URL template for a serialized image expression"""
+    return ee_get_tile_url(ee.Image(_ee_image), vis_params)
+
+# Function to add Earth Engine layer to the main map
+def add_ee_layer(ee_image_object, vis_params, name, opacity=1.0, keep_warm=False):
     try:
-        map_id_dict = ee.Image(ee_image_object).getMapId(vis_params)
-        folium.raster_layers.TileLayer(
-            tiles=map_id_dict['tile_fetcher'].url_format,
-            attr='Google Earth Engine',
-            name=name,
-            overlay=True,
-            control=True,
-            opacity=opacity,
-        ).add_to(self)
+        image = ee.Image(ee_image_object)
+        image_key = image.serialize()
+        tile_url = default_view(
+            'tile_url', (image_key, vis_params),
+            lambda: get_tile_url(image_key, vis_params, image),
+            is_default=keep_warm
+        )
+        map_layers.append((tile_url, name, opacity))
     except Exception as e:
         st.warning(f"Could not load layer {name}: {str(e)}")
 
-folium.Map.add_ee_layer = add_ee_layer
-
 # Add MODIS LST layer with enhanced styling
 try:
     # Fetch MODIS LST
@@ -374,12 +1441,17 @@ try:
     
     # Get statistics from the actual data
     try:
-        stats = display_layer.reduceRegion(
-            reducer=ee.Reducer.minMax(),
-            geometry=districts_geometry if districts_geometry else region,
-            scale=1000,
-            maxPixels=1e9
-        ).getInfo()
+        # A 4 km preview first, then MODIS' native 1 km
+        stats = progressive_view('lst_range', (selected_region, modis_start_date, modis_end_date), [
+            (description, lambda scale=scale: tiled_reduce_region(
+                display_layer, 'min_max',
+                geometry=districts_geometry if districts_geometry else region,
+                region_shape=districts_shape,
+                scale=scale,
+                operation='lst_min_max'
+            ))
+            for description, scale in [('4 km', 4000), ('1 km', 1000)]
+        ], is_default=modis_is_default, label="LST range")
         
         # Extract min/max values with fallback
         data_min = stats.get('LST_Day_1km_min', 10)
@@ -391,7 +1463,7 @@ try:
         viz_max = min(data_max + buffer, 55)
         
         st.info(f"📊 LST Range: {data_min:.1f}°C to {data_max:.1f}°C (Visualization: {viz_min:.1f}°C to {viz_max:.1f}°C)")
-    except:
+    except Exception:
         # Fallback to seasonal defaults if calculation fails
         viz_min = 10
         viz_max = 40
@@ -413,7 +1485,7 @@ try:
     }
     
     # Add the layer to the map
-    m.add_ee_layer(display_layer, vis_params, "🌡️ Land Surface Temperature (°C)", opacity=0.6)
+    add_ee_layer(display_layer, vis_params, "🌡️ Land Surface Temperature (°C)", opacity=0.6, keep_warm=modis_is_default)
     
 except Exception as lst_error:
     st.error(f"Error loading LST layer: {str(lst_error)}")
@@ -450,9 +1522,9 @@ try:
     # Clip to district boundaries if available
     if districts_geometry:
         ndvi_clipped = ndvi.clip(districts_geometry)
-        m.add_ee_layer(ndvi_clipped, ndvi_vis_params, "🌿 Vegetation Index - NDVI", opacity=0.45)
+        add_ee_layer(ndvi_clipped, ndvi_vis_params, "🌿 Vegetation Index - NDVI", opacity=0.45, keep_warm=modis_is_default)
     else:
-        m.add_ee_layer(ndvi, ndvi_vis_params, "🌿 Vegetation Index - NDVI", opacity=0.45)
+        add_ee_layer(ndvi, ndvi_vis_params, "🌿 Vegetation Index - NDVI", opacity=0.45, keep_warm=modis_is_default)
 except Exception as ndvi_error:
     try:
         # Fallback to Sentinel-2 with very lenient filtering
@@ -479,15 +1551,70 @@ except Exception as ndvi_error:
         # Clip to district boundaries if available
         if districts_geometry:
             ndvi_sent_clipped = ndvi_sent.clip(districts_geometry)
-            m.add_ee_layer(ndvi_sent_clipped, ndvi_vis_params, "🌿 Vegetation Index - NDVI", opacity=0.45)
+            add_ee_layer(ndvi_sent_clipped, ndvi_vis_params, "🌿 Vegetation Index - NDVI", opacity=0.45)
         else:
-            m.add_ee_layer(ndvi_sent, ndvi_vis_params, "🌿 Vegetation Index - NDVI", opacity=0.45)
+            add_ee_layer(ndvi_sent, ndvi_vis_params, "🌿 Vegetation Index - NDVI", opacity=0.45)
     except Exception as fallback_e:
         st.warning(f"Vegetation layer temporarily unavailable")
 
+# Land-cover composition computed once offline on WorldCover's native grid by
+# scripts/build_landcover_pack.py; WorldCover v200 is a fixed 2021 product
+LANDCOVER_PACK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "landcover_pack.npz")
+# WorldCover's native grid, as in scripts/build_landcover_pack.py: 1/12000 degree
+# pixels aligned to whole degrees, about 9 m by 8 m at Delhi
+WORLDCOVER_PIXEL_DEGREES = 1 / 12000
+
+# Signature of the land-cover pack, used to reload it when it is rebuilt
+def get_landcover_pack_signature():
+    try:
+        stat = os.stat(LANDCOVER_PACK_PATH)
+        return (LANDCOVER_PACK_PATH, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+# Function to hash the boundary pack, as the build scripts record it
+def boundary_pack_sha256():
+    """SHA-256 of ncr_districts.geojson, or None without one"""
+    try:
+        with open(BOUNDARY_PACK_PATH, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+# Load the per-district pixel counts once per process and per boundary file; the
+# class raster in the same file is left compressed until something reads it
+@st.cache_resource(show_spinner=False)
+def load_landcover_counts(pack_key, boundaries_key):
+    """WorldCover pixel counts by district (rows) and class value (columns), or None for other boundaries"""
+    if pack_key is None:
+        return None
+    with np.load(LANDCOVER_PACK_PATH, allow_pickle=False) as pack:
+        # Counts from other district outlines would be silently wrong; the EE histogram is used instead
+        if str(pack['boundaries_sha256']) != boundary_pack_sha256():
+            return None
+        return pd.DataFrame(
+            pack['counts'],
+            index=pack['districts'].tolist(),
+            columns=[str(value) for value in pack['class_values']]
+        )
+
+# Function to get the pack's counts for a region's districts
+def landcover_pack_composition(region_gdf):
+    """Pixel counts per district of the region, or None when the pack does not cover it"""
+    try:
+        counts = load_landcover_counts(get_landcover_pack_signature(), get_boundaries_signature())
+    except Exception:
+        return None
+    if counts is None or region_gdf is None or not set(region_gdf['District']) <= set(counts.index):
+        return None
+    return counts.loc[region_gdf['District']]
+
 # Add Land Use / Land Cover Layers
+start_section("land_cover")
 st.subheader("🏙️ Land Use / Land Cover Analysis")
 
+# Class pixel counts; the correlation analysis reuses them as area weights
+land_use_stats = None
 try:
     # Option 1: ESA WorldCover (10m resolution - High detail)
     worldcover = ee.ImageCollection("ESA/WorldCover/v200").first()
@@ -517,18 +1644,30 @@ try:
     
     if districts_geometry:
         worldcover_clipped = worldcover.clip(districts_geometry)
-        m.add_ee_layer(worldcover_clipped, worldcover_vis, "🌍 Land Cover (ESA 10m)", opacity=0.5)
+        add_ee_layer(worldcover_clipped, worldcover_vis, "🌍 Land Cover (ESA 10m)", opacity=0.5, keep_warm=True)
     else:
-        m.add_ee_layer(worldcover, worldcover_vis, "🌍 Land Cover (ESA 10m)", opacity=0.5)
+        add_ee_layer(worldcover, worldcover_vis, "🌍 Land Cover (ESA 10m)", opacity=0.5, keep_warm=True)
     
     # Calculate land use statistics
     try:
-        land_use_stats = worldcover_clipped.reduceRegion(
-            reducer=ee.Reducer.frequencyHistogram(),
-            geometry=districts_geometry if districts_geometry else region,
-            scale=100,
-            maxPixels=1e9
-        ).getInfo()
+        # Exact native-grid counts from the offline pack; without one, count
+        # pixels in tiles across the region on Earth Engine, on grids whose
+        # pixels are whole multiples of WorldCover's
+        district_land_cover = landcover_pack_composition(region_gdf)
+        if district_land_cover is not None:
+            land_use_stats = {'Map': {k: int(v) for k, v in district_land_cover.sum().items() if v > 0}}
+        else:
+            land_use_stats = progressive_view('land_use_histogram', (selected_region,), [
+                (description, lambda pixels=pixels: tiled_reduce_region(
+                    worldcover_clipped, 'histogram',
+                    geometry=districts_geometry if districts_geometry else region,
+                    region_shape=districts_shape,
+                    scale=None,
+                    operation='land_cover_histogram',
+                    pixel_degrees=pixels * WORLDCOVER_PIXEL_DEGREES
+                ))
+                for description, pixels in [('300 m', 30), ('30 m', 3), ('native (1/12000°)', 1)]
+            ], label="Land use distribution")
         
         if land_use_stats and 'Map' in land_use_stats:
             land_class_names = {
@@ -564,6 +1703,14 @@ try:
                 df_land_use = pd.DataFrame(sorted_land_use, columns=['Land Use Type', 'Coverage (%)'])
                 df_land_use['Coverage (%)'] = df_land_use['Coverage (%)'].round(2)
                 st.dataframe(df_land_use, width='stretch', hide_index=True)
+            
+            # Per-district composition comes with the offline pack
+            if district_land_cover is not None:
+                with st.expander("🏘️ Land Cover by District (%)", expanded=False):
+                    df_district_lc = district_land_cover.loc[:, district_land_cover.sum() > 0]
+                    df_district_lc = df_district_lc.div(df_district_lc.sum(axis=1), axis=0).mul(100).round(1)
+                    df_district_lc.columns = [land_class_names.get(c, c) for c in df_district_lc.columns]
+                    st.dataframe(df_district_lc, width='stretch')
                 
     except Exception as stats_error:
         st.info("💡 Land use statistics calculation in progress...")
@@ -590,9 +1737,9 @@ except Exception as worldcover_error:
         
         if districts_geometry:
             modis_lc_clipped = modis_lc.clip(districts_geometry)
-            m.add_ee_layer(modis_lc_clipped, modis_lc_vis, "🌍 Land Cover (MODIS 500m)", opacity=0.5)
+            add_ee_layer(modis_lc_clipped, modis_lc_vis, "🌍 Land Cover (MODIS 500m)", opacity=0.5)
         else:
-            m.add_ee_layer(modis_lc, modis_lc_vis, "🌍 Land Cover (MODIS 500m)", opacity=0.5)
+            add_ee_layer(modis_lc, modis_lc_vis, "🌍 Land Cover (MODIS 500m)", opacity=0.5)
         
         st.info("ℹ️ Using MODIS Land Cover (500m resolution)")
         
@@ -603,125 +1750,895 @@ except Exception as lc_error:
     st.warning(f"Could not load land cover data: {str(lc_error)}")
 
 
-# Locations for weather monitoring - All 11 Delhi districts
-locations = [
-    ("Central", 28.6422, 77.2183),
-    ("East", 28.6261, 77.3006),
-    ("New Delhi", 28.6107, 77.2193),
-    ("North", 28.7043, 77.2074),
-    ("North East", 28.7234, 77.2701),
-    ("North West", 28.7717, 77.0986),
-    ("Shahadra", 28.7100, 77.3150),
-    ("South", 28.5032, 77.2332),
-    ("South East", 28.5550, 77.2850),
-    ("South West", 28.5732, 77.0396),
-    ("West", 28.6564, 77.0709),
-]
+# Monitoring locations are configured in monitoring_locations.json; set
+# MONITORING_LOCATIONS_CONFIG to point at a different file
+LOCATIONS_CONFIG_PATH = os.environ.get(
+    "MONITORING_LOCATIONS_CONFIG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "monitoring_locations.json")
+)
+
+# Function to load the monitoring locations config
+def load_locations_config():
+    """Read the monitoring locations config file"""
+    with open(LOCATIONS_CONFIG_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# Function to lay out a regular grid of stations inside the region
+def generate_grid_locations(region_shape, spacing_km):
+    """Grid points spaced spacing_km apart that fall inside the district boundaries"""
+    import shapely
+    
+    min_lon, min_lat, max_lon, max_lat = region_shape.bounds
+    lat_step = spacing_km / 110.574
+    lon_step = spacing_km / (111.320 * np.cos(np.radians((min_lat + max_lat) / 2)))
+    
+    lons, lats = np.meshgrid(
+        np.arange(min_lon + lon_step / 2, max_lon, lon_step),
+        np.arange(min_lat + lat_step / 2, max_lat, lat_step)
+    )
+    inside = shapely.contains_xy(region_shape, lons.ravel(), lats.ravel())
+    lats, lons = lats.ravel()[inside], lons.ravel()[inside]
+    
+    return pd.DataFrame({
+        'Station': [f"Grid {lat:.3f}N {lon:.3f}E" for lat, lon in zip(lats, lons)],
+        'Latitude': lats.round(5),
+        'Longitude': lons.round(5)
+    })
+
+# Function to use ward centroids as stations
+def load_ward_locations(wards_path, name_property):
+    """Representative points of ward polygons from a GeoJSON file"""
+    import geopandas as gpd
+    
+    if not os.path.isabs(wards_path):
+        wards_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), wards_path)
+    wards = gpd.read_file(wards_path)
+    points = wards.geometry.representative_point()
+    names = wards[name_property] if name_property in wards.columns else pd.Series(range(len(wards))).map("Ward {}".format)
+    
+    return pd.DataFrame({
+        'Station': names.astype(str).values,
+        'Latitude': points.y.round(5).values,
+        'Longitude': points.x.round(5).values
+    })
+
+# Function to assign each station to the district polygon that contains it
+def assign_districts(df_stations, district_index):
+    """Add a District column to stations with one indexed point-in-polygon query"""
+    df_stations = df_stations.copy()
+    df_stations['District'] = district_index.locate(df_stations['Longitude'].to_numpy(), df_stations['Latitude'].to_numpy())
+    return df_stations
+
+# Resolve the configured monitoring locations to one row per station
+@instrumented_cache('monitoring_locations', show_spinner=False)
+def build_monitoring_locations(config, region_name, boundaries_key, _district_index):
+    """Stations (name, coordinates, district) for the configured mode and region"""
+    mode = config.get('mode', 'districts')
+    
+    if mode in ('grid', 'wards') and _district_index is None:
+        st.warning(f"⚠️ District boundaries unavailable, using district stations instead of '{mode}' mode")
+        mode = 'districts'
+    
+    if mode == 'grid':
+        df_stations = generate_grid_locations(_district_index.shape, config.get('grid', {}).get('spacing_km', 3.0))
+        return assign_districts(df_stations, _district_index)
+    
+    if mode == 'wards':
+        wards = config.get('wards', {})
+        try:
+            df_stations = load_ward_locations(wards.get('path', 'delhi_wards.geojson'), wards.get('name_property', 'Ward_Name'))
+            return assign_districts(df_stations, _district_index)
+        except Exception as e:
+            st.warning(f"⚠️ Could not load ward centroids ({str(e)}), using district stations")
+    
+    # One station per district, named after the district it represents
+    df_stations = pd.DataFrame(config.get('districts', []))
+    df_stations = df_stations.rename(columns={'name': 'Station', 'lat': 'Latitude', 'lon': 'Longitude'})
+    df_stations['District'] = df_stations['Station']
+    
+    # Districts without a configured station are watched from a point inside them
+    if _district_index is not None:
+        missing = _district_index.gdf[~_district_index.gdf['District'].isin(df_stations['District'])]
+        points = missing.geometry.representative_point()
+        df_stations = pd.concat([df_stations, pd.DataFrame({
+            'Station': missing['District'].values,
+            'Latitude': points.y.round(4).values,
+            'Longitude': points.x.round(4).values,
+            'District': missing['District'].values
+        })], ignore_index=True)
+    return df_stations[['Station', 'Latitude', 'Longitude', 'District']]
+
+start_section("weather")
+locations_config = load_locations_config()
+df_locations = build_monitoring_locations(locations_config, selected_region, boundaries_key, district_index)
+
+# Locations for weather monitoring as (name, lat, lon) tuples
+locations = list(df_locations[['Station', 'Latitude', 'Longitude']].itertuples(index=False, name=None))
 
 # Function to get live weather
-def get_weather(lat, lon):
+def get_weather(lat, lon, session=None):
+    http = session or requests
     url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
-    data = requests.get(url).json()
+    data = http_get_json(http, url, 'openweather_current')
     return {
         "temperature": data["main"]["temp"],
         "humidity": data["main"]["humidity"],
-        "feels_like": data["main"]["feels_like"]
+        "feels_like": data["main"]["feels_like"],
+        "observed": data.get("dt")
     }
 
+# Heat alert levels as (minimum temperature, message), hottest first
+HEAT_ALERT_LEVELS = [
+    (40, "🔥 Extreme Heat Alert! Stay Hydrated and Avoid Outdoor Activities."),
+    (35, "⚠️ High Heat Warning! Take Precautions."),
+    (-273.15, "🌤️ Normal Temperature."),
+]
+
 # Function for heat alerts
 def heat_alert(temp):
-    if temp >= 40:
-        return "🔥 Extreme Heat Alert! Stay Hydrated and Avoid Outdoor Activities."
-    elif temp >= 35:
-        return "⚠️ High Heat Warning! Take Precautions."
-    else:
-        return "🌤️ Normal Temperature."
-
-# Add weather markers to map with enhanced styling
-for name, lat, lon in locations:
-    w = get_weather(lat, lon)
-    alert = heat_alert(w["temperature"])
-    
-    # Determine icon color and size based on temperature
-    if w["temperature"] >= 40:
-        icon_color = "darkred"
-        icon_prefix = "fa"
-        icon_name = "fire"
-    elif w["temperature"] >= 35:
-        icon_color = "red"
-        icon_prefix = "fa"
-        icon_name = "thermometer-three-quarters"
-    elif w["temperature"] >= 30:
-        icon_color = "orange"
-        icon_prefix = "fa"
-        icon_name = "sun"
-    elif w["temperature"] >= 25:
-        icon_color = "green"
-        icon_prefix = "fa"
-        icon_name = "cloud-sun"
-    else:
-        icon_color = "blue"
-        icon_prefix = "fa"
-        icon_name = "cloud"
-    
-    popup_html = f"""
-    <div style="font-family: Arial; width: 250px; padding: 10px; border-radius: 8px; background-color: #f0f0f0;">
-        <h4 style="margin: 0 0 10px 0; color: #333;">{name}</h4>
-        <div style="background-color: white; padding: 10px; border-radius: 5px; border-left: 4px solid {icon_color};">
-            <p style="margin: 5px 0;"><b>🌡️ Temperature:</b> {w['temperature']:.1f}°C</p>
-            <p style="margin: 5px 0;"><b>🤔 Feels Like:</b> {w['feels_like']:.1f}°C</p>
-            <p style="margin: 5px 0;"><b>💧 Humidity:</b> {w['humidity']:.0f}%</p>
-            <p style="margin: 10px 0 0 0; padding-top: 8px; border-top: 1px solid #ddd;"><b>Status:</b> {alert}</p>
-        </div>
-    </div>
-    """
+    for threshold, message in HEAT_ALERT_LEVELS:
+        if temp >= threshold:
+            return message
+    return HEAT_ALERT_LEVELS[-1][1]
+
+# Fetch current weather for all stations with bounded concurrency; snapshots are
+# shared by every session until the next 5-minute refresh
+@instrumented_cache('weather_snapshot', ttl=WEATHER_SNAPSHOT_TTL, show_spinner=False)
+@shared_cached('weather_snapshot', ttl=WEATHER_SNAPSHOT_TTL)
+def fetch_weather_snapshot(df_locations, max_workers=8):
+    """Current weather for every monitoring station as a DataFrame"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
     
-    folium.Marker(
-        location=[lat, lon],
-        popup=folium.Popup(popup_html, max_width=300),
-        tooltip=f"{name}: {w['temperature']:.1f}°C",
-        icon=folium.Icon(
-            color=icon_color,
-            icon=icon_name,
-            prefix=icon_prefix,
-            icon_color='white'
-        ),
-    ).add_to(m)
+    def fetch(station):
+        try:
+            return get_weather(station['Latitude'], station['Longitude'], session)
+        except Exception:
+            return None
+    
+    stations = df_locations.to_dict('records')
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, fetch, station) for station in stations]
+        readings = [future.result() for future in futures]
+    session.close()
+    
+    rows = []
+    for station, w in zip(stations, readings):
+        if w is None:
+            continue
+        rows.append({
+            'Station': station['Station'],
+            'District': station['District'],
+            'Temperature': w['temperature'],
+            'Feels Like': w['feels_like'],
+            'Humidity': w['humidity'],
+            'Observed': w['observed'],
+            'Latitude': station['Latitude'],
+            'Longitude': station['Longitude']
+        })
+    
+    if not rows:
+        raise RuntimeError("No weather readings could be fetched")
+    return pd.DataFrame(rows)
 
-# Add district boundaries from KML to map
-try:
-    delhi_gdf = load_delhi_districts_from_kml()
+# Aggregate station readings to one row per district in a single pass
+def aggregate_by_district(df_weather):
+    """Mean weather per district with the number of contributing stations"""
+    return df_weather.groupby('District', sort=False).agg(**{
+        'Temperature': ('Temperature', 'mean'),
+        'Feels Like': ('Feels Like', 'mean'),
+        'Humidity': ('Humidity', 'mean'),
+        'Latitude': ('Latitude', 'mean'),
+        'Longitude': ('Longitude', 'mean'),
+        'Observed': ('Observed', 'max'),
+        'Stations': ('Station', 'size')
+    }).reset_index()
+
+# Weather is refreshed by the background worker every few minutes, independent of sessions
+max_weather_workers = locations_config.get('max_concurrent_requests', 8)
+df_weather = default_view(
+    'weather_snapshot', (df_locations, max_weather_workers),
+    lambda: fetch_weather_snapshot.uncached(df_locations, max_weather_workers),
+    interval=WEATHER_REFRESH_SECONDS
+)
+if len(df_weather) < len(df_locations):
+    st.warning(f"⚠️ Weather unavailable for {len(df_locations) - len(df_weather)} of {len(df_locations)} stations")
+df_districts = aggregate_by_district(df_weather)
+
+# ==================== Heat Alert Engine ====================
+
+# District alert levels are evaluated by a server thread from the shared
+# weather snapshot, whether or not anyone has the page open; pages only read
+# the resulting state
+ALERT_ENGINE_ENABLED = os.environ.get('DASHBOARD_ALERT_ENGINE', '1') != '0'
+ALERT_POLL_SECONDS = 60
+# A level is left only once the temperature is this far below its threshold
+ALERT_HYSTERESIS_C = 1.0
+# New snapshots in a row a level change must persist for before it is raised
+ALERT_DEBOUNCE_SNAPSHOTS = 2
+ALERT_HISTORY_SIZE = 500
+# Alert and reading times are shown in Indian Standard Time whatever the server's zone
+IST = timezone(timedelta(hours=5, minutes=30))
+
+METRIC_DESCRIPTIONS['delhi_heat_alert_transitions_total'] = (
+    'counter', 'District heat alert level changes by new level'
+)
+METRIC_DESCRIPTIONS['delhi_heat_alert_polls_total'] = (
+    'counter', 'Alert engine snapshot polls by outcome'
+)
+
+# Alert thread owned by the server process; every configured region is watched
+# from its creation, and sessions refresh a region's source and read its state
+class HeatAlertEngine:
+    """District heat alert levels with hysteresis, debouncing and a bounded history"""
     
-    if delhi_gdf is not None and not delhi_gdf.empty:
-        # Create a feature group for district boundaries
-        district_group = folium.FeatureGroup(name="🏘️ District Boundaries", show=True)
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.Condition()
+        self.regions = {}
+        self.states = {}
+        self.history = deque(maxlen=ALERT_HISTORY_SIZE)
+        self.listeners = {}
+        self.stopped = False
+        if enabled:
+            threading.Thread(target=self.run, name='heat-alerts', daemon=True).start()
+    
+    def watch(self, region, source, snapshot=None, configured=False):
+        """Keep evaluating a region from source(); a region's first snapshot sets its levels at once
         
-        # Add each district boundary
-        for idx, row in delhi_gdf.iterrows():
-            # Get district name from the District field or Name field
-            district_name = row.get('District', row.get('Name', 'Unknown'))
-            if isinstance(district_name, str):
-                district_name = district_name.title()
+        Configured regions are polled for as long as the engine runs; others stop
+        a day after their last page view. Without the background thread, every
+        snapshot passed in is evaluated instead.
+        """
+        with self.lock:
+            entry = self.regions.setdefault(region, {'fingerprint': None, 'configured': False})
+            entry.update(source=source, last_requested=time.monotonic(), configured=entry['configured'] or configured)
+            first = not any(key[0] == region for key in self.states)
+        if snapshot is not None and (first or not self.enabled):
+            self.evaluate(region, snapshot)
+    
+    def subscribe(self, name, callback):
+        """Call callback(region, df_districts, now) with every new snapshot; a name subscribes once"""
+        with self.lock:
+            self.listeners[name] = callback
+    
+    @staticmethod
+    def target_level(temperature, current):
+        """Index into HEAT_ALERT_LEVELS for a temperature, keeping the current level inside the hysteresis band"""
+        if not np.isfinite(temperature):
+            return current
+        level = next(i for i, (threshold, _) in enumerate(HEAT_ALERT_LEVELS) if temperature >= threshold)
+        # Levels are hottest first, so a larger index is a lower level
+        if current is not None and level > current and temperature >= HEAT_ALERT_LEVELS[current][0] - ALERT_HYSTERESIS_C:
+            return current
+        return level
+    
+    def evaluate(self, region, df_districts):
+        """Apply one snapshot of district temperatures; a snapshot already seen is ignored"""
+        columns = [c for c in ('District', 'Temperature', 'Observed') if c in df_districts]
+        fingerprint = int(pd.util.hash_pandas_object(df_districts[columns], index=False).sum())
+        now = time.time()
+        with self.lock:
+            entry = self.regions.get(region)
+            if entry is None or entry['fingerprint'] == fingerprint:
+                return
+            entry['fingerprint'] = fingerprint
+            for district, temperature in zip(df_districts['District'], df_districts['Temperature']):
+                # A missing reading leaves the district's level and pending change as they were
+                if not np.isfinite(temperature):
+                    continue
+                state = self.states.get((region, district))
+                if state is None:
+                    self.states[(region, district)] = {
+                        'level': self.target_level(temperature, None), 'since': now, 'pending': None,
+                        'pending_count': 0, 'temperature': temperature, 'updated': now
+                    }
+                    continue
+                state.update(temperature=temperature, updated=now)
+                target = self.target_level(temperature, state['level'])
+                if target == state['level']:
+                    state.update(pending=None, pending_count=0)
+                    continue
+                if target != state['pending']:
+                    state.update(pending=target, pending_count=0)
+                state['pending_count'] += 1
+                if state['pending_count'] >= ALERT_DEBOUNCE_SNAPSHOTS:
+                    self.history.append({
+                        'Time': now, 'Region': region, 'District': district, 'Temperature': temperature,
+                        'From': HEAT_ALERT_LEVELS[state['level']][1], 'To': HEAT_ALERT_LEVELS[target][1]
+                    })
+                    state.update(level=target, since=now, pending=None, pending_count=0)
+                    metrics.inc('delhi_heat_alert_transitions_total', {'level': str(HEAT_ALERT_LEVELS[target][0])})
+            listeners = list(self.listeners.values())
+        for callback in listeners:
+            try:
+                callback(region, df_districts, now)
+            except Exception:
+                metrics.inc('delhi_heat_alert_polls_total', {'outcome': 'listener_error'})
+    
+    def run(self):
+        current_section.set('alerts')
+        while True:
+            # The first poll waits an interval, so the page's sections have subscribed by then
+            with self.lock:
+                if not self.stopped:
+                    self.lock.wait(timeout=ALERT_POLL_SECONDS)
+                if self.stopped:
+                    return
+                now = time.monotonic()
+                # Stop polling regions nobody has viewed in a day, unless they are configured
+                for region in [r for r, e in self.regions.items()
+                               if not e['configured'] and now - e['last_requested'] > PRECOMPUTE_IDLE_EXPIRY_SECONDS]:
+                    del self.regions[region]
+                sources = [(region, entry['source']) for region, entry in self.regions.items()]
+            for region, source in sources:
+                # One failing region, snapshot or listener must not end the thread
+                try:
+                    self.evaluate(region, source())
+                except Exception:
+                    metrics.inc('delhi_heat_alert_polls_total', {'outcome': 'error'})
+                    continue
+                metrics.inc('delhi_heat_alert_polls_total', {'outcome': 'ok'})
+    
+    def current(self, region):
+        """Alert state of each district in a region"""
+        with self.lock:
+            return {district: dict(state) for (r, district), state in self.states.items() if r == region}
+    
+    def recent(self, region):
+        """Level changes in a region, newest first"""
+        with self.lock:
+            return [event for event in reversed(self.history) if event['Region'] == region]
+    
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            self.lock.notify_all()
+
+@st.cache_resource(on_release=lambda engine: engine.stop())
+def get_alert_engine(enabled, _configured_sources):
+    """Alert engine shared by all sessions in this process, watching every configured region"""
+    engine = HeatAlertEngine(enabled)
+    for region, source in _configured_sources().items():
+        engine.watch(region, source, configured=True)
+    return engine
+
+# Function to read the latest shared weather snapshot for the alert engine
+def alert_snapshot(df_locations, max_workers):
+    """District weather from the background worker's latest snapshot, fetching one if there is none"""
+    latest = precompute.latest('weather_snapshot', (df_locations, max_workers))
+    df_weather = latest if latest is not None else fetch_weather_snapshot(df_locations, max_workers)
+    return aggregate_by_district(df_weather)
+
+# Function to build a snapshot source for every region the boundary pack covers
+def configured_alert_sources():
+    """Snapshot source by region, from each region's monitoring locations"""
+    sources = {}
+    for region in available_regions:
+        region_locations = build_monitoring_locations(locations_config, region, boundaries_key, get_district_index(region, boundaries_key))
+        sources[region] = functools.partial(alert_snapshot, region_locations, max_weather_workers)
+    return sources
+
+alert_engine = get_alert_engine(ALERT_ENGINE_ENABLED, configured_alert_sources)
+
+# ==================== Weather History ====================
+
+# Every new district reading is kept in fixed-size arrays at three resolutions.
+# Each level is a ring of time bins: a reading is added to its bin at every
+# level in constant time, and a bin is cleared when the ring wraps round to it,
+# which is what enforces each level's retention
+WEATHER_HISTORY_FIELDS = ['Temperature', 'Feels Like', 'Humidity']
+# (name, bin seconds, retention in bins)
+WEATHER_HISTORY_LEVELS = [
+    ('5 min', 300, 7 * 288),
+    ('hourly', 3600, 90 * 24),
+    ('daily', 86400, 2 * 366),
+]
+# Queries use the finest level that covers the span in at most this many bins
+WEATHER_HISTORY_MAX_POINTS = 1000
+# Bins follow Indian Standard Time, so daily rollups are calendar days in Delhi
+WEATHER_HISTORY_UTC_OFFSET = int(IST.utcoffset(None).total_seconds())
+WEATHER_HISTORY_PATH = os.environ.get('DASHBOARD_WEATHER_HISTORY_PATH')
+WEATHER_HISTORY_SAVE_SECONDS = 900
+WEATHER_HISTORY_SPANS = {
+    "Last 6 hours": timedelta(hours=6),
+    "Last 24 hours": timedelta(days=1),
+    "Last 7 days": timedelta(days=7),
+    "Last 30 days": timedelta(days=30),
+    "Last year": timedelta(days=365),
+}
+
+# One resolution of the weather history
+class HistoryLevel:
+    """Ring of time bins holding the sum, minimum, maximum and count of each field per district"""
+    
+    def __init__(self, name, resolution, slots, n_districts=0):
+        self.name = name
+        self.resolution = resolution
+        self.slots = slots
+        fields = len(WEATHER_HISTORY_FIELDS)
+        self.bins = np.full((n_districts, slots), -1, dtype=np.int64)
+        self.counts = np.zeros((n_districts, slots), dtype=np.int32)
+        self.sums = np.zeros((n_districts, slots, fields), dtype=np.float64)
+        self.mins = np.full((n_districts, slots, fields), np.inf, dtype=np.float32)
+        self.maxs = np.full((n_districts, slots, fields), -np.inf, dtype=np.float32)
+    
+    @property
+    def retention(self):
+        return self.resolution * self.slots
+    
+    def grow(self, n_districts):
+        """Add empty rows for new districts"""
+        extra = n_districts - len(self.bins)
+        empty = HistoryLevel(self.name, self.resolution, self.slots, extra)
+        for name in ('bins', 'counts', 'sums', 'mins', 'maxs'):
+            setattr(self, name, np.concatenate([getattr(self, name), getattr(empty, name)]))
+    
+    def add(self, rows, times, values):
+        """Add one reading per row; rows must be distinct"""
+        bins = (times + WEATHER_HISTORY_UTC_OFFSET) // self.resolution
+        slots = bins % self.slots
+        # Bins the ring has wrapped round to are reset before they are reused
+        stale = self.bins[rows, slots] != bins
+        if stale.any():
+            r, s = rows[stale], slots[stale]
+            self.bins[r, s] = bins[stale]
+            self.counts[r, s] = 0
+            self.sums[r, s] = 0
+            self.mins[r, s] = np.inf
+            self.maxs[r, s] = -np.inf
+        self.counts[rows, slots] += 1
+        self.sums[rows, slots] += values
+        self.mins[rows, slots] = np.minimum(self.mins[rows, slots], values)
+        self.maxs[rows, slots] = np.maximum(self.maxs[rows, slots], values)
+    
+    def window(self, rows, start, end):
+        """Bin numbers in [start, end] and a (rows, bins) mask of the ones holding readings"""
+        bins = np.arange((start + WEATHER_HISTORY_UTC_OFFSET) // self.resolution,
+                         (end + WEATHER_HISTORY_UTC_OFFSET) // self.resolution + 1)
+        slots = bins % self.slots
+        present = self.bins[np.ix_(rows, slots)] == bins
+        return bins, slots, present
+
+# Per-district weather readings at 5-minute, hourly and daily resolution
+class WeatherHistory:
+    """Append-only weather history with rollups, fed by the alert engine's new snapshots"""
+    
+    def __init__(self, path=None):
+        self.lock = threading.Lock()
+        self.path = path
+        self.rows = {}
+        self.last_observed = np.zeros(0, dtype=np.int64)
+        self.levels = [HistoryLevel(*level) for level in WEATHER_HISTORY_LEVELS]
+        self.readings = 0
+        self.last_saved = time.monotonic()
+        if path and os.path.exists(path):
+            try:
+                self.load(path)
+            except Exception:
+                self.__init__()
+                self.path = path
+    
+    def row(self, district):
+        """Row of a district, adding empty rows for one seen for the first time"""
+        if district not in self.rows:
+            self.rows[district] = len(self.rows)
+            self.last_observed = np.append(self.last_observed, 0)
+            for level in self.levels:
+                level.grow(len(self.rows))
+        return self.rows[district]
+    
+    def record(self, region, df_districts, now):
+        """Add the readings of a snapshot that are newer than each district's last one"""
+        if 'Observed' in df_districts:
+            observed = df_districts['Observed'].to_numpy(dtype=np.float64)
+            observed = np.where(np.isfinite(observed), observed, now).astype(np.int64)
+        else:
+            observed = np.full(len(df_districts), int(now), dtype=np.int64)
+        values = df_districts[WEATHER_HISTORY_FIELDS].to_numpy(dtype=np.float64)
+        with self.lock:
+            rows = np.array([self.row(district) for district in df_districts['District']], dtype=np.int64)
+            # Overlapping regions and unchanged observations deliver the same reading again
+            fresh = (observed > self.last_observed[rows]) & np.isfinite(values).all(axis=1)
+            if not fresh.any():
+                return
+            rows, observed, values = rows[fresh], observed[fresh], values[fresh]
+            self.last_observed[rows] = observed
+            for level in self.levels:
+                level.add(rows, observed, values)
+            self.readings += len(rows)
+            if self.path and time.monotonic() - self.last_saved > WEATHER_HISTORY_SAVE_SECONDS:
+                self.save()
+    
+    def query(self, districts, start, end):
+        """Mean, minimum and maximum of each field per district and bin from the finest level that fits"""
+        start, end = int(start), int(end)
+        level = next((level for level in self.levels
+                      if time.time() - start <= level.retention
+                      and (end - start) // level.resolution < WEATHER_HISTORY_MAX_POINTS), self.levels[-1])
+        with self.lock:
+            names = [district for district in districts if district in self.rows]
+            rows = np.array([self.rows[district] for district in names], dtype=np.int64)
+            bins, slots, present = level.window(rows, start, end)
+            r, b = np.nonzero(present)
+            counts = level.counts[rows[r], slots[b]]
+            means = level.sums[rows[r], slots[b]] / counts[:, None]
+            mins = level.mins[rows[r], slots[b]]
+            maxs = level.maxs[rows[r], slots[b]]
+        df = pd.DataFrame(means, columns=WEATHER_HISTORY_FIELDS)
+        df.insert(0, 'District', np.array(names, dtype=object)[r])
+        # Bin start in Indian Standard Time
+        df.insert(0, 'Time', pd.to_datetime(bins[b] * level.resolution, unit='s'))
+        for i, field in enumerate(WEATHER_HISTORY_FIELDS):
+            df[f'{field} Min'] = mins[:, i]
+            df[f'{field} Max'] = maxs[:, i]
+        df['Readings'] = counts
+        return df, level.name
+    
+    def save(self):
+        """Write the history next to its path and swap it in, so readers never see a partial file"""
+        arrays = {'districts': np.array(list(self.rows)), 'last_observed': self.last_observed,
+                  'readings': np.array(self.readings)}
+        for level in self.levels:
+            for name in ('bins', 'counts', 'sums', 'mins', 'maxs'):
+                arrays[f'{level.name}/{name}'] = getattr(level, name)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(temporary, self.path)
+        self.last_saved = time.monotonic()
+    
+    def load(self, path):
+        """Restore a saved history; levels whose size has changed since start empty"""
+        with np.load(path, allow_pickle=False) as saved:
+            self.rows = {str(district): i for i, district in enumerate(saved['districts'])}
+            self.last_observed = saved['last_observed']
+            for level in self.levels:
+                level.grow(len(self.rows))
+                if saved[f'{level.name}/bins'].shape == level.bins.shape:
+                    for name in ('bins', 'counts', 'sums', 'mins', 'maxs'):
+                        setattr(level, name, saved[f'{level.name}/{name}'])
+            self.readings = int(saved['readings'])
+    
+    def status(self):
+        """Size of the history for the debug panel"""
+        with self.lock:
+            return {'districts': len(self.rows), 'readings': self.readings,
+                    'bytes': sum(getattr(level, name).nbytes for level in self.levels
+                                 for name in ('bins', 'counts', 'sums', 'mins', 'maxs'))}
+
+@st.cache_resource
+def get_weather_history(path):
+    """Weather history shared by all sessions in this process"""
+    return WeatherHistory(path)
+
+# Build the weather history chart for one field
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_weather_history_figure(df_history, field):
+    """Line per district with a min-max band when bins hold several readings"""
+    from plotly.colors import hex_to_rgb, qualitative
+    
+    fig = go.Figure()
+    for i, (district, group) in enumerate(df_history.groupby('District', sort=False)):
+        color = qualitative.Plotly[i % len(qualitative.Plotly)]
+        # Band from the bin minimum up to the maximum; bins with a single reading
+        # collapse it onto the line rather than leaving gaps the fill would bridge
+        several = group['Readings'] > 1
+        for bound, fill in (('Min', None), ('Max', 'tonexty')):
+            fig.add_trace(go.Scatter(
+                x=group['Time'], y=group[f'{field} {bound}'].where(several, group[field]).round(2), mode='lines',
+                line=dict(width=0), fill=fill, fillcolor='rgba({}, {}, {}, 0.2)'.format(*hex_to_rgb(color)),
+                legendgroup=district, showlegend=False, hoverinfo='skip'
+            ))
+        fig.add_trace(go.Scatter(
+            x=group['Time'], y=group[field].round(2), mode='lines', name=district,
+            line=dict(color=color), legendgroup=district,
+            customdata=np.stack([group[f'{field} Min'], group[f'{field} Max'], group['Readings']], axis=-1),
+            hovertemplate=f"%{{x}}<br>{district}: %{{y}} (range %{{customdata[0]:.1f}}–%{{customdata[1]:.1f}}, %{{customdata[2]}} readings)<extra></extra>"
+        ))
+    unit = "%" if field == 'Humidity' else "°C"
+    fig.update_layout(
+        height=380, margin=dict(l=10, r=10, t=30, b=10),
+        yaxis_title=f"{field} ({unit})", legend=dict(orientation='h', y=-0.2), hovermode='closest'
+    )
+    return fig.to_dict()
+
+weather_history = get_weather_history(WEATHER_HISTORY_PATH)
+alert_engine.subscribe('weather_history', weather_history.record)
+
+# ==================== Nowcast ====================
+
+# Short-range district temperature forecasts from the stream of readings. Each
+# district has an additive Holt-Winters state: a slowly moving daily-mean level
+# with a damped trend, a 24-hour diurnal profile, and the latest departure from
+# both, which decays towards zero over the forecast horizon. A new reading
+# updates the state in constant time, with the smoothing weights scaled by the
+# time since the previous reading, so readings may arrive at any interval
+NOWCAST_HORIZONS = np.arange(1, 7)
+# Time constants in hours
+NOWCAST_LEVEL_HOURS = 24.0
+NOWCAST_TREND_HOURS = 48.0
+NOWCAST_DAMPING_HOURS = 12.0
+NOWCAST_SEASON_HOURS = 3.0
+NOWCAST_ANOMALY_HOURS = 3.0
+# Forecast errors are averaged over about this many scored forecasts per horizon
+NOWCAST_ERROR_MEMORY = 48
+# Intervals are shown once this many forecasts of a horizon have been scored
+NOWCAST_MIN_SCORED = 6
+# The diurnal profile needs a full day of readings before forecasts are trusted
+NOWCAST_WARMUP_HOURS = 24
+
+# Online nowcast model for every district seen so far
+class Nowcaster:
+    """Per-district Holt-Winters state with constant-time updates and vectorized forecasts
+    
+    Forecast intervals come from the model's own track record: once an hour it
+    issues a forecast, and each horizon is scored against the reading that
+    arrives when it falls due. The last NOWCAST_HORIZONS issues are kept in a
+    ring, so scoring is also constant time per reading.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = {}
+        n_horizons = len(NOWCAST_HORIZONS)
+        self.level = np.zeros(0)
+        self.trend = np.zeros(0)
+        self.season = np.zeros((0, 24))
+        self.anomaly = np.zeros(0)
+        self.first = np.zeros(0, dtype=np.int64)
+        self.last = np.zeros(0, dtype=np.int64)
+        # Ring of issued forecasts: issue time and values per issue slot and horizon
+        self.issued = np.zeros((0, n_horizons), dtype=np.int64)
+        self.issued_values = np.zeros((0, n_horizons, n_horizons))
+        self.unscored = np.zeros((0, n_horizons, n_horizons), dtype=bool)
+        # Mean squared error and number of scored forecasts per horizon
+        self.error_variance = np.zeros((0, n_horizons))
+        self.scored = np.zeros((0, n_horizons), dtype=np.int64)
+    
+    def row(self, district):
+        """Row of a district, adding an empty state for one seen for the first time"""
+        if district not in self.rows:
+            self.rows[district] = len(self.rows)
+            for name in ('level', 'trend', 'season', 'anomaly', 'first', 'last', 'issued',
+                         'issued_values', 'unscored', 'error_variance', 'scored'):
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate([array, np.zeros((1,) + array.shape[1:], dtype=array.dtype)]))
+        return self.rows[district]
+    
+    @staticmethod
+    def hour_weights(times):
+        """Neighbouring diurnal bins of each time and the weight of the second one"""
+        position = ((times + WEATHER_HISTORY_UTC_OFFSET) / 3600) % 24
+        lower = np.floor(position).astype(np.int64)
+        return lower, (lower + 1) % 24, position - lower
+    
+    def diurnal(self, rows, times):
+        """Diurnal profile of each row at the given times, interpolated between hourly bins"""
+        lower, upper, weight = self.hour_weights(times)
+        rows = rows.reshape(rows.shape + (1,) * (times.ndim - rows.ndim))
+        return self.season[rows, lower] * (1 - weight) + self.season[rows, upper] * weight
+    
+    def predict(self, rows, hours):
+        """Forecast of each row (hours ahead of its last reading) from its current state"""
+        hours = np.broadcast_to(hours, (len(rows),) + np.shape(hours)[-1:]).astype(np.float64)
+        times = self.last[rows, None] + hours * 3600
+        trend = self.trend[rows, None] * NOWCAST_DAMPING_HOURS * (1 - np.exp(-hours / NOWCAST_DAMPING_HOURS))
+        anomaly = self.anomaly[rows, None] * np.exp(-hours / NOWCAST_ANOMALY_HOURS)
+        return self.level[rows, None] + trend + self.diurnal(rows, times) + anomaly
+    
+    def update(self, region, df_districts, now):
+        """Fold the snapshot's new readings into each district's state"""
+        if 'Observed' in df_districts:
+            observed = df_districts['Observed'].to_numpy(dtype=np.float64)
+            observed = np.where(np.isfinite(observed), observed, now).astype(np.int64)
+        else:
+            observed = np.full(len(df_districts), int(now), dtype=np.int64)
+        temperature = df_districts['Temperature'].to_numpy(dtype=np.float64)
+        with self.lock:
+            rows = np.array([self.row(district) for district in df_districts['District']], dtype=np.int64)
+            fresh = (observed > self.last[rows]) & np.isfinite(temperature)
+            rows, observed, temperature = rows[fresh], observed[fresh], temperature[fresh]
+            
+            # A district's first reading sets its level
+            new = self.first[rows] == 0
+            self.level[rows[new]] = temperature[new]
+            self.first[rows[new]] = self.last[rows[new]] = observed[new]
+            rows, observed, temperature = rows[~new], observed[~new], temperature[~new]
+            if not len(rows):
+                return
+            
+            self.score(rows, observed, temperature)
+            
+            step = (observed - self.last[rows]) / 3600
+            elapsed = (observed - self.first[rows]) / 3600
+            # The level is a running mean until a full time constant of readings has been seen
+            alpha = np.maximum(1 - np.exp(-step / NOWCAST_LEVEL_HOURS), step / elapsed)
+            beta = 1 - np.exp(-step / NOWCAST_TREND_HOURS)
+            gamma = 1 - np.exp(-step / NOWCAST_SEASON_HOURS)
+            
+            seasonal = self.diurnal(rows, observed)
+            level = self.level[rows] + self.trend[rows] * NOWCAST_DAMPING_HOURS * (1 - np.exp(-step / NOWCAST_DAMPING_HOURS))
+            level = level + alpha * (temperature - seasonal - level)
+            self.trend[rows] = (1 - beta) * self.trend[rows] + beta * (level - self.level[rows]) / step
+            self.level[rows] = level
             
-            # Add district boundary as GeoJSON
-            folium.GeoJson(
-                row.geometry,
-                name=district_name,
-                style_function=lambda x: {
-                    'fillColor': 'transparent',
-                    'color': '#0066cc',
-                    'weight': 2,
-                    'fillOpacity': 0
-                },
-                tooltip=district_name
-            ).add_to(district_group)
+            # The profile error is shared between the two bins around the reading's time
+            lower, upper, weight = self.hour_weights(observed)
+            deviation = gamma * (temperature - level - seasonal)
+            self.season[rows, lower] += deviation * (1 - weight)
+            self.season[rows, upper] += deviation * weight
+            # Keep the profile centred so the level stays the daily mean
+            offset = self.season[rows].mean(axis=1)
+            self.season[rows] -= offset[:, None]
+            self.level[rows] += offset
+            self.anomaly[rows] = temperature - self.level[rows] - self.diurnal(rows, observed)
+            self.last[rows] = observed
+            
+            self.issue(rows, observed)
+    
+    def score(self, rows, observed, temperature):
+        """Score every issued forecast that falls due at these readings"""
+        due = self.issued[rows, :, None] + NOWCAST_HORIZONS * 3600
+        # A reading within half an hour after the target time stands in for it
+        ready = self.unscored[rows] & (due <= observed[:, None, None]) & (due > observed[:, None, None] - 1800)
+        self.unscored[rows] &= due > observed[:, None, None]
+        errors = np.where(ready, self.issued_values[rows] - temperature[:, None, None], 0) ** 2
+        counts = ready.sum(axis=1)
+        scored = self.scored[rows] + counts
+        # Running mean over the first NOWCAST_ERROR_MEMORY forecasts, exponential after that
+        weight = counts / np.minimum(np.maximum(scored, 1), NOWCAST_ERROR_MEMORY)
+        mean_error = errors.sum(axis=1) / np.maximum(counts, 1)
+        self.error_variance[rows] += weight * (mean_error - self.error_variance[rows])
+        self.scored[rows] = scored
+    
+    def issue(self, rows, observed):
+        """Issue a forecast for rows whose last one is an hour old"""
+        due = observed - self.issued[rows].max(axis=1) >= 3600
+        rows, observed = rows[due], observed[due]
+        slots = (observed // 3600) % len(NOWCAST_HORIZONS)
+        self.issued[rows, slots] = observed
+        self.issued_values[rows, slots] = self.predict(rows, NOWCAST_HORIZONS)
+        self.unscored[rows, slots] = True
+    
+    def forecast(self, districts):
+        """Forecasts and 95% interval half-widths (districts x horizons) with each district's last reading time
         
-        district_group.add_to(m)
-    else:
-        st.warning("Could not load district boundaries from KML file")
-except Exception as e:
-    st.warning(f"Could not load district boundaries: {str(e)}")
-    pass
+        Half-widths are NaN for a horizon until NOWCAST_MIN_SCORED of its forecasts have been scored.
+        """
+        with self.lock:
+            names = [district for district in districts if district in self.rows and self.first[self.rows[district]] > 0]
+            rows = np.array([self.rows[district] for district in names], dtype=np.int64)
+            values = self.predict(rows, NOWCAST_HORIZONS)
+            spread = np.where(self.scored[rows] >= NOWCAST_MIN_SCORED, 1.96 * np.sqrt(self.error_variance[rows]), np.nan)
+            last = self.last[rows]
+            hours_seen = (last - self.first[rows]) / 3600
+        return names, values, spread, last, hours_seen
+
+@st.cache_resource
+def get_nowcaster():
+    """Nowcast model shared by all sessions in this process"""
+    return Nowcaster()
+
+nowcaster = get_nowcaster()
+alert_engine.subscribe('nowcast', nowcaster.update)
+
+# Watch the region once every consumer of new snapshots has subscribed
+alert_engine.watch(selected_region, lambda: alert_snapshot(df_locations, max_weather_workers), df_districts)
+
+
+# Point layer that ships every point as one compact data array and builds the
+# markers in the browser, so page size grows only with the numbers per point
+class BulkPointLayer(JSCSSMixin, Layer):
+    """Client-side styled point layer with optional marker clustering"""
+    
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(){
+                var columns = {{ this.columns|tojson }};
+                var data = {{ this.data|tojson }};
+                var params = {{ this.params|tojson }};
+                var renderer = L.canvas({padding: 0.5});
+                var fillTemplate = function (template, values) {
+                    return template.replace(/\{(\w+)\}/g, function (match, key) {
+                        return key in values ? values[key] : match;
+                    });
+                };
+                var callback = {{ this.callback }};
+                
+                var markers = new Array(data.length);
+                for (var i = 0; i < data.length; i++) {
+                    var row = {};
+                    for (var j = 0; j < columns.length; j++) {
+                        row[columns[j]] = data[i][j];
+                    }
+                    markers[i] = callback(row, params, renderer, fillTemplate);
+                }
+                
+                {%- if this.cluster %}
+                var group = L.markerClusterGroup({{ this.options|tojavascript }});
+                group.addLayers(markers);
+                {%- else %}
+                var group = L.featureGroup(markers);
+                {%- endif %}
+                group.addTo({{ this._parent.get_name() }});
+                return group;
+            })();
+        {% endmacro %}
+    """)
+    
+    def __init__(self, df, columns, callback, params=None, cluster=False,
+                 name=None, overlay=True, control=True, show=True, **cluster_options):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = "BulkPointLayer"
+        self.columns = list(columns.keys())
+        self.data = df[list(columns.values())].round(4).values.tolist()
+        self.callback = callback.strip()
+        self.params = params or {}
+        self.cluster = cluster
+        self.options = cluster_options
+        if cluster:
+            self.default_js = MarkerCluster.default_js
+            self.default_css = MarkerCluster.default_css
+
+# Clustering only pays off once stations start overlapping at city zoom
+CLUSTER_MIN_POINTS = 50
+
+# Short column keys shipped to the browser for each weather point
+WEATHER_POINT_COLUMNS = {
+    'name': 'Station',
+    'lat': 'Latitude',
+    'lon': 'Longitude',
+    'temperature': 'Temperature',
+    'feels_like': 'Feels Like',
+    'humidity': 'Humidity',
+}
+
+# Weather marker styling as (minimum temperature, marker color, icon), hottest first
+WEATHER_MARKER_BANDS = [
+    (40, "darkred", "fire"),
+    (35, "red", "thermometer-three-quarters"),
+    (30, "orange", "sun"),
+    (25, "green", "cloud-sun"),
+    (-273.15, "blue", "cloud"),
+]
+
+WEATHER_POPUP_TEMPLATE = """
+<div style="font-family: Arial; width: 250px; padding: 10px; border-radius: 8px; background-color: #f0f0f0;">
+    <h4 style="margin: 0 0 10px 0; color: #333;">{name}</h4>
+    <div style="background-color: white; padding: 10px; border-radius: 5px; border-left: 4px solid {color};">
+        <p style="margin: 5px 0;"><b>🌡️ Temperature:</b> {temperature}°C</p>
+        <p style="margin: 5px 0;"><b>🤔 Feels Like:</b> {feels_like}°C</p>
+        <p style="margin: 5px 0;"><b>💧 Humidity:</b> {humidity}%</p>
+        <p style="margin: 10px 0 0 0; padding-top: 8px; border-top: 1px solid #ddd;"><b>Status:</b> {alert}</p>
+    </div>
+</div>
+"""
+
+# Browser-side marker builder for weather stations; popups are filled on click
+WEATHER_MARKER_JS = """
+function (row, params, renderer, fillTemplate) {
+    var band = params.bands.find(function (b) { return row.temperature >= b[0]; }) || params.bands[params.bands.length - 1];
+    var alert = params.alerts.find(function (a) { return row.temperature >= a[0]; }) || params.alerts[params.alerts.length - 1];
+    var marker = L.marker([row.lat, row.lon], {
+        icon: L.AwesomeMarkers.icon({icon: band[2], prefix: 'fa', markerColor: band[1], iconColor: 'white'})
+    });
+    marker.bindTooltip(row.name + ': ' + row.temperature.toFixed(1) + '°C');
+    marker.bindPopup(function () {
+        return fillTemplate(params.popup, {
+            name: row.name,
+            color: band[1],
+            temperature: row.temperature.toFixed(1),
+            feels_like: row.feels_like.toFixed(1),
+            humidity: row.humidity.toFixed(0),
+            alert: alert[1]
+        });
+    }, {maxWidth: 300});
+    return marker;
+}
+"""
 
 # Add LULC Legend to lower right corner
 lulc_legend_html = """
@@ -791,32 +2708,111 @@ lulc_legend_html = """
 </div>
 """
 
-m.get_root().html.add_child(folium.Element(lulc_legend_html))
+# Build the main map and serialize it; reruns with the same layers, weather
+# snapshot and boundaries reuse the cached HTML instead of rebuilding it
+@instrumented_cache('main_map_html', max_entries=16, show_spinner=False)
+def render_main_map(tile_layers, df_weather, boundaries_key, _region_gdf):
+    """Render the main Folium map to HTML"""
+    m = folium.Map(location=[28.6139, 77.2090], zoom_start=10)
+    if _region_gdf is not None and not _region_gdf.empty:
+        min_lon, min_lat, max_lon, max_lat = _region_gdf.total_bounds
+        m.fit_bounds([[min_lat, min_lon], [max_lat, max_lon]])
+    
+    for tile_url, name, opacity in tile_layers:
+        folium.raster_layers.TileLayer(
+            tiles=tile_url,
+            attr='Google Earth Engine',
+            name=name,
+            overlay=True,
+            control=True,
+            opacity=opacity,
+        ).add_to(m)
+    
+    # Add weather markers to map with enhanced styling
+    BulkPointLayer(
+        df_weather,
+        WEATHER_POINT_COLUMNS,
+        WEATHER_MARKER_JS,
+        params={
+            'bands': WEATHER_MARKER_BANDS,
+            'alerts': HEAT_ALERT_LEVELS,
+            'popup': WEATHER_POPUP_TEMPLATE,
+        },
+        cluster=len(df_weather) >= CLUSTER_MIN_POINTS,
+        name="🌡️ Weather Stations",
+    ).add_to(m)
+    
+    # Add district boundaries as a single layer; one GeoJSON for all districts
+    # keeps the page small when the whole NCR is shown
+    if _region_gdf is not None and not _region_gdf.empty:
+        folium.GeoJson(
+            _region_gdf[['District', 'geometry']],
+            name="🏘️ District Boundaries",
+            style_function=lambda x: {
+                'fillColor': 'transparent',
+                'color': '#0066cc',
+                'weight': 2,
+                'fillOpacity': 0
+            },
+            tooltip=folium.GeoJsonTooltip(fields=['District'], labels=False)
+        ).add_to(m)
+    
+    m.get_root().html.add_child(folium.Element(lulc_legend_html))
+    
+    # Add layer control to the map
+    folium.LayerControl(position='topright', collapsed=False).add_to(m)
+    
+    return m.get_root().render()
 
-# Add layer control to the map
-folium.LayerControl(position='topright', collapsed=False).add_to(m)
+start_section("main_map")
+if region_gdf is None:
+    st.warning("Could not load district boundaries")
 
 # Render map in Streamlit - Responsive width
-st_folium(m, width=None, height=600, returned_objects=[])
+main_map_html = render_main_map(tuple(map_layers), df_weather, (selected_region, boundaries_key) if region_gdf is not None else None, region_gdf)
+st.iframe(main_map_html, height=600)
+
+# Build the time series chart; the spec is cached on the series content
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_timeseries_figure(df_ts, region_name):
+    """Plotly spec for the MODIS LST time series"""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=df_ts['Date'],
+        y=df_ts['Mean LST (°C)'],
+        mode='lines+markers',
+        name='Mean LST',
+        line=dict(color='orangered', width=2),
+        marker=dict(size=6)
+    ))
+    
+    fig.update_layout(
+        title=f'MODIS Land Surface Temperature Time Series ({region_name})',
+        xaxis_title='Date',
+        yaxis_title='Temperature (°C)',
+        hovermode='x unified',
+        height=400,
+        template='plotly_white'
+    )
+    
+    return fig.to_dict()
 
 # Time Series Analysis of MODIS LST
+start_section("time_series")
 st.subheader("Time Series Analysis - Historical MODIS Land Surface Temperature")
 
 # Date range selector
 col1, col2 = st.columns([1, 1], gap="medium")
 with col1:
-    start_date = st.date_input("Start Date", datetime.now() - timedelta(days=60))
+    start_date = st.date_input("Start Date", datetime.now() - timedelta(days=TIMESERIES_DEFAULT_DAYS))
 with col2:
     end_date = st.date_input("End Date", datetime.now())
 
+timeseries_is_default = (start_date, end_date) == (
+    datetime.now().date() - timedelta(days=TIMESERIES_DEFAULT_DAYS), datetime.now().date()
+)
+
 try:
-    # Fetch MODIS data for the selected date range
-    modis_collection = (
-        ee.ImageCollection("MODIS/061/MOD11A1")
-        .filterDate(start_date.isoformat(), end_date.isoformat())
-        .select("LST_Day_1km")
-    )
-    
     # Extract time series data for the region
     def extract_lst_stats(image):
         date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd')
@@ -835,11 +2831,50 @@ try:
             'mean_lst': mean_lst
         })
     
-    # Map the function over the collection
-    ts_data = modis_collection.map(extract_lst_stats)
+    # Function to fetch one period of the series from MODIS
+    def fetch_lst_series_chunk(chunk_start, chunk_end):
+        ts_data = (
+            ee.ImageCollection("MODIS/061/MOD11A1")
+            .filterDate(chunk_start.isoformat(), chunk_end.isoformat())
+            .select("LST_Day_1km")
+            .map(extract_lst_stats)
+        )
+        return ee_get_info(ts_data.toList(ts_data.size()), 'lst_time_series')
+    
+    # Split the range at month boundaries so finished months can be shown while
+    # the rest are still loading, and months are reused across nearby ranges
+    chunk_starts = [start_date] + [d.date() for d in pd.date_range(start_date, end_date, freq='MS') if start_date < d.date() < end_date]
+    ts_chunks = list(zip(chunk_starts, chunk_starts[1:] + [end_date]))
+    
+    def fetch_lst_series_chunks(_compute):
+        parts = await_upstream_many("Loading LST time series", [
+            (('lst_time_series', selected_region, chunk_start, chunk_end), lambda s=chunk_start, e=chunk_end: fetch_lst_series_chunk(s, e))
+            for chunk_start, chunk_end in ts_chunks
+        ])
+        finished = [part for part in parts if part is not UPSTREAM_PENDING]
+        if not finished:
+            raise UpstreamDeadlineExceeded("LST time series did not finish in time")
+        series = [feature for part in finished for feature in part]
+        if len(finished) < len(parts):
+            raise PartialResult(series, len(finished), len(parts))
+        return series
     
     # Get the data
-    ts_list = ts_data.toList(ts_data.size()).getInfo()
+    try:
+        ts_list = default_view(
+            'lst_time_series', (selected_region, start_date, end_date),
+            # The worker joins the same per-month calls the inline path awaits
+            lambda: [feature for s, e in ts_chunks for feature in upstream_calls.acquire(
+                shared_cache_key('lst_time_series', selected_region, s, e),
+                lambda s=s, e=e: fetch_lst_series_chunk(s, e), pinned=True
+            ).result()],
+            is_default=timeseries_is_default,
+            label="Loading LST time series",
+            run_inline=fetch_lst_series_chunks
+        )
+    except PartialResult as partial:
+        ts_list = partial.value
+        st.info(f"⏳ Showing {partial.done} of {partial.total} months; the rest are still loading and will appear on the next refresh.")
     
     # Create DataFrame
     dates = []
@@ -860,26 +2895,7 @@ try:
         df_ts = df_ts.sort_values('Date')
         
         # Create interactive time series plot
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=df_ts['Date'],
-            y=df_ts['Mean LST (°C)'],
-            mode='lines+markers',
-            name='Mean LST',
-            line=dict(color='orangered', width=2),
-            marker=dict(size=6)
-        ))
-        
-        fig.update_layout(
-            title='MODIS Land Surface Temperature Time Series (Delhi-NCR Region)',
-            xaxis_title='Date',
-            yaxis_title='Temperature (°C)',
-            hovermode='x unified',
-            height=400,
-            template='plotly_white'
-        )
-        
-        st.plotly_chart(fig, width='stretch')
+        st.plotly_chart(build_timeseries_figure(df_ts, selected_region), width='stretch')
         
         # Display statistics
         col1, col2, col3, col4 = st.columns(4, gap="small")
@@ -897,98 +2913,303 @@ try:
 except Exception as e:
     st.error(f"Error fetching time series data: {str(e)}")
 
+# Build the district temperature bar chart
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_temperature_bar_figure(df_spatial):
+    """Plotly spec for current temperature by district"""
+    fig_bar = go.Figure()
+    fig_bar.add_trace(go.Bar(
+        x=df_spatial['District'],
+        y=df_spatial['Temperature'],
+        marker=dict(
+            color=df_spatial['Temperature'],
+            colorscale='RdYlBu_r',
+            colorbar=dict(title="Temp (°C)"),
+            showscale=True
+        ),
+        text=df_spatial['Temperature'].round(2),
+        textposition='outside',
+        name='Temperature'
+    ))
+
+    fig_bar.update_layout(
+        title='Current Temperature Distribution Across Districts',
+        xaxis_title='District',
+        yaxis_title='Temperature (°C)',
+        height=400,
+        template='plotly_white',
+        showlegend=False
+    )
+    
+    return fig_bar.to_dict()
+
+# Build the temperature vs feels-like scatter plot
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_feels_like_figure(df_spatial):
+    """Plotly spec for actual vs feels-like temperature by district"""
+    fig_scatter = go.Figure()
+    fig_scatter.add_trace(go.Scatter(
+        x=df_spatial['Temperature'],
+        y=df_spatial['Feels Like'],
+        mode='markers+text',
+        marker=dict(
+            size=15,
+            color=df_spatial['Temperature'],
+            colorscale='RdYlBu_r',
+            showscale=True,
+            colorbar=dict(title="Temp (°C)")
+        ),
+        text=df_spatial['District'],
+        textposition='top center',
+        name='Districts'
+    ))
+    
+    fig_scatter.update_layout(
+        title='Temperature vs Feels Like Temperature',
+        xaxis_title='Actual Temperature (°C)',
+        yaxis_title='Feels Like Temperature (°C)',
+        height=400,
+        template='plotly_white'
+    )
+    
+    return fig_scatter.to_dict()
+
+# ==================== Temperature Surface ====================
+
+# Air temperature between stations, interpolated by inverse distance weighting
+# over each cell's nearest stations. A KD-tree finds the neighbours, so a
+# surface costs O(cells log stations) and stays fast with hundreds of stations
+SURFACE_CELL_KM = 0.25
+# Cells are made coarser for large regions to stay under this count
+SURFACE_MAX_CELLS = 250_000
+SURFACE_NEIGHBOURS = 8
+SURFACE_POWER = 2
+# Outside the district outlines, the surface extends this far around the stations
+SURFACE_PADDING_KM = 5
+SURFACE_OPACITY = 0.65
+# Same ramp as the MODIS LST layer
+SURFACE_PALETTE = ["#0000ff", "#00ccff", "#00ff00", "#ffff00", "#ff8800", "#ff0000", "#8b0000"]
+EARTH_RADIUS_KM = 6371.0088
+
+# Function to interpolate scattered values with inverse distance weights
+def idw_interpolate(station_xy, values, target_xy, neighbours=SURFACE_NEIGHBOURS, power=SURFACE_POWER):
+    """IDW estimate at each target from its nearest stations; coordinates in km"""
+    from scipy.spatial import cKDTree
+    
+    k = min(neighbours, len(station_xy))
+    distances, indices = cKDTree(station_xy).query(target_xy, k=k, workers=-1)
+    distances, indices = distances.reshape(len(target_xy), k), indices.reshape(len(target_xy), k)
+    weights = 1 / np.maximum(distances, 1e-6) ** power
+    return (weights * values[indices]).sum(axis=1) / weights.sum(axis=1)
+
+# Function to convert latitudes to Web Mercator y
+def mercator_y(lat):
+    """Web Mercator y (radians) of a latitude in degrees"""
+    return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+# Function to convert Web Mercator y back to latitude
+def inverse_mercator_y(y):
+    """Latitude in degrees of a Web Mercator y (radians)"""
+    return np.degrees(2 * np.arctan(np.exp(y)) - np.pi / 2)
+
+# Interpolate the snapshot's station temperatures onto a grid over the region
+@instrumented_cache('temperature_surface', ttl=WEATHER_SNAPSHOT_TTL, max_entries=16, show_spinner=False)
+def temperature_surface(df_stations, boundaries_key, _district_index):
+    """RGBA image of the interpolated surface with its bounds, range and grid size
+    
+    Rows are evenly spaced in Web Mercator so the image lines up with the map
+    tiles without reprojection. Cells outside the region's districts are
+    transparent.
+    """
+    import shapely
+    
+    lats = df_stations['Latitude'].to_numpy(dtype=np.float64)
+    lons = df_stations['Longitude'].to_numpy(dtype=np.float64)
+    temperatures = df_stations['Temperature'].to_numpy(dtype=np.float64)
+    if _district_index is not None:
+        min_lon, min_lat, max_lon, max_lat = _district_index.shape.bounds
+    else:
+        pad_lat = np.degrees(SURFACE_PADDING_KM / EARTH_RADIUS_KM)
+        pad_lon = pad_lat / np.cos(np.radians(lats.mean()))
+        min_lon, min_lat, max_lon, max_lat = lons.min() - pad_lon, lats.min() - pad_lat, lons.max() + pad_lon, lats.max() + pad_lat
+    
+    # Local equirectangular km, accurate to well under a cell over a region this size
+    cos_lat = np.cos(np.radians((min_lat + max_lat) / 2))
+    km_per_degree = np.radians(EARTH_RADIUS_KM)
+    width_km = (max_lon - min_lon) * km_per_degree * cos_lat
+    height_km = (max_lat - min_lat) * km_per_degree
+    cell_km = max(SURFACE_CELL_KM, np.sqrt(width_km * height_km / SURFACE_MAX_CELLS))
+    width, height = max(int(np.ceil(width_km / cell_km)), 1), max(int(np.ceil(height_km / cell_km)), 1)
+    
+    grid_lons = min_lon + (np.arange(width) + 0.5) * (max_lon - min_lon) / width
+    top, bottom = mercator_y(max_lat), mercator_y(min_lat)
+    grid_lats = inverse_mercator_y(top - (np.arange(height) + 0.5) * (top - bottom) / height)
+    cell_lons, cell_lats = np.meshgrid(grid_lons, grid_lats)
+    if _district_index is not None:
+        inside = shapely.contains_xy(_district_index.shape, cell_lons, cell_lats)
+    else:
+        inside = np.ones(cell_lons.shape, dtype=bool)
+    
+    def to_km(lon, lat):
+        return np.column_stack([(lon - min_lon) * km_per_degree * cos_lat, (lat - min_lat) * km_per_degree])
+    
+    surface = np.full(inside.shape, np.nan)
+    surface[inside] = idw_interpolate(to_km(lons, lats), temperatures, to_km(cell_lons[inside], cell_lats[inside]))
+    
+    # Colour through a 256-step lookup table of the palette
+    vmin, vmax = float(temperatures.min()), float(temperatures.max())
+    stops = np.array([[int(color[i:i + 2], 16) for i in (1, 3, 5)] for color in SURFACE_PALETTE], dtype=np.float64)
+    positions = np.linspace(0, 1, len(stops))
+    ramp = np.linspace(0, 1, 256)
+    lookup = np.column_stack([np.interp(ramp, positions, stops[:, c]) for c in range(3)]).astype(np.uint8)
+    scaled = np.clip((surface - vmin) / max(vmax - vmin, 1e-6), 0, 1)
+    image = np.zeros(inside.shape + (4,), dtype=np.uint8)
+    image[inside, :3] = lookup[np.round(scaled[inside] * 255).astype(np.int64)]
+    image[inside, 3] = 255
+    
+    return {
+        'image': image,
+        'bounds': [[min_lat, min_lon], [max_lat, max_lon]],
+        'min': vmin,
+        'max': vmax,
+        'cell_km': cell_km,
+        'cells': int(inside.sum()),
+    }
+
+HEAT_POPUP_TEMPLATE = """
+<b>{name}</b><br>
+Temperature: {temperature}°C<br>
+Feels Like: {feels_like}°C<br>
+Humidity: {humidity}%<br>
+Anomaly: {anomaly}°C
+"""
+
+# Browser-side station marker for the heat map, filled with the surface's
+# colour for the station's temperature
+HEAT_CIRCLE_JS = """
+function (row, params, renderer, fillTemplate) {
+    var span = params.max - params.min;
+    var normalized = span > 0 ? (row.temperature - params.min) / span : 1;
+    var color = params.palette[Math.round(Math.min(Math.max(normalized, 0), 1) * (params.palette.length - 1))];
+    var anomaly = row.temperature - params.mean;
+    var marker = L.circleMarker([row.lat, row.lon], {
+        renderer: renderer, radius: 6, color: '#333333', fill: true,
+        fillColor: color, fillOpacity: 1, weight: 1, opacity: 0.9
+    });
+    marker.bindPopup(function () {
+        return fillTemplate(params.popup, {
+            name: row.name,
+            temperature: row.temperature.toFixed(1),
+            feels_like: row.feels_like.toFixed(1),
+            humidity: row.humidity.toFixed(0),
+            anomaly: (anomaly >= 0 ? '+' : '') + anomaly.toFixed(2)
+        });
+    }, {maxWidth: 250});
+    return marker;
+}
+"""
+
+# Build the heat distribution map and serialize it
+@instrumented_cache('heat_map_html', max_entries=16, show_spinner=False)
+def render_heat_map(df_stations, boundaries_key, _district_index):
+    """Render the interpolated temperature surface and stations to HTML"""
+    import branca.colormap
+    
+    surface = temperature_surface(df_stations, boundaries_key, _district_index)
+    m_heat = folium.Map(location=[28.6139, 77.2090], zoom_start=10)
+    m_heat.fit_bounds(surface['bounds'])
+    
+    folium.raster_layers.ImageOverlay(
+        image=surface['image'],
+        bounds=surface['bounds'],
+        opacity=SURFACE_OPACITY,
+        name="🌡️ Air Temperature Surface",
+    ).add_to(m_heat)
+    
+    # Stations coloured on the same scale as the surface
+    BulkPointLayer(
+        df_stations,
+        WEATHER_POINT_COLUMNS,
+        HEAT_CIRCLE_JS,
+        params={
+            'min': surface['min'],
+            'max': surface['max'],
+            'mean': float(df_stations['Temperature'].mean()),
+            'palette': SURFACE_PALETTE,
+            'popup': HEAT_POPUP_TEMPLATE,
+        },
+        name="📍 Weather Stations",
+    ).add_to(m_heat)
+    
+    branca.colormap.LinearColormap(
+        SURFACE_PALETTE, vmin=surface['min'], vmax=surface['max'], caption="Air temperature (°C)"
+    ).add_to(m_heat)
+    folium.LayerControl(collapsed=True).add_to(m_heat)
+    
+    return m_heat.get_root().render()
+
+# Build the UHI intensity chart
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_uhi_figure(df_uhi):
+    """Plotly spec for each district's deviation from the mean temperature"""
+    fig_uhi = go.Figure()
+    colors = ['red' if x > 0 else 'blue' for x in df_uhi['UHI Intensity']]
+    
+    fig_uhi.add_trace(go.Bar(
+        x=df_uhi['District'],
+        y=df_uhi['UHI Intensity'],
+        marker=dict(color=colors),
+        text=df_uhi['UHI Intensity'].round(2),
+        textposition='outside',
+        name='UHI Intensity'
+    ))
+    
+    fig_uhi.update_layout(
+        title='Urban Heat Island Intensity (Deviation from Mean)',
+        xaxis_title='District',
+        yaxis_title='Temperature Anomaly (°C)',
+        height=400,
+        template='plotly_white',
+        hovermode='x unified',
+        showlegend=False
+    )
+    
+    fig_uhi.add_hline(y=0, line_dash="dash", line_color="gray")
+    
+    return fig_uhi.to_dict()
+
 # Spatial Distribution Analysis
+start_section("spatial")
 st.subheader("Spatial Distribution Analysis - Temperature Variation Across Districts")
 
 try:
-    # Fetch current weather for all districts
-    district_temps = []
-    for name, lat, lon in locations:
-        w = get_weather(lat, lon)
-        district_temps.append({
-            'District': name,
-            'Temperature': w['temperature'],
-            'Feels Like': w['feels_like'],
-            'Humidity': w['humidity'],
-            'Latitude': lat,
-            'Longitude': lon
-        })
-    
-    df_spatial = pd.DataFrame(district_temps)
+    # Current weather aggregated per district from all stations
+    df_spatial = df_districts
     
     # Create visualizations
     col1, col2 = st.columns([1, 1], gap="medium")
     
     # Spatial heatmap - Bar chart showing temperature distribution
     with col1:
-        fig_bar = go.Figure()
-        fig_bar.add_trace(go.Bar(
-            x=df_spatial['District'],
-            y=df_spatial['Temperature'],
-            marker=dict(
-                color=df_spatial['Temperature'],
-                colorscale='RdYlBu_r',
-                colorbar=dict(title="Temp (°C)"),
-                showscale=True
-            ),
-            text=df_spatial['Temperature'].round(2),
-            textposition='outside',
-            name='Temperature'
-        ))
-        
-        fig_bar.update_layout(
-            title='Current Temperature Distribution Across Districts',
-            xaxis_title='District',
-            yaxis_title='Temperature (°C)',
-            height=400,
-            template='plotly_white',
-            showlegend=False
-        )
-        
-        st.plotly_chart(fig_bar, width='stretch')
+        st.plotly_chart(build_temperature_bar_figure(df_spatial), width='stretch')
     
     # Scatter plot - showing temperature vs feels like
     with col2:
-        fig_scatter = go.Figure()
-        fig_scatter.add_trace(go.Scatter(
-            x=df_spatial['Temperature'],
-            y=df_spatial['Feels Like'],
-            mode='markers+text',
-            marker=dict(
-                size=15,
-                color=df_spatial['Temperature'],
-                colorscale='RdYlBu_r',
-                showscale=True,
-                colorbar=dict(title="Temp (°C)")
-            ),
-            text=df_spatial['District'],
-            textposition='top center',
-            name='Districts'
-        ))
-        
-        fig_scatter.update_layout(
-            title='Temperature vs Feels Like Temperature',
-            xaxis_title='Actual Temperature (°C)',
-            yaxis_title='Feels Like Temperature (°C)',
-            height=400,
-            template='plotly_white'
-        )
-        
-        st.plotly_chart(fig_scatter, width='stretch')
+        st.plotly_chart(build_feels_like_figure(df_spatial), width='stretch')
     
     # Spatial statistics
     st.subheader("Spatial Temperature Statistics")
     
     col1, col2, col3, col4, col5 = st.columns(5, gap="small")
     with col1:
-        st.metric("Max Temp District", df_spatial.loc[df_spatial['Temperature'].idxmax(), 'District'], 
+        st.metric("Max Temp District", df_spatial.loc[df_spatial['Temperature'].idxmax(), 'District'],
                  f"{df_spatial['Temperature'].max():.1f}°C")
     with col2:
         st.metric("Min Temp District", df_spatial.loc[df_spatial['Temperature'].idxmin(), 'District'],
                  f"{df_spatial['Temperature'].min():.1f}°C")
     with col3:
         temp_range = df_spatial['Temperature'].max() - df_spatial['Temperature'].min()
-        st.metric("Temperature Range", f"{temp_range:.1f}°C", 
+        st.metric("Temperature Range", f"{temp_range:.1f}°C",
                  f"(Spatial Variation)")
     with col4:
         st.metric("Avg Temperature", f"{df_spatial['Temperature'].mean():.1f}°C",
@@ -1000,7 +3221,10 @@ try:
     # Detailed district comparison table
     st.subheader("Detailed District Comparison")
     
-    df_display = df_spatial[['District', 'Temperature', 'Feels Like', 'Humidity']].copy()
+    display_columns = ['District', 'Temperature', 'Feels Like', 'Humidity']
+    if df_spatial['Stations'].max() > 1:
+        display_columns.append('Stations')
+    df_display = df_spatial[display_columns].copy()
     df_display['Temp Anomaly'] = df_display['Temperature'] - df_display['Temperature'].mean()
     df_display['Temperature'] = df_display['Temperature'].round(2)
     df_display['Feels Like'] = df_display['Feels Like'].round(2)
@@ -1012,43 +3236,11 @@ try:
     # Heat gradient map visualization
     st.subheader("Heat Distribution Map")
     
-    # Create map with temperature-based colors
-    m_heat = folium.Map(location=[28.6139, 77.2090], zoom_start=10)
-    
-    # Add districts with color intensity based on temperature
-    for idx, row in df_spatial.iterrows():
-        # Normalize temperature to 0-1 for color mapping
-        temp_normalized = (row['Temperature'] - df_spatial['Temperature'].min()) / (df_spatial['Temperature'].max() - df_spatial['Temperature'].min())
-        
-        # Color mapping: blue (cold) to red (hot)
-        if temp_normalized < 0.33:
-            color = 'blue'
-        elif temp_normalized < 0.66:
-            color = 'orange'
-        else:
-            color = 'red'
-        
-        popup_text = f"""
-<b>{row['District']}</b><br>
-Temperature: {row['Temperature']:.1f}°C<br>
-Feels Like: {row['Feels Like']:.1f}°C<br>
-Humidity: {row['Humidity']:.0f}%<br>
-Anomaly: {row['Temperature'] - df_spatial['Temperature'].mean():+.2f}°C
-"""
-        
-        folium.CircleMarker(
-            location=[row['Latitude'], row['Longitude']],
-            radius=20,
-            popup=folium.Popup(popup_text, max_width=250),
-            color=color,
-            fill=True,
-            fillColor=color,
-            fillOpacity=0.7,
-            weight=2,
-            opacity=0.9
-        ).add_to(m_heat)
-    
-    st_folium(m_heat, width=None, height=600, returned_objects=[])
+    # Surface interpolated from the current snapshot, masked to the region's districts
+    st.iframe(render_heat_map(df_weather, (selected_region, boundaries_key), district_index), height=600)
+    surface = temperature_surface(df_weather, (selected_region, boundaries_key), district_index)
+    st.caption(f"Air temperature interpolated from {len(df_weather)} stations by inverse distance weighting "
+               f"({SURFACE_NEIGHBOURS} nearest stations) on {surface['cells']:,} cells of {surface['cell_km']:.2f} km")
     
     # Urban Heat Island Analysis
     st.subheader("Urban Heat Island (UHI) Analysis")
@@ -1058,31 +3250,7 @@ Anomaly: {row['Temperature'] - df_spatial['Temperature'].mean():+.2f}°C
     df_uhi['UHI Intensity'] = df_uhi['Temperature'] - mean_temp
     
     # Create UHI intensity chart
-    fig_uhi = go.Figure()
-    colors = ['red' if x > 0 else 'blue' for x in df_uhi['UHI Intensity']]
-    
-    fig_uhi.add_trace(go.Bar(
-        x=df_uhi['District'],
-        y=df_uhi['UHI Intensity'],
-        marker=dict(color=colors),
-        text=df_uhi['UHI Intensity'].round(2),
-        textposition='outside',
-        name='UHI Intensity'
-    ))
-    
-    fig_uhi.update_layout(
-        title='Urban Heat Island Intensity (Deviation from Mean)',
-        xaxis_title='District',
-        yaxis_title='Temperature Anomaly (°C)',
-        height=400,
-        template='plotly_white',
-        hovermode='x unified',
-        showlegend=False
-    )
-    
-    fig_uhi.add_hline(y=0, line_dash="dash", line_color="gray")
-    
-    st.plotly_chart(fig_uhi, width='stretch')
+    st.plotly_chart(build_uhi_figure(df_uhi), width='stretch')
     
     # UHI Summary
     hottest_district = df_uhi.loc[df_uhi['UHI Intensity'].idxmax()]
@@ -1105,111 +3273,529 @@ Anomaly: {row['Temperature'] - df_spatial['Temperature'].mean():+.2f}°C
 except Exception as e:
     st.error(f"Error in spatial distribution analysis: {str(e)}")
 
-# Greenery Effect on Urban Heat Island Analysis
-st.subheader("Impact of Vegetation on Urban Heat Island Effect")
+# Build the NDVI distribution chart
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_ndvi_bar_figure(df_greenery):
+    """Plotly spec for sampled NDVI by district"""
+    fig_ndvi = go.Figure()
+    fig_ndvi.add_trace(go.Bar(
+        x=df_greenery['City'],
+        y=df_greenery['NDVI'],
+        marker=dict(
+            color=df_greenery['NDVI'],
+            colorscale='RdYlGn',
+            showscale=True,
+            colorbar=dict(title="NDVI")
+        ),
+        text=df_greenery['NDVI'].round(3),
+        textposition='outside',
+        name='NDVI'
+    ))
+    
+    fig_ndvi.update_layout(
+        title='Vegetation Index (NDVI) Distribution',
+        xaxis_title='City',
+        yaxis_title='NDVI Value',
+        height=400,
+        template='plotly_white',
+        showlegend=False
+    )
+    
+    return fig_ndvi.to_dict()
+
+# Build the vegetation vs temperature scatter plot
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_ndvi_temperature_figure(df_greenery):
+    """Plotly spec for district NDVI against air temperature"""
+    fig_corr = go.Figure()
+    fig_corr.add_trace(go.Scatter(
+        x=df_greenery['NDVI'],
+        y=df_greenery['Temperature'],
+        mode='markers+text',
+        marker=dict(
+            size=15,
+            color=df_greenery['Temperature'],
+            colorscale='RdYlBu_r',
+            showscale=True,
+            colorbar=dict(title="Temp (°C)")
+        ),
+        text=df_greenery['City'],
+        textposition='top center',
+        name='Cities'
+    ))
+    
+    fig_corr.update_layout(
+        title='Vegetation vs Temperature Relationship',
+        xaxis_title='Vegetation Index (NDVI)',
+        yaxis_title='Temperature (°C)',
+        height=400,
+        template='plotly_white'
+    )
+    
+    return fig_corr.to_dict()
+
+# Sample Sentinel-2 NDVI at every station in one Earth Engine request
+@instrumented_cache('station_ndvi', ttl=3600, show_spinner=False)
+def sample_station_ndvi(df_locations, start_date, end_date):
+    """NDVI per station name; stations without cloud-free imagery are omitted"""
+    points = ee.FeatureCollection([
+        ee.Feature(ee.Geometry.Point([lon, lat]), {'station': name})
+        for name, lat, lon in df_locations[['Station', 'Latitude', 'Longitude']].itertuples(index=False, name=None)
+    ])
+    
+    # Fetch Sentinel-2 NDVI covering all stations
+    sentinel_collection = (
+        ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
+        .filterDate(start_date.isoformat(), end_date.isoformat())
+        .filterBounds(points)
+        .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
+        .median()
+    )
+    
+    ndvi = sentinel_collection.normalizedDifference(['B8', 'B4'])
+    
+    # Sample NDVI value at each station
+    samples = ee_get_info(ndvi.sampleRegions(collection=points, properties=['station'], scale=500), 'station_ndvi')
+    return {
+        feature['properties']['station']: feature['properties'].get('nd')
+        for feature in samples.get('features', [])
+        if feature['properties'].get('nd') is not None
+    }
+
+# Greenery Effect on Urban Heat Island Analysis
+start_section("greenery")
+st.subheader("Impact of Vegetation on Urban Heat Island Effect")
+
+try:
+    # Fetch NDVI data for every station
+    try:
+        station_ndvi = default_view(
+            'station_ndvi', (df_locations, modis_start_date, modis_end_date),
+            lambda: sample_station_ndvi(df_locations, modis_start_date, modis_end_date),
+            is_default=modis_is_default
+        )
+    except Exception:
+        station_ndvi = {}
+    
+    # If sampling fails for a station, use default moderate vegetation
+    df_ndvi = df_weather[['Station', 'District', 'Temperature']].copy()
+    df_ndvi['NDVI'] = df_ndvi['Station'].map(station_ndvi).fillna(0.3)
+    
+    df_greenery = (
+        df_ndvi.groupby('District', sort=False)[['NDVI', 'Temperature']].mean()
+        .reset_index()
+        .rename(columns={'District': 'City'})
+    )
+    
+    # Create visualizations for greenery-temperature relationship
+    col1, col2 = st.columns([1, 1], gap="medium")
+    
+    # NDVI distribution chart
+    with col1:
+        st.plotly_chart(build_ndvi_bar_figure(df_greenery), width='stretch')
+    
+    # Correlation scatter plot - NDVI vs Temperature
+    with col2:
+        st.plotly_chart(build_ndvi_temperature_figure(df_greenery), width='stretch')
+
+except Exception as e:
+    st.error(f"Error in greenery analysis: {str(e)}")
+
+# Map land cover codes to names
+lulc_names = {
+    10: 'Tree Cover', 20: 'Shrubland', 30: 'Grassland', 40: 'Cropland',
+    50: 'Built-up', 60: 'Bare/Sparse', 70: 'Snow/Ice', 80: 'Water',
+    90: 'Wetland', 95: 'Mangroves', 100: 'Moss/Lichen'
+}
+
+# Color mapping for land cover
+lulc_colors = {
+    'Tree Cover': '#006400',
+    'Shrubland': '#FFBB22',
+    'Grassland': '#FFFF4C',
+    'Cropland': '#F096FF',
+    'Built-up': '#FA0000',
+    'Bare/Sparse': '#B4B4B4',
+    'Snow/Ice': '#F0F0F0',
+    'Water': '#0064C8',
+    'Wetland': '#0096A0',
+    'Mangroves': '#00CF75',
+    'Moss/Lichen': '#FAE6A0'
+}
+
+# Above these sample counts the NDVI vs LST plot switches to WebGL markers,
+# then to per-class 2D bins, so its payload stays bounded
+SCATTER_WEBGL_POINTS = 2000
+SCATTER_DENSITY_POINTS = 20000
+SCATTER_DENSITY_BINS = 60
+
+# Build the land cover distribution pie chart
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_lulc_pie_figure(class_stats):
+    """Plotly spec for the sampled land cover distribution"""
+    # Area coverage from the sample weights, which scale each class to its area share
+    lulc_area = class_stats.sort_values('weight', ascending=False)
+    
+    colors_list = [lulc_colors.get(name, '#999999') for name in lulc_area['name']]
+    
+    fig_pie = go.Figure(data=[go.Pie(
+        labels=lulc_area['name'],
+        values=lulc_area['weight'],
+        marker=dict(colors=colors_list),
+        textposition='inside',
+        textinfo='label+percent',
+        customdata=lulc_area['count'],
+        hovertemplate='<b>%{label}</b><br>Coverage: %{percent}<br>Samples: %{customdata}<extra></extra>'
+    )])
+    
+    fig_pie.update_layout(
+        title='Land Use/Land Cover Distribution',
+        height=450,
+        template='plotly_white',
+        showlegend=True
+    )
+    
+    return fig_pie.to_dict()
+
+# Build the land cover area bar chart
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_lulc_area_figure(class_stats):
+    """Plotly spec for land cover coverage colored by mean LST"""
+    # Create bar chart with area coverage and temperature
+    lulc_summary = class_stats.sort_values('area_pct', ascending=True)
+    
+    fig_area_temp = go.Figure()
+    
+    # Bar for area coverage
+    fig_area_temp.add_trace(go.Bar(
+        y=lulc_summary['name'],
+        x=lulc_summary['area_pct'].round(2),
+        name='Area Coverage (%)',
+        orientation='h',
+        marker=dict(
+            color=lulc_summary['lst_mean'],
+            colorscale='RdYlBu_r',
+            showscale=True,
+            colorbar=dict(title="Temp (°C)", x=1.15)
+        ),
+        text=lulc_summary['area_pct'].apply(lambda x: f'{x:.1f}%'),
+        textposition='auto',
+        hovertemplate='<b>%{y}</b><br>Coverage: %{x:.1f}%<br>Avg Temp: %{marker.color:.1f}°C<extra></extra>'
+    ))
+    
+    fig_area_temp.update_layout(
+        title='Land Cover Area Coverage (colored by temperature)',
+        xaxis_title='Area Coverage (%)',
+        yaxis_title='Land Use Type',
+        height=450,
+        template='plotly_white',
+        showlegend=False
+    )
+    
+    return fig_area_temp.to_dict()
+
+# Build the NDVI vs LST scatter plot with trend line
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_ndvi_lst_scatter_figure(df_corr, class_stats, corr_ndvi_lst):
+    """Plotly spec for NDVI vs LST by land cover with a linear trend line"""
+    fig_scatter = go.Figure()
+    
+    # Split the points by class once; each class is a contiguous run after a stable sort
+    land_cover = df_corr['LandCover'].to_numpy()
+    order = np.argsort(land_cover, kind='stable')
+    runs = np.split(order, np.cumsum(class_stats['count'].to_numpy())[:-1])
+    ndvi, lst = df_corr['NDVI'].to_numpy(), df_corr['LST'].to_numpy()
+    
+    # Large samples are binned on a grid shared by all classes
+    binned = len(df_corr) > SCATTER_DENSITY_POINTS
+    if binned:
+        ndvi_edges = np.linspace(ndvi.min(), ndvi.max(), SCATTER_DENSITY_BINS + 1)
+        lst_edges = np.linspace(lst.min(), lst.max(), SCATTER_DENSITY_BINS + 1)
+        ndvi_centers = (ndvi_edges[:-1] + ndvi_edges[1:]) / 2
+        lst_centers = (lst_edges[:-1] + lst_edges[1:]) / 2
+    marker_trace = go.Scattergl if len(df_corr) > SCATTER_WEBGL_POINTS else go.Scatter
+    
+    # Color by land cover
+    for (lc_code, row), rows in zip(class_stats.iterrows(), runs):
+        if lc_code not in lulc_names:
+            continue
+        name = f"{row['name']} ({row['area_pct']:.1f}%)"
+        
+        if binned:
+            # One marker per occupied bin, sized by how many samples fall in it
+            counts, _, _ = np.histogram2d(ndvi[rows], lst[rows], bins=[ndvi_edges, lst_edges])
+            i, j = np.nonzero(counts)
+            fig_scatter.add_trace(marker_trace(
+                x=ndvi_centers[i],
+                y=lst_centers[j],
+                mode='markers',
+                name=name,
+                customdata=counts[i, j],
+                marker=dict(size=4 + 14 * np.sqrt(counts[i, j] / counts.max()), opacity=0.6),
+                hovertemplate='NDVI %{x:.2f}, LST %{y:.1f}°C<br>%{customdata:,.0f} samples<extra></extra>'
+            ))
+            continue
+        
+        # Calculate size based on area coverage
+        marker_size = max(6, min(15, row['area_pct'] * 2))  # Scale size by coverage
+        
+        fig_scatter.add_trace(marker_trace(
+            x=ndvi[rows],
+            y=lst[rows],
+            mode='markers',
+            name=name,
+            marker=dict(size=marker_size, opacity=0.6)
+        ))
+    
+    # Add area-weighted trend line
+    z = np.polyfit(ndvi, lst, 1, w=np.sqrt(df_corr['Weight'].to_numpy()))
+    p = np.poly1d(z)
+    x_trend = np.linspace(ndvi.min(), ndvi.max(), 100)
+    
+    fig_scatter.add_trace(go.Scatter(
+        x=x_trend,
+        y=p(x_trend),
+        mode='lines',
+        name='Trend Line',
+        line=dict(color='black', width=2, dash='dash')
+    ))
+    
+    fig_scatter.update_layout(
+        title=f'NDVI vs LST (Correlation: {corr_ndvi_lst:.3f}' + (f', {len(df_corr):,} samples binned)' if binned else ')'),
+        xaxis_title='Vegetation Index (NDVI)',
+        yaxis_title='Land Surface Temperature (°C)',
+        height=450,
+        template='plotly_white',
+        showlegend=True
+    )
+    
+    return fig_scatter.to_dict()
+
+# Build the temperature by land use box plots
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_lulc_box_figure(class_stats):
+    """Plotly spec for the LST distribution of each land cover class"""
+    fig_box = go.Figure()
+    
+    # Boxes are drawn from the precomputed quartiles, so no raw samples are sent
+    for lc_code, row in class_stats.iterrows():
+        if lc_code not in lulc_names:
+            continue
+        fig_box.add_trace(go.Box(
+            x=[row['name']],
+            q1=[row['lst_q1']],
+            median=[row['lst_median']],
+            q3=[row['lst_q3']],
+            lowerfence=[row['lst_lower_fence']],
+            upperfence=[row['lst_upper_fence']],
+            mean=[row['lst_mean']],
+            sd=[0 if np.isnan(row['lst_std']) else row['lst_std']],
+            name=row['name'],
+            boxmean='sd'
+        ))
+    
+    fig_box.update_layout(
+        title='Temperature Distribution by Land Use Type',
+        yaxis_title='Land Surface Temperature (°C)',
+        height=450,
+        template='plotly_white',
+        showlegend=False
+    )
+    
+    return fig_box.to_dict()
+
+# ==================== Class Aggregation ====================
 
-try:
-    # Fetch NDVI data for each location
-    ndvi_values = []
+# Function to aggregate sampled points by land cover class in one pass
+def class_statistics(df, weights):
+    """Per-class counts, area weights, LST moments and quantiles, and NDVI means"""
+    codes, inverse = np.unique(df['LandCover'].to_numpy(), return_inverse=True)
+    lst, ndvi = df['LST'].to_numpy(dtype=float), df['NDVI'].to_numpy(dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    k = len(codes)
     
-    for name, lat, lon in locations:
-        try:
-            # Create point geometry
-            point = ee.Geometry.Point([lon, lat])
-            
-            # Fetch Sentinel-2 NDVI for the location
-            sentinel_collection = (
-                ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
-                .filterDate(modis_start_date.isoformat(), modis_end_date.isoformat())
-                .filterBounds(point.buffer(500))
-                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-                .median()
-            )
-            
-            ndvi = sentinel_collection.normalizedDifference(['B8', 'B4'])
-            
-            # Sample NDVI value
-            ndvi_sample = ndvi.sample(point, 500).first().get('nd').getInfo()
-            
-            ndvi_values.append({
-                'City': name,
-                'NDVI': ndvi_sample if ndvi_sample else 0,
-                'Temperature': next((item['Temperature'] for item in district_temps if item['District'] == name), None)
-            })
-        except:
-            # If sampling fails, use default NDVI
-            ndvi_values.append({
-                'City': name,
-                'NDVI': 0.3,  # Default moderate vegetation
-                'Temperature': next((item['Temperature'] for item in district_temps if item['District'] == name), None)
-            })
+    count = np.bincount(inverse, minlength=k)
+    weight = np.bincount(inverse, weights, minlength=k)
+    lst_mean = np.bincount(inverse, lst, minlength=k) / count
+    squares = np.bincount(inverse, (lst - lst_mean[inverse]) ** 2, minlength=k)
+    lst_std = np.sqrt(np.divide(squares, count - 1, out=np.full(k, np.nan), where=count > 1))
     
-    df_greenery = pd.DataFrame(ndvi_values)
+    # One sort by class then LST gives every class's values as a contiguous run
+    order = np.lexsort((lst, inverse))
+    ordered = lst[order]
+    starts = np.cumsum(count) - count
     
-    # Create visualizations for greenery-temperature relationship
-    col1, col2 = st.columns([1, 1], gap="medium")
+    def quantile(q):
+        position = starts + q * (count - 1)
+        low, high = np.floor(position).astype(int), np.ceil(position).astype(int)
+        return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
     
-    # NDVI distribution chart
-    with col1:
-        fig_ndvi = go.Figure()
-        fig_ndvi.add_trace(go.Bar(
-            x=df_greenery['City'],
-            y=df_greenery['NDVI'],
-            marker=dict(
-                color=df_greenery['NDVI'],
-                colorscale='RdYlGn',
-                showscale=True,
-                colorbar=dict(title="NDVI")
-            ),
-            text=df_greenery['NDVI'].round(3),
-            textposition='outside',
-            name='NDVI'
-        ))
-        
-        fig_ndvi.update_layout(
-            title='Vegetation Index (NDVI) Distribution',
-            xaxis_title='City',
-            yaxis_title='NDVI Value',
-            height=400,
-            template='plotly_white',
-            showlegend=False
-        )
-        
-        st.plotly_chart(fig_ndvi, width='stretch')
+    q1, median, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+    # Box plot whiskers: the most extreme values within 1.5 IQR of the quartiles
+    ordered_class = inverse[order]
+    lower = np.where(ordered >= (q1 - 1.5 * (q3 - q1))[ordered_class], ordered, np.inf)
+    upper = np.where(ordered <= (q3 + 1.5 * (q3 - q1))[ordered_class], ordered, -np.inf)
     
-    # Correlation scatter plot - NDVI vs Temperature
-    with col2:
-        fig_corr = go.Figure()
-        fig_corr.add_trace(go.Scatter(
-            x=df_greenery['NDVI'],
-            y=df_greenery['Temperature'],
-            mode='markers+text',
-            marker=dict(
-                size=15,
-                color=df_greenery['Temperature'],
-                colorscale='RdYlBu_r',
-                showscale=True,
-                colorbar=dict(title="Temp (°C)")
-            ),
-            text=df_greenery['City'],
-            textposition='top center',
-            name='Cities'
-        ))
-        
-        fig_corr.update_layout(
-            title='Vegetation vs Temperature Relationship',
-            xaxis_title='Vegetation Index (NDVI)',
-            yaxis_title='Temperature (°C)',
-            height=400,
-            template='plotly_white'
+    stats = pd.DataFrame({
+        'name': [lulc_names.get(int(c), 'Other') for c in codes],
+        'count': count,
+        'weight': weight,
+        'area_pct': weight / weight.sum() * 100 if weight.sum() > 0 else np.zeros(k),
+        'lst_mean': lst_mean,
+        'lst_weighted_sum': np.bincount(inverse, weights * lst, minlength=k),
+        'lst_std': lst_std,
+        'lst_ci': np.nan_to_num(SAMPLING_Z * lst_std / np.sqrt(count), nan=np.inf),
+        'lst_min': ordered[starts],
+        'lst_q1': q1,
+        'lst_median': median,
+        'lst_q3': q3,
+        'lst_max': ordered[starts + count - 1],
+        'lst_lower_fence': np.minimum.reduceat(lower, starts) if k else [],
+        'lst_upper_fence': np.maximum.reduceat(upper, starts) if k else [],
+        'ndvi_mean': np.bincount(inverse, ndvi, minlength=k) / count,
+    }, index=pd.Index(codes.astype(int), name='LandCover'))
+    return stats
+
+# ==================== Adaptive Stratified Sampling ====================
+# The correlation sample is stratified by WorldCover class. Every class
+# starts with a small sample; later rounds request more points only for the
+# classes whose statistics are not yet precise enough.
+SAMPLING_SCALE = 500
+SAMPLING_INITIAL_POINTS = 25          # per class, first round
+SAMPLING_MAX_POINTS_PER_CLASS = 400
+SAMPLING_MAX_ROUNDS = 4
+SAMPLING_TARGET_LST_CI = 0.5          # °C, 95% half-width of each class's mean LST
+SAMPLING_TARGET_CORR_CI = 0.1         # 95% half-width of the NDVI-LST correlation
+SAMPLING_Z = 1.96
+
+# Function to tabulate sampled features, dropping implausible values
+def sample_frame(features):
+    """LST, NDVI and LandCover of the valid sampled points"""
+    columns = ['LST', 'NDVI', 'LandCover']
+    df = pd.DataFrame(
+        [{c: f['properties'][c] for c in columns} for f in features if all(c in f['properties'] for c in columns)],
+        columns=columns
+    )
+    df = df[(df['LST'] > -50) & (df['LST'] < 60)]  # Reasonable temperature range
+    return df[(df['NDVI'] >= -1) & (df['NDVI'] <= 1)].reset_index(drop=True)  # Valid NDVI range
+
+# Function to weight each sample by its class's share of the region's area
+def stratum_weights(land_cover, class_areas):
+    """Design weights that scale each class's samples to its area share, averaging 1"""
+    codes, inverse, counts = np.unique(np.asarray(land_cover), return_inverse=True, return_counts=True)
+    areas = np.array([(class_areas or {}).get(int(c), 0) for c in codes], dtype=float)
+    if len(codes) == 0 or areas.sum() == 0:
+        return np.ones(len(inverse))
+    return (areas / areas.sum() / counts * len(inverse))[inverse]
+
+# Function to compute a weighted Pearson correlation
+def weighted_correlation(x, y, weights):
+    """Correlation of x and y with observation weights"""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    dx, dy = x - np.average(x, weights=weights), y - np.average(y, weights=weights)
+    variance = np.average(dx ** 2, weights=weights) * np.average(dy ** 2, weights=weights)
+    return float(np.average(dx * dy, weights=weights) / np.sqrt(variance)) if variance > 0 else float('nan')
+
+# Function to measure how precise the sampled statistics are
+def sampling_precision(df, class_areas):
+    """Per-class statistics with their LST intervals, and the NDVI-LST correlation with its interval"""
+    weights = stratum_weights(df['LandCover'], class_areas)
+    stats = class_statistics(df, weights)
+    corr = weighted_correlation(df['NDVI'], df['LST'], weights) if len(df) > 2 else float('nan')
+    # Fisher z interval on the Kish effective sample size of the weighted sample
+    n_effective = weights.sum() ** 2 / (weights ** 2).sum() if len(df) else 0
+    corr_ci = SAMPLING_Z * (1 - corr ** 2) / np.sqrt(n_effective - 3) if n_effective > 3 and np.isfinite(corr) else np.inf
+    return stats, corr, corr_ci, n_effective
+
+# Function to decide how many more points each class needs
+def points_still_needed(df, class_areas, classes):
+    """Additional points per class to reach the LST and correlation targets"""
+    stats, corr, corr_ci, n_effective = sampling_precision(df, class_areas)
+    total_area = sum(class_areas.get(c, 0) for c in classes) if class_areas else 0
+    needed = {}
+    for c in classes:
+        n = int(stats.at[c, 'count']) if c in stats.index else 0
+        if n < 2:
+            target = 2 * max(n, SAMPLING_INITIAL_POINTS)
+        else:
+            # n such that z * s / sqrt(n) reaches the target half-width
+            target = int(np.ceil((SAMPLING_Z * stats.at[c, 'lst_std'] / SAMPLING_TARGET_LST_CI) ** 2))
+        if corr_ci > SAMPLING_TARGET_CORR_CI and np.isfinite(corr) and total_area:
+            # Spread the sample the correlation needs over the classes by area
+            n_required = 3 + (SAMPLING_Z * (1 - corr ** 2) / SAMPLING_TARGET_CORR_CI) ** 2
+            target = max(target, int(np.ceil(n_required * class_areas.get(c, 0) / total_area)))
+        target = min(target, SAMPLING_MAX_POINTS_PER_CLASS)
+        if target > n:
+            needed[c] = target - n
+    return needed
+
+# Function to sample an image by land cover class in rounds until the
+# class means and the NDVI-LST correlation reach their target precision
+def adaptive_stratified_sample(image, geometry, class_areas, max_rounds=SAMPLING_MAX_ROUNDS, seed=42):
+    """Stratified sample features, the rounds taken and the classes short of their target"""
+    class_areas = {int(c): area for c, area in (class_areas or {}).items() if area > 0}
+    classes = sorted(class_areas) or sorted(lulc_names)
+    requested = {c: SAMPLING_INITIAL_POINTS for c in classes}
+    features, seen, exhausted = [], set(), set()
+    needed, rounds = requested, 0
+    while requested and rounds < max_rounds:
+        sample_points = image.stratifiedSample(
+            numPoints=0,
+            classBand='LandCover',
+            region=geometry,
+            scale=SAMPLING_SCALE,
+            classValues=list(requested),
+            classPoints=list(requested.values()),
+            seed=seed + rounds,
+            geometries=True
         )
+        batch = ee_get_info(sample_points, 'correlation_sample')['features']
+        rounds += 1
+        
+        # Later rounds use new seeds and can return pixels already sampled
+        for feature in batch:
+            location = tuple(feature['geometry']['coordinates'])
+            if location not in seen:
+                seen.add(location)
+                features.append(feature)
         
-        st.plotly_chart(fig_corr, width='stretch')
+        # A class that returns fewer points than requested has no more pixels
+        returned = pd.Series([f['properties'].get('LandCover') for f in batch]).value_counts()
+        exhausted.update(c for c, n in requested.items() if returned.get(c, 0) < n)
+        needed = points_still_needed(sample_frame(features), class_areas, classes)
+        requested = {c: n for c, n in needed.items() if c not in exhausted}
+    
+    return {'type': 'FeatureCollection', 'features': features, 'rounds': rounds, 'unmet_classes': sorted(needed)}
 
-except Exception as e:
-    st.error(f"Error in greenery analysis: {str(e)}")
+# Function to combine mean LST, mean NDVI and land cover for a period
+def period_composite(start_date, end_date):
+    """Image with LST (°C), NDVI and LandCover bands averaged over a date range"""
+    # Get LST data using selected date range
+    lst_image = (
+        ee.ImageCollection("MODIS/061/MOD11A1")
+        .filterDate(start_date.isoformat(), end_date.isoformat())
+        .select("LST_Day_1km")
+        .mean()
+    )
+    lst_celsius_sample = lst_image.multiply(0.02).subtract(273.15)
+    
+    # Get NDVI data using selected date range
+    ndvi_image = (
+        ee.ImageCollection("MODIS/061/MOD13A2")
+        .filterDate(start_date.isoformat(), end_date.isoformat())
+        .select("NDVI")
+        .mean()
+    ).divide(10000)
+    
+    # Get Land Cover data
+    lulc_image = ee.ImageCollection("ESA/WorldCover/v200").first()
+    
+    # Combine all bands
+    combined_image = lst_celsius_sample.addBands(ndvi_image).addBands(lulc_image)
+    return combined_image.select(['LST_Day_1km', 'NDVI', 'Map'], ['LST', 'NDVI', 'LandCover'])
 
 # ==================== Multi-Variable Correlation Analysis ====================
+start_section("correlation")
 st.header("📊 Multi-Variable Correlation Analysis: NDVI, LST & Land Use")
 st.markdown("""
 Analyze the relationships between vegetation (NDVI), land surface temperature (LST), 
@@ -1223,7 +3809,7 @@ col_date1, col_date2 = st.columns([1, 1], gap="medium")
 with col_date1:
     corr_start_date = st.date_input(
         "Analysis Start Date",
-        value=datetime(2025, 12, 31).date(),
+        value=CORR_DEFAULT_START,
         min_value=datetime(2000, 1, 1).date(),
         max_value=datetime.now().date(),
         help="Select start date for correlation analysis (MODIS data available from 2000)"
@@ -1232,7 +3818,7 @@ with col_date1:
 with col_date2:
     corr_end_date = st.date_input(
         "Analysis End Date",
-        value=datetime(2026, 1, 30).date(),
+        value=CORR_DEFAULT_END,
         min_value=datetime(2000, 1, 1).date(),
         max_value=datetime.now().date(),
         help="Select end date for correlation analysis"
@@ -1256,74 +3842,50 @@ try:
     else:
         sampling_geometry = region
     
-    # Get LST data using selected date range
-    lst_image = (
-        ee.ImageCollection("MODIS/061/MOD11A1")
-        .filterDate(corr_start_date.isoformat(), corr_end_date.isoformat())
-        .select("LST_Day_1km")
-        .mean()
-    )
-    lst_celsius_sample = lst_image.multiply(0.02).subtract(273.15)
-    
-    # Get NDVI data using selected date range
-    ndvi_image = (
-        ee.ImageCollection("MODIS/061/MOD13A2")
-        .filterDate(corr_start_date.isoformat(), corr_end_date.isoformat())
-        .select("NDVI")
-        .mean()
-    ).divide(10000)
-    
-    # Get Land Cover data
-    lulc_image = ee.ImageCollection("ESA/WorldCover/v200").first()
-    
-    # Combine all bands
-    combined_image = lst_celsius_sample.addBands(ndvi_image).addBands(lulc_image)
-    combined_image = combined_image.select(['LST_Day_1km', 'NDVI', 'Map'], ['LST', 'NDVI', 'LandCover'])
+    # LST, NDVI and land cover for the selected date range
+    combined_image = period_composite(corr_start_date, corr_end_date)
     
     # Sample random points
     with st.spinner("Sampling data across Delhi districts..."):
-        sample_points = combined_image.sample(
-            region=sampling_geometry,
-            scale=500,  # 500m resolution
-            numPixels=500,  # Sample 500 points
-            seed=42,
-            geometries=True
+        # Class areas steer how many points each class gets; the first round
+        # is shown while later rounds top up the classes that need it
+        class_areas = land_use_stats['Map'] if land_use_stats and 'Map' in land_use_stats else None
+        sample_data = progressive_view(
+            'correlation_sample', (selected_region, corr_start_date, corr_end_date), [
+                ('first-round', lambda: adaptive_stratified_sample(combined_image, sampling_geometry, class_areas, max_rounds=1)),
+                ('adaptive', lambda: adaptive_stratified_sample(combined_image, sampling_geometry, class_areas)),
+            ],
+            is_default=(corr_start_date, corr_end_date) == (CORR_DEFAULT_START, CORR_DEFAULT_END),
+            label=f"Sampling data across {selected_region} districts"
         )
         
-        # Get the data
-        sample_data = sample_points.getInfo()
-        
         if sample_data and 'features' in sample_data and len(sample_data['features']) > 0:
-            # Extract data into DataFrame
-            data_list = []
-            for feature in sample_data['features']:
-                props = feature['properties']
-                if 'LST' in props and 'NDVI' in props and 'LandCover' in props:
-                    data_list.append({
-                        'LST': props['LST'],
-                        'NDVI': props['NDVI'],
-                        'LandCover': props['LandCover']
-                    })
-            
-            df_corr = pd.DataFrame(data_list)
-            
-            # Filter out invalid values
-            df_corr = df_corr[(df_corr['LST'] > -50) & (df_corr['LST'] < 60)]  # Reasonable temperature range
-            df_corr = df_corr[(df_corr['NDVI'] >= -1) & (df_corr['NDVI'] <= 1)]  # Valid NDVI range
+            # Extract valid points into a DataFrame
+            df_corr = sample_frame(sample_data['features'])
             
             # Map land cover codes to names
-            lulc_names = {
-                10: 'Tree Cover', 20: 'Shrubland', 30: 'Grassland', 40: 'Cropland',
-                50: 'Built-up', 60: 'Bare/Sparse', 70: 'Snow/Ice', 80: 'Water',
-                90: 'Wetland', 95: 'Mangroves', 100: 'Moss/Lichen'
-            }
             df_corr['LandCover_Name'] = df_corr['LandCover'].map(lulc_names).fillna('Other')
             
+            # Weight each point by its class's share of the region's area
+            areas_by_class = {int(c): v for c, v in class_areas.items()} if class_areas else None
+            df_corr['Weight'] = stratum_weights(df_corr['LandCover'], areas_by_class)
+            
             if len(df_corr) > 10:  # Need sufficient data points
-                st.success(f"✅ Sampled {len(df_corr)} points across Delhi districts")
+                st.success(f"✅ Sampled {len(df_corr)} points across {selected_region} districts in {sample_data['rounds']} stratified round(s)")
                 
-                # Calculate correlations
-                corr_ndvi_lst = df_corr['NDVI'].corr(df_corr['LST'])
+                # Calculate the area-weighted correlation and how precise the sample is
+                # One aggregation pass per class feeds the metrics, charts, table and insights
+                class_stats, corr_ndvi_lst, corr_ci, n_effective = sampling_precision(df_corr, areas_by_class)
+                lst_ci = class_stats['lst_ci']
+                precision_note = (
+                    f"95% intervals: NDVI-LST correlation ±{corr_ci:.3f}, class mean LST up to "
+                    f"±{lst_ci[np.isfinite(lst_ci)].max():.2f}°C (targets ±{SAMPLING_TARGET_CORR_CI} and ±{SAMPLING_TARGET_LST_CI}°C)."
+                    if np.isfinite(lst_ci).any() and np.isfinite(corr_ci) else "95% intervals are not available for this sample."
+                )
+                if sample_data['unmet_classes']:
+                    short = ', '.join(lulc_names.get(c, str(c)) for c in sample_data['unmet_classes'])
+                    precision_note += f" {short} did not reach the target: too few pixels or the per-class limit of {SAMPLING_MAX_POINTS_PER_CLASS} points."
+                st.caption(precision_note)
                 
                 # Display key metrics
                 st.subheader("Correlation Statistics")
@@ -1337,7 +3899,7 @@ try:
                     )
                 
                 with col2:
-                    urban_temp = df_corr[df_corr['LandCover'] == 50]['LST'].mean() if 50 in df_corr['LandCover'].values else 0
+                    urban_temp = class_stats.at[50, 'lst_mean'] if 50 in class_stats.index else 0
                     st.metric(
                         "Avg Urban Temperature",
                         f"{urban_temp:.1f}°C" if urban_temp > 0 else "N/A",
@@ -1345,7 +3907,8 @@ try:
                     )
                 
                 with col3:
-                    veg_temp = df_corr[df_corr['LandCover'].isin([10, 20, 30])]['LST'].mean() if any(lc in df_corr['LandCover'].values for lc in [10, 20, 30]) else 0
+                    veg_stats = class_stats[class_stats.index.isin([10, 20, 30])]
+                    veg_temp = veg_stats['lst_weighted_sum'].sum() / veg_stats['weight'].sum() if len(veg_stats) > 0 else 0
                     st.metric(
                         "Avg Vegetation Temperature",
                         f"{veg_temp:.1f}°C" if veg_temp > 0 else "N/A",
@@ -1371,177 +3934,43 @@ try:
                 
                 # Land cover area distribution (pie chart)
                 with col1:
-                    # Calculate area coverage (number of pixels as proxy for area)
-                    lulc_area = df_corr['LandCover_Name'].value_counts()
-                    total_samples = len(df_corr)
-                    lulc_area_pct = (lulc_area / total_samples * 100).round(2)
-                    
-                    # Color mapping for land cover
-                    lulc_colors = {
-                        'Tree Cover': '#006400',
-                        'Shrubland': '#FFBB22',
-                        'Grassland': '#FFFF4C',
-                        'Cropland': '#F096FF',
-                        'Built-up': '#FA0000',
-                        'Bare/Sparse': '#B4B4B4',
-                        'Snow/Ice': '#F0F0F0',
-                        'Water': '#0064C8',
-                        'Wetland': '#0096A0',
-                        'Mangroves': '#00CF75',
-                        'Moss/Lichen': '#FAE6A0'
-                    }
-                    
-                    colors_list = [lulc_colors.get(name, '#999999') for name in lulc_area.index]
-                    
-                    fig_pie = go.Figure(data=[go.Pie(
-                        labels=lulc_area.index,
-                        values=lulc_area.values,
-                        marker=dict(colors=colors_list),
-                        textposition='inside',
-                        textinfo='label+percent',
-                        hovertemplate='<b>%{label}</b><br>Coverage: %{percent}<br>Samples: %{value}<extra></extra>'
-                    )])
-                    
-                    fig_pie.update_layout(
-                        title='Land Use/Land Cover Distribution',
-                        height=450,
-                        template='plotly_white',
-                        showlegend=True
-                    )
-                    
-                    st.plotly_chart(fig_pie, width='stretch')
+                    st.plotly_chart(build_lulc_pie_figure(class_stats), width='stretch')
                 
                 # Area-weighted temperature by land cover
                 with col2:
-                    # Create bar chart with area coverage and temperature
-                    lulc_summary = df_corr.groupby('LandCover_Name').agg({
-                        'LST': 'mean',
-                        'LandCover': 'count'
-                    }).rename(columns={'LandCover': 'Area_Count'})
-                    
-                    lulc_summary['Area_Percent'] = (lulc_summary['Area_Count'] / len(df_corr) * 100).round(2)
-                    lulc_summary = lulc_summary.sort_values('Area_Percent', ascending=True)
-                    
-                    fig_area_temp = go.Figure()
-                    
-                    # Bar for area coverage
-                    fig_area_temp.add_trace(go.Bar(
-                        y=lulc_summary.index,
-                        x=lulc_summary['Area_Percent'],
-                        name='Area Coverage (%)',
-                        orientation='h',
-                        marker=dict(
-                            color=lulc_summary['LST'],
-                            colorscale='RdYlBu_r',
-                            showscale=True,
-                            colorbar=dict(title="Temp (°C)", x=1.15)
-                        ),
-                        text=lulc_summary['Area_Percent'].apply(lambda x: f'{x:.1f}%'),
-                        textposition='auto',
-                        hovertemplate='<b>%{y}</b><br>Coverage: %{x:.1f}%<br>Avg Temp: %{marker.color:.1f}°C<extra></extra>'
-                    ))
-                    
-                    fig_area_temp.update_layout(
-                        title='Land Cover Area Coverage (colored by temperature)',
-                        xaxis_title='Area Coverage (%)',
-                        yaxis_title='Land Use Type',
-                        height=450,
-                        template='plotly_white',
-                        showlegend=False
-                    )
-                    
-                    st.plotly_chart(fig_area_temp, width='stretch')
+                    st.plotly_chart(build_lulc_area_figure(class_stats), width='stretch')
                 
                 # Second row: Correlation visualizations
                 col1, col2 = st.columns([1, 1], gap="medium")
                 
                 # NDVI vs LST scatter plot
                 with col1:
-                    fig_scatter = go.Figure()
-                    
-                    # Color by land cover
-                    for lc_code, lc_name in lulc_names.items():
-                        df_lc = df_corr[df_corr['LandCover'] == lc_code]
-                        if len(df_lc) > 0:
-                            # Calculate size based on area coverage
-                            area_pct = (len(df_lc) / len(df_corr)) * 100
-                            marker_size = max(6, min(15, area_pct * 2))  # Scale size by coverage
-                            
-                            fig_scatter.add_trace(go.Scatter(
-                                x=df_lc['NDVI'],
-                                y=df_lc['LST'],
-                                mode='markers',
-                                name=f'{lc_name} ({area_pct:.1f}%)',
-                                marker=dict(size=marker_size, opacity=0.6)
-                            ))
-                    
-                    # Add trend line
-                    z = np.polyfit(df_corr['NDVI'], df_corr['LST'], 1)
-                    p = np.poly1d(z)
-                    x_trend = np.linspace(df_corr['NDVI'].min(), df_corr['NDVI'].max(), 100)
-                    
-                    fig_scatter.add_trace(go.Scatter(
-                        x=x_trend,
-                        y=p(x_trend),
-                        mode='lines',
-                        name='Trend Line',
-                        line=dict(color='black', width=2, dash='dash')
-                    ))
-                    
-                    fig_scatter.update_layout(
-                        title=f'NDVI vs LST (Correlation: {corr_ndvi_lst:.3f})',
-                        xaxis_title='Vegetation Index (NDVI)',
-                        yaxis_title='Land Surface Temperature (°C)',
-                        height=450,
-                        template='plotly_white',
-                        showlegend=True
-                    )
-                    
-                    st.plotly_chart(fig_scatter, width='stretch')
+                    st.plotly_chart(build_ndvi_lst_scatter_figure(df_corr, class_stats, corr_ndvi_lst), width='stretch')
                 
                 # Temperature by Land Cover boxplot
                 with col2:
-                    fig_box = go.Figure()
-                    
-                    for lc_code, lc_name in lulc_names.items():
-                        df_lc = df_corr[df_corr['LandCover'] == lc_code]
-                        if len(df_lc) > 0:
-                            fig_box.add_trace(go.Box(
-                                y=df_lc['LST'],
-                                name=lc_name,
-                                boxmean='sd'
-                            ))
-                    
-                    fig_box.update_layout(
-                        title='Temperature Distribution by Land Use Type',
-                        yaxis_title='Land Surface Temperature (°C)',
-                        height=450,
-                        template='plotly_white',
-                        showlegend=False
-                    )
-                    
-                    st.plotly_chart(fig_box, width='stretch')
+                    st.plotly_chart(build_lulc_box_figure(class_stats), width='stretch')
                 
                 # Land cover statistics table
                 st.subheader("Temperature & Area Statistics by Land Use Type")
                 
-                # Calculate comprehensive statistics including area coverage
-                lulc_stats = df_corr.groupby('LandCover_Name').agg({
-                    'LST': ['count', 'mean', 'std', 'min', 'max'],
-                    'NDVI': 'mean'
-                }).round(2)
-                
-                # Flatten column names
-                lulc_stats.columns = ['Sample Count', 'Mean Temp (°C)', 'Std Dev', 'Min Temp (°C)', 'Max Temp (°C)', 'Avg NDVI']
-                
-                # Add area coverage percentage
-                lulc_stats['Area Coverage (%)'] = (lulc_stats['Sample Count'] / len(df_corr) * 100).round(2)
-                
-                # Reorder columns
-                lulc_stats = lulc_stats[['Sample Count', 'Area Coverage (%)', 'Mean Temp (°C)', 'Avg NDVI', 'Std Dev', 'Min Temp (°C)', 'Max Temp (°C)']]
+                # Table of the per-class statistics, sorted by area coverage (descending)
+                lulc_stats = class_stats.sort_values('area_pct', ascending=False).set_index('name').rename(columns={
+                    'count': 'Sample Count',
+                    'area_pct': 'Area Coverage (%)',
+                    'lst_mean': 'Mean Temp (°C)',
+                    'lst_ci': 'Mean Temp 95% CI (±°C)',
+                    'ndvi_mean': 'Avg NDVI',
+                    'lst_std': 'Std Dev',
+                    'lst_min': 'Min Temp (°C)',
+                    'lst_median': 'Median Temp (°C)',
+                    'lst_max': 'Max Temp (°C)'
+                })[['Sample Count', 'Area Coverage (%)', 'Mean Temp (°C)', 'Mean Temp 95% CI (±°C)', 'Avg NDVI',
+                    'Std Dev', 'Min Temp (°C)', 'Median Temp (°C)', 'Max Temp (°C)']].round(2)
+                lulc_stats.index.name = 'LandCover_Name'
                 
-                # Sort by area coverage (descending)
-                lulc_stats = lulc_stats.sort_values('Area Coverage (%)', ascending=False)
+                # Classes from hottest to coolest, for the insights below
+                lulc_by_temp = lulc_stats.sort_values('Mean Temp (°C)', ascending=False)
                 
                 # Style the dataframe
                 st.dataframe(
@@ -1593,8 +4022,6 @@ try:
                 
                 # Temperature extreme by area-weighted impact
                 if len(lulc_stats) > 0:
-                    # Sort by mean temp to find hottest
-                    lulc_by_temp = lulc_stats.sort_values('Mean Temp (°C)', ascending=False)
                     hottest_lc = lulc_by_temp.index[0]
                     hottest_temp = lulc_by_temp.iloc[0]['Mean Temp (°C)']
                     hottest_area = lulc_by_temp.iloc[0]['Area Coverage (%)']
@@ -1607,7 +4034,6 @@ try:
                 
                 # Coolest land cover with area context
                 if len(lulc_stats) > 1:
-                    lulc_by_temp = lulc_stats.sort_values('Mean Temp (°C)', ascending=False)
                     coolest_lc = lulc_by_temp.index[-1]
                     coolest_temp = lulc_by_temp.iloc[-1]['Mean Temp (°C)']
                     coolest_area = lulc_by_temp.iloc[-1]['Area Coverage (%)']
@@ -1620,7 +4046,7 @@ try:
                 
                 # Vegetation coverage insight
                 veg_types = ['Tree Cover', 'Shrubland', 'Grassland', 'Cropland']
-                veg_coverage = lulc_stats[lulc_stats.index.isin(veg_types)]['Area Coverage (%)'].sum() if any(vt in lulc_stats.index for vt in veg_types) else 0
+                veg_coverage = lulc_stats.loc[lulc_stats.index.isin(veg_types), 'Area Coverage (%)'].sum()
                 
                 if veg_coverage > 0:
                     insights.append(
@@ -1657,9 +4083,821 @@ except Exception as corr_error:
 
 # ==================== End of Correlation Analysis ====================
 
-st.subheader("Live Heat Alerts for Delhi-NCR Region")
-for name, lat, lon in locations:
-    w = get_weather(lat, lon)
-    st.write(f"**{name}**: {w['temperature']} °C, Feels Like: {w['feels_like']} °C, Humidity: {w['humidity']} %")
+# ==================== Temporal Comparison ====================
+
+# Seasons as defined by the India Meteorological Department, as
+# ((start month, day), (end month, day)); winter starts in the previous December
+COMPARISON_SEASONS = {
+    'Winter (Dec-Feb)': ((12, 1), (3, 1)),
+    'Pre-monsoon (Mar-May)': ((3, 1), (6, 1)),
+    'Monsoon (Jun-Sep)': ((6, 1), (10, 1)),
+    'Post-monsoon (Oct-Nov)': ((10, 1), (12, 1)),
+}
+COMPARISON_MAX_YEARS = 5
+COMPARISON_SCALE = 1000
+# First full month of MODIS Terra data
+MODIS_FIRST_DATE = datetime(2000, 3, 1).date()
+
+# Function to move a date by whole years, clamping 29 February
+def shift_years(day, years):
+    """The same calendar day a number of years earlier (negative) or later"""
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        return day.replace(year=day.year + years, day=28)
+
+# Function to build the (label, start, end) periods to compare, base first
+def comparison_periods(mode, base_start, base_end, season, base_year, n_years):
+    """Base period followed by the same window in each of the previous n_years"""
+    if mode == 'Seasonal':
+        (start_month, start_day), (end_month, end_day) = COMPARISON_SEASONS[season]
+        start_year = base_year - 1 if start_month > end_month else base_year
+        base_start = datetime(start_year, start_month, start_day).date()
+        base_end = datetime(base_year, end_month, end_day).date()
+    periods = []
+    for years_back in range(n_years + 1):
+        start, end = shift_years(base_start, -years_back), shift_years(base_end, -years_back)
+        if start < MODIS_FIRST_DATE:
+            break
+        label = f"{season.split(' (')[0]} {end.year}" if mode == 'Seasonal' else f"{start} to {end}"
+        periods.append((label, start, end))
+    return periods
+
+# District-level means for one period; shared across sessions and replicas
+@instrumented_cache('period_district_stats', ttl=EE_RESULT_TTL, max_entries=64, show_spinner=False)
+@shared_cached('period_district_stats', ttl=EE_RESULT_TTL)
+def period_district_stats(region_name, boundaries_key, start_date, end_date, _district_index):
+    """Mean LST and NDVI of each district over a date range"""
+    districts = ee.FeatureCollection([
+        ee.Feature(ee_geometry_from_shape(shape.simplify(0.001, preserve_topology=True)), {'District': name})
+        for name, shape in zip(_district_index.names, _district_index.gdf.geometry.values)
+    ])
+    stats = period_composite(start_date, end_date).select(['LST', 'NDVI']).reduceRegions(
+        collection=districts,
+        reducer=ee.Reducer.mean(),
+        scale=COMPARISON_SCALE
+    )
+    features = ee_get_info(stats, 'period_district_stats')['features']
+    return pd.DataFrame(
+        [{c: f['properties'].get(c) for c in ('District', 'LST', 'NDVI')} for f in features],
+        columns=['District', 'LST', 'NDVI']
+    )
+
+# Land cover class means for one period; shared across sessions and replicas
+@instrumented_cache('period_class_means', ttl=EE_RESULT_TTL, max_entries=64, show_spinner=False)
+@shared_cached('period_class_means', ttl=EE_RESULT_TTL)
+def period_class_means(region_name, boundaries_key, start_date, end_date, _geometry):
+    """Mean LST and NDVI of each WorldCover class over a date range"""
+    means = period_composite(start_date, end_date).reduceRegion(
+        reducer=ee.Reducer.mean().repeat(2).group(groupField=2, groupName='LandCover'),
+        geometry=_geometry,
+        scale=COMPARISON_SCALE,
+        maxPixels=1e9
+    )
+    groups = ee_get_info(means, 'period_class_means').get('groups', [])
+    return pd.DataFrame(
+        [{'LandCover': int(g['LandCover']), 'LST': g['mean'][0], 'NDVI': g['mean'][1]} for g in groups],
+        columns=['LandCover', 'LST', 'NDVI']
+    )
+
+# Build the per-district LST change chart
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_comparison_delta_figure(df_delta, base_label):
+    """Plotly spec for each district's LST change from every comparison period to the base"""
+    fig = go.Figure()
+    for column in df_delta.columns:
+        fig.add_trace(go.Bar(x=df_delta.index, y=df_delta[column], name=column))
+    
+    fig.update_layout(
+        title=f'LST Change by District ({base_label} minus each period)',
+        xaxis_title='District',
+        yaxis_title='Δ LST (°C)',
+        barmode='group',
+        height=450,
+        template='plotly_white'
+    )
+    
+    return fig.to_dict()
+
+# Function to average a district statistic over a region by district area
+def area_weighted_mean(values, areas):
+    """Mean of the finite values weighted by area; districts without a value are left out"""
+    values = np.asarray(values, dtype=float)
+    valid = np.isfinite(values)
+    if not valid.any():
+        return np.nan
+    weights = np.asarray(areas, dtype=float)[valid]
+    return float(np.average(values[valid], weights=weights if weights.sum() > 0 else None))
+
+start_section("comparison")
+st.header("📆 Year-over-Year & Seasonal Comparison")
+comparison_mode = st.radio(
+    "Comparison mode",
+    ['Off', 'Year over year', 'Seasonal'],
+    horizontal=True,
+    key="comparison_mode",
+    help="Year over year compares the satellite date range above with the same dates in earlier years"
+)
+
+if comparison_mode != 'Off':
+    col1, col2, col3 = st.columns(3, gap="medium")
+    season, base_year = None, None
+    if comparison_mode == 'Seasonal':
+        with col1:
+            season = st.selectbox("Season", list(COMPARISON_SEASONS), key="comparison_season")
+        with col2:
+            base_year = st.selectbox("Base year", list(range(datetime.now().year, 2000, -1)), key="comparison_base_year")
+    with col3:
+        n_years = st.slider("Comparison years", 1, COMPARISON_MAX_YEARS, 2, key="comparison_years")
+    
+    periods = comparison_periods(comparison_mode, modis_start_date, modis_end_date, season, base_year, n_years)
+    if len(periods) < n_years + 1:
+        st.caption(f"MODIS data starts in {MODIS_FIRST_DATE.year}; earlier periods are left out.")
+    
+    try:
+        comparison_geometry = districts_geometry if districts_geometry else region
+        
+        # Every period's district and class statistics are requested at once
+        requests_by_key = []
+        for _, start, end in periods:
+            requests_by_key.append((
+                ('period_district_stats', selected_region, boundaries_key, start, end),
+                lambda start=start, end=end: period_district_stats(selected_region, boundaries_key, start, end, district_index)
+            ))
+            requests_by_key.append((
+                ('period_class_means', selected_region, boundaries_key, start, end),
+                lambda start=start, end=end: period_class_means(selected_region, boundaries_key, start, end, comparison_geometry)
+            ))
+        results = await_upstream_many(f"Comparing {len(periods)} periods", requests_by_key) if district_index is not None else []
+        
+        if district_index is None:
+            st.warning("⚠️ District boundaries are needed for the comparison")
+        elif any(result is UPSTREAM_PENDING for result in results):
+            st.warning("⏳ Some periods are still being computed; rerun the page to see the comparison")
+        elif len(periods) < 2:
+            st.info("ℹ️ No earlier periods with MODIS data to compare with")
+        else:
+            labels = [label for label, _, _ in periods]
+            base_label = labels[0]
+            district_frames, class_frames = results[0::2], results[1::2]
+            
+            # Region means weight each district by its area (equal-area projection)
+            district_area = pd.Series(region_gdf.geometry.to_crs('EPSG:6933').area.values, index=region_gdf['District'].values)
+            summary = []
+            for label, df_period in zip(labels, district_frames):
+                df_period = df_period.dropna(subset=['LST'])
+                areas = district_area.reindex(df_period['District']).fillna(0).to_numpy()
+                summary.append({
+                    'Period': label,
+                    'LST': area_weighted_mean(df_period['LST'], areas),
+                    'NDVI': area_weighted_mean(df_period['NDVI'], areas)
+                })
+            df_summary = pd.DataFrame(summary).set_index('Period')
+            
+            # Side by side: the base period and its change from each comparison period
+            metric_columns = st.columns(len(periods), gap="small")
+            for i, (column, label) in enumerate(zip(metric_columns, labels)):
+                with column:
+                    if i == 0:
+                        st.metric(f"{label} (base)", f"{df_summary.at[label, 'LST']:.1f}°C")
+                    else:
+                        st.metric(label, f"{df_summary.at[label, 'LST']:.1f}°C",
+                                  f"{df_summary.at[base_label, 'LST'] - df_summary.at[label, 'LST']:+.2f}°C to base",
+                                  delta_color="inverse")
+            
+            df_summary['Δ LST (°C)'] = df_summary.at[base_label, 'LST'] - df_summary['LST']
+            df_summary['Δ NDVI'] = df_summary.at[base_label, 'NDVI'] - df_summary['NDVI']
+            st.dataframe(df_summary.rename(columns={'LST': 'Mean LST (°C)', 'NDVI': 'Mean NDVI'}).round(3), width='stretch')
+            
+            # District LST per period and the base period's change from each
+            df_district_lst = pd.concat(
+                [df.set_index('District')['LST'].rename(label) for label, df in zip(labels, district_frames)], axis=1
+            )
+            df_district_delta = pd.DataFrame({
+                f"Δ vs {label}": df_district_lst[base_label] - df_district_lst[label] for label in labels[1:]
+            })
+            st.plotly_chart(build_comparison_delta_figure(df_district_delta.round(2), base_label), width='stretch')
+            
+            col1, col2 = st.columns([1, 1], gap="medium")
+            with col1:
+                st.markdown("**District mean LST (°C)**")
+                st.dataframe(pd.concat([df_district_lst, df_district_delta], axis=1).round(2), width='stretch')
+            
+            # Land cover class means per period and the base period's change from each
+            with col2:
+                df_class_lst = pd.concat(
+                    [df.set_index('LandCover')['LST'].rename(label) for label, df in zip(labels, class_frames)], axis=1
+                )
+                df_class_lst.index = df_class_lst.index.map(lambda code: lulc_names.get(code, 'Other'))
+                for label in labels[1:]:
+                    df_class_lst[f"Δ vs {label}"] = df_class_lst[base_label] - df_class_lst[label]
+                st.markdown("**Land cover class mean LST (°C)**")
+                st.dataframe(df_class_lst.round(2), width='stretch')
+            
+            st.caption(f"Δ is the base period ({base_label}) minus each comparison period; positive values mean the base period was hotter.")
+    except Exception as comparison_error:
+        st.error(f"Error in temporal comparison: {str(comparison_error)}")
+
+# ==================== LST Anomalies ====================
+
+# Daily LST climatology per district and day of year (2000 to the last
+# update), built once and kept current by scripts/build_lst_climatology.py
+LST_CLIMATOLOGY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lst_climatology.npz")
+CLIMATOLOGY_STATISTICS = ('mean', 'std', 'p10', 'p50', 'p90')
+ANOMALY_Z_THRESHOLD = 2.0
+# Years with a clear day in the range needed before a district is scored
+CLIMATOLOGY_MIN_YEARS = 5
+
+# Signature of the climatology pack, used to reload it after each update
+def get_climatology_signature():
+    try:
+        stat = os.stat(LST_CLIMATOLOGY_PATH)
+        return (LST_CLIMATOLOGY_PATH, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+# Function to find a date's day-of-year slot, as the build script numbers them
+def climatology_slot(day):
+    """Slot 0-365 of a date in a leap-year calendar"""
+    return (datetime(2000, day.month, day.day).date() - datetime(2000, 1, 1).date()).days
+
+class LSTClimatology:
+    """LST normals per district for any day-of-year range, from the daily record of past years"""
+    
+    def __init__(self, pack):
+        self.districts = pack['districts'].tolist()
+        self.position = {name: i for i, name in enumerate(self.districts)}
+        self.years = (int(pack['years'][0]), int(pack['years'][-1]))
+        self.last_date = str(pack['last_date'])
+        observations = pack['observations'].astype(float)
+        n_districts, n_years, self.days = observations.shape
+        # Prefix sums along one day axis running through every year plus an empty
+        # spare year, so a range past 31 December continues into the next year;
+        # days without data are left out of both the sums and the counts
+        series = np.concatenate([observations.reshape(n_districts, -1), np.full((n_districts, self.days), np.nan)], axis=1)
+        valid = np.isfinite(series)
+        self.sums = np.concatenate([np.zeros((n_districts, 1)), np.cumsum(np.where(valid, series, 0), axis=1)], axis=1)
+        self.counts = np.concatenate([np.zeros((n_districts, 1)), np.cumsum(valid, axis=1)], axis=1)
+        last = datetime.strptime(self.last_date, '%Y-%m-%d').date()
+        self.end_of_record = (last.year - self.years[0]) * self.days + climatology_slot(last) + 1
+    
+    def yearly_means(self, districts, start_date, end_date):
+        """Mean LST of each district over the same days of year as [start_date, end_date) in every other year"""
+        length = min(max((end_date - start_date).days, 1), self.days)
+        years = np.arange(self.years[0], self.years[1] + 1)
+        starts = (years - self.years[0]) * self.days + climatology_slot(start_date)
+        # The scored year is left out of its own baseline, as are ranges the record does not reach yet
+        keep = (years != start_date.year) & (starts + length <= self.end_of_record)
+        starts, years = starts[keep], years[keep]
+        rows = np.array([self.position.get(name, -1) for name in districts])
+        means = pd.DataFrame(np.nan, index=pd.Index(list(districts), name='District'), columns=years)
+        known = rows >= 0
+        sums, counts = self.sums[rows[known]], self.counts[rows[known]]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means.loc[known] = (sums[:, starts + length] - sums[:, starts]) / (counts[:, starts + length] - counts[:, starts])
+        return means
+    
+    def normals(self, districts, start_date, end_date):
+        """Mean, spread and percentiles of each district's per-year range means"""
+        yearly = self.yearly_means(districts, start_date, end_date).to_numpy()
+        normals = pd.DataFrame(index=pd.Index(list(districts), name='District'), columns=list(CLIMATOLOGY_STATISTICS), dtype=float)
+        enough = np.isfinite(yearly).sum(axis=1) >= CLIMATOLOGY_MIN_YEARS
+        if enough.any():
+            values = yearly[enough]
+            normals.loc[enough, 'mean'] = np.nanmean(values, axis=1)
+            normals.loc[enough, 'std'] = np.nanstd(values, axis=1, ddof=1)
+            normals.loc[enough, ['p10', 'p50', 'p90']] = np.nanpercentile(values, [10, 50, 90], axis=1).T
+        return normals
+
+# Load the climatology once per process and per boundary file, with prefix sums
+# over the daily record
+@st.cache_resource(show_spinner=False)
+def load_lst_climatology(pack_key, boundaries_key):
+    """Climatology from the pack, or None without one"""
+    if pack_key is None:
+        return None
+    with np.load(LST_CLIMATOLOGY_PATH, allow_pickle=False) as pack:
+        # Rows of other district outlines would score districts against the wrong record
+        if str(pack['boundaries_sha256']) != boundary_pack_sha256():
+            raise ValueError("the pack was built for other district boundaries; "
+                             "rebuild it with `python scripts/build_lst_climatology.py --rebuild`")
+        return LSTClimatology(pack)
+
+# Function to score district LST against the climatology
+def score_lst_anomalies(climatology, df_lst, start_date, end_date):
+    """District LST with its normal, anomaly, z-score and flag"""
+    normals = climatology.normals(df_lst['District'], start_date, end_date)
+    df = df_lst.set_index('District').join(normals)
+    df['Anomaly (°C)'] = df['LST'] - df['mean']
+    df['z'] = df['Anomaly (°C)'] / df['std']
+    df['Flag'] = np.select(
+        [df['z'] >= ANOMALY_Z_THRESHOLD, df['LST'] >= df['p90'], df['LST'] <= df['p10'], df['mean'].isna()],
+        ['🔥 Extreme', '🌡️ Hotter than usual', '❄️ Cooler than usual', '— No climatology'],
+        '✅ Normal'
+    )
+    return df
+
+start_section("anomalies")
+st.header("🔥 LST Anomalies vs Climatology")
+
+try:
+    lst_climatology = load_lst_climatology(get_climatology_signature(), boundaries_key)
+except Exception as climatology_error:
+    lst_climatology = None
+    st.warning(f"⚠️ Could not load the LST climatology: {str(climatology_error)}")
+
+if lst_climatology is None:
+    st.info("ℹ️ Build the LST climatology with `python scripts/build_lst_climatology.py` to flag unusual heat by district.")
+elif district_index is None:
+    st.warning("⚠️ District boundaries are needed for the anomaly analysis")
+else:
+    try:
+        # District means for the satellite date range; the same cached result the comparison uses
+        df_period_lst = default_view(
+            'period_district_stats', (selected_region, boundaries_key, modis_start_date, modis_end_date),
+            lambda: period_district_stats(selected_region, boundaries_key, modis_start_date, modis_end_date, district_index),
+            is_default=modis_is_default, label="District LST"
+        )
+        df_anomalies = score_lst_anomalies(lst_climatology, df_period_lst.dropna(subset=['LST']), modis_start_date, modis_end_date)
+        
+        col1, col2, col3 = st.columns(3, gap="small")
+        with col1:
+            st.metric("Districts Hotter Than Usual", int(df_anomalies['Flag'].isin(['🔥 Extreme', '🌡️ Hotter than usual']).sum()))
+        with col2:
+            if df_anomalies['Anomaly (°C)'].notna().any():
+                st.metric(f"Largest Anomaly ({df_anomalies['Anomaly (°C)'].idxmax()})", f"{df_anomalies['Anomaly (°C)'].max():+.1f}°C")
+            else:
+                st.metric("Largest Anomaly", "N/A")
+        with col3:
+            st.metric("Mean Anomaly", f"{df_anomalies['Anomaly (°C)'].mean():+.1f}°C" if df_anomalies['Anomaly (°C)'].notna().any() else "N/A")
+        
+        for district, row in df_anomalies[df_anomalies['Flag'] == '🔥 Extreme'].iterrows():
+            st.warning(f"🔥 **{district}**: {row['LST']:.1f}°C is {row['Anomaly (°C)']:+.1f}°C ({row['z']:.1f} standard deviations) from its normal of {row['mean']:.1f}°C")
+        
+        st.dataframe(
+            df_anomalies.rename(columns={'LST': 'LST (°C)', 'mean': 'Normal (°C)', 'p10': '10th pct (°C)', 'p90': '90th pct (°C)'})
+            [['LST (°C)', 'Normal (°C)', 'Anomaly (°C)', 'z', '10th pct (°C)', '90th pct (°C)', 'Flag']]
+            .sort_values('Anomaly (°C)', ascending=False).round(2),
+            width='stretch'
+        )
+        st.caption(
+            f"Normals are MODIS LST averaged over the same days of year in each year from {lst_climatology.years[0]} to {lst_climatology.years[1]} "
+            f"(the selected year excluded, updated to {lst_climatology.last_date}); the spread and percentiles are across those yearly means."
+        )
+    except UpstreamDeadlineExceeded as e:
+        st.warning(f"⚠️ {str(e)}")
+    except Exception as anomaly_error:
+        st.error(f"Error in anomaly analysis: {str(anomaly_error)}")
+
+# ==================== LST Hotspots ====================
+
+# Hot and cold spots of land surface temperature from the Getis-Ord Gi*
+# statistic on every 1 km MODIS pixel of the region. Neighbours are the pixels
+# within a fixed distance, held as a sparse weights matrix, so the statistic
+# for every pixel is one sparse matrix-vector product
+HOTSPOT_PIXEL_DEGREES = 1 / 120
+HOTSPOT_DISTANCE_KM = 3.0
+HOTSPOT_NODATA = -9999
+# (minimum |Gi*| z-score, confidence %), strictest first
+HOTSPOT_CONFIDENCE = [(2.576, 99), (1.960, 95), (1.645, 90)]
+# Colours for classes -3 (cold, 99%) to 3 (hot, 99%); 0 is not significant
+HOTSPOT_COLORS = {
+    3: '#b2182b', 2: '#ef8a62', 1: '#fddbc7',
+    -1: '#d1e5f0', -2: '#67a9cf', -3: '#2166ac',
+}
+HOTSPOT_OPACITY = 0.7
+
+# Download the period's LST composite on the MODIS grid over the region
+@instrumented_cache('lst_grid', ttl=EE_RESULT_TTL, max_entries=16, show_spinner=False)
+@shared_cached('lst_grid', ttl=EE_RESULT_TTL)
+def fetch_lst_grid(region_name, boundaries_key, start_date, end_date, _district_index):
+    """Mean LST (°C) on a 1/120 degree grid, NaN outside the districts or without clear days"""
+    import shapely
+    
+    min_lon, min_lat, max_lon, max_lat = _district_index.shape.bounds
+    col0, row0 = int(np.floor(min_lon / HOTSPOT_PIXEL_DEGREES)), int(np.floor(-max_lat / HOTSPOT_PIXEL_DEGREES))
+    col1, row1 = int(np.ceil(max_lon / HOTSPOT_PIXEL_DEGREES)), int(np.ceil(-min_lat / HOTSPOT_PIXEL_DEGREES))
+    origin_x, origin_y = col0 * HOTSPOT_PIXEL_DEGREES, -row0 * HOTSPOT_PIXEL_DEGREES
+    width, height = col1 - col0, row1 - row0
+    grid = {
+        'dimensions': {'width': width, 'height': height},
+        'affineTransform': {
+            'scaleX': HOTSPOT_PIXEL_DEGREES, 'shearX': 0, 'translateX': origin_x,
+            'shearY': 0, 'scaleY': -HOTSPOT_PIXEL_DEGREES, 'translateY': origin_y,
+        },
+        'crsCode': 'EPSG:4326',
+    }
+    image = period_composite(start_date, end_date).select('LST').unmask(HOTSPOT_NODATA)
+    lst = ee_compute_pixels(image, 'LST', grid, 'lst_grid')
+    
+    lons = origin_x + (np.arange(width) + 0.5) * HOTSPOT_PIXEL_DEGREES
+    lats = origin_y - (np.arange(height) + 0.5) * HOTSPOT_PIXEL_DEGREES
+    inside = shapely.contains_xy(_district_index.shape, *np.meshgrid(lons, lats))
+    lst[(lst <= HOTSPOT_NODATA + 1) | ~inside] = np.nan
+    return {'lst': lst.astype(np.float32), 'lons': lons, 'lats': lats}
+
+# Function to build binary distance-band weights between valid pixels of a grid
+def distance_band_weights(valid, cell_width_km, cell_height_km, distance_km):
+    """Sparse (n, n) weights, 1 between valid pixels within distance_km of each other including themselves"""
+    from scipy import sparse
+    
+    height, width = valid.shape
+    index = np.full(valid.shape, -1, dtype=np.int64)
+    index[valid] = np.arange(valid.sum())
+    reach_x, reach_y = int(distance_km // cell_width_km), int(distance_km // cell_height_km)
+    rows, cols = [], []
+    # One vectorized pass over the grid per neighbour offset
+    for dy in range(-reach_y, reach_y + 1):
+        for dx in range(-reach_x, reach_x + 1):
+            if (dx * cell_width_km) ** 2 + (dy * cell_height_km) ** 2 > distance_km ** 2:
+                continue
+            source = index[max(0, -dy):height - max(0, dy), max(0, -dx):width - max(0, dx)]
+            target = index[max(0, dy):height - max(0, -dy), max(0, dx):width - max(0, -dx)]
+            pairs = (source >= 0) & (target >= 0)
+            rows.append(source[pairs])
+            cols.append(target[pairs])
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    n = int(valid.sum())
+    return sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+
+# Function to compute Getis-Ord Gi* and global Moran's I for values under binary weights
+def getis_ord_gi_star(values, weights):
+    """Gi* z-score of every value, with global Moran's I and its z-score under normality"""
+    n = len(values)
+    mean = values.mean()
+    spread = np.sqrt((values ** 2).mean() - mean ** 2)
+    neighbours = np.asarray(weights.sum(axis=1)).ravel()
+    lag = weights @ values
+    # Binary weights, so the sum of squared weights equals the neighbour count
+    gi = (lag - mean * neighbours) / (spread * np.sqrt((n * neighbours - neighbours ** 2) / (n - 1)))
+    
+    # Moran's I uses the same neighbours without each pixel itself
+    deviations = values - mean
+    s0 = neighbours.sum() - n
+    moran = n / s0 * (deviations @ (lag - values - mean * (neighbours - 1))) / (deviations @ deviations)
+    s1 = 2 * s0
+    s2 = (4 * (neighbours - 1) ** 2).sum()
+    expected = -1 / (n - 1)
+    variance = (n ** 2 * s1 - n * s2 + 3 * s0 ** 2) / ((n ** 2 - 1) * s0 ** 2) - expected ** 2
+    return gi, moran, (moran - expected) / np.sqrt(variance)
+
+# Hot and cold spots of the period's LST; shared by every session viewing the same composite
+@instrumented_cache('lst_hotspots', ttl=EE_RESULT_TTL, max_entries=16, show_spinner=False)
+def lst_hotspots(region_name, boundaries_key, start_date, end_date, _district_index):
+    """Gi* class grid, district summary and global Moran's I for a period's LST"""
+    grid = fetch_lst_grid(region_name, boundaries_key, start_date, end_date, _district_index)
+    lst, lons, lats = grid['lst'], grid['lons'], grid['lats']
+    valid = np.isfinite(lst)
+    if valid.sum() < 3:
+        raise ValueError("Too few clear LST pixels in this period for a hotspot analysis")
+    
+    km_per_degree = np.radians(EARTH_RADIUS_KM)
+    cell_height_km = HOTSPOT_PIXEL_DEGREES * km_per_degree
+    cell_width_km = cell_height_km * np.cos(np.radians(lats.mean()))
+    weights = distance_band_weights(valid, cell_width_km, cell_height_km, HOTSPOT_DISTANCE_KM)
+    values = lst[valid].astype(np.float64)
+    gi, moran, moran_z = getis_ord_gi_star(values, weights)
+    
+    # Signed confidence class: 3 is a 99% hot spot, -3 a 99% cold spot
+    strength = np.zeros(len(gi), dtype=np.int8)
+    for level, (z, _) in enumerate(reversed(HOTSPOT_CONFIDENCE), start=1):
+        strength[np.abs(gi) >= z] = level
+    classes = np.full(lst.shape, 0, dtype=np.int8)
+    classes[valid] = np.sign(gi).astype(np.int8) * strength
+    
+    cell_lons, cell_lats = np.meshgrid(lons, lats)
+    df_pixels = pd.DataFrame({
+        'District': _district_index.locate(cell_lons[valid], cell_lats[valid]),
+        'LST': values,
+        'Gi': gi,
+        'Hot': classes[valid] >= 2,
+        'Cold': classes[valid] <= -2,
+    })
+    df_summary = df_pixels[df_pixels['District'] != 'Unassigned'].groupby('District').agg(**{
+        'Pixels': ('LST', 'size'),
+        'Mean LST (°C)': ('LST', 'mean'),
+        'Mean Gi* z': ('Gi', 'mean'),
+        'Hot Spot %': ('Hot', 'mean'),
+        'Cold Spot %': ('Cold', 'mean'),
+    })
+    df_summary[['Hot Spot %', 'Cold Spot %']] *= 100
+    
+    return {
+        'classes': classes,
+        'valid': valid,
+        'bounds': [[lats.min() - HOTSPOT_PIXEL_DEGREES / 2, lons.min() - HOTSPOT_PIXEL_DEGREES / 2],
+                   [lats.max() + HOTSPOT_PIXEL_DEGREES / 2, lons.max() + HOTSPOT_PIXEL_DEGREES / 2]],
+        'summary': df_summary.sort_values('Mean Gi* z', ascending=False),
+        'pixels': int(valid.sum()),
+        'links': int(weights.nnz),
+        'pixel_km2': float(cell_width_km * cell_height_km),
+        'moran': float(moran),
+        'moran_z': float(moran_z),
+    }
+
+# Build the hotspot map and serialize it
+@instrumented_cache('hotspot_map_html', max_entries=16, show_spinner=False)
+def render_hotspot_map(region_name, boundaries_key, start_date, end_date, _district_index):
+    """Render the Gi* hot and cold spot classes over the district outlines to HTML"""
+    hotspots = lst_hotspots(region_name, boundaries_key, start_date, end_date, _district_index)
+    classes = hotspots['classes']
+    image = np.zeros(classes.shape + (4,), dtype=np.uint8)
+    for level, color in HOTSPOT_COLORS.items():
+        image[(classes == level) & hotspots['valid']] = [int(color[i:i + 2], 16) for i in (1, 3, 5)] + [255]
+    
+    m_hot = folium.Map(location=[28.6139, 77.2090], zoom_start=10)
+    m_hot.fit_bounds(hotspots['bounds'])
+    folium.raster_layers.ImageOverlay(
+        image=image,
+        bounds=hotspots['bounds'],
+        opacity=HOTSPOT_OPACITY,
+        mercator_project=True,
+        name="🎯 LST Hot & Cold Spots (Gi*)",
+    ).add_to(m_hot)
+    folium.GeoJson(
+        _district_index.gdf[['District', 'geometry']],
+        name="District Boundaries",
+        style_function=lambda feature: {'color': '#444444', 'weight': 1, 'fillOpacity': 0},
+        tooltip=folium.GeoJsonTooltip(fields=['District']),
+    ).add_to(m_hot)
+    
+    legend_rows = "".join(
+        f'<div style="margin: 3px 0; display: flex; align-items: center;">'
+        f'<span style="background-color: {HOTSPOT_COLORS[sign * level]}; width: 20px; height: 15px; display: inline-block; margin-right: 8px; border: 1px solid #000;"></span>'
+        f'<span>{"Hot" if sign > 0 else "Cold"} spot, {confidence}%</span></div>'
+        for sign in (1, -1)
+        for level, (_, confidence) in zip((3, 2, 1), HOTSPOT_CONFIDENCE)
+    )
+    m_hot.get_root().html.add_child(folium.Element(
+        '<div style="position: fixed; bottom: 30px; right: 10px; width: 170px; background-color: white; '
+        'border: 2px solid grey; border-radius: 5px; z-index: 9999; font-size: 12px; padding: 10px;">'
+        f'<div style="font-weight: bold; margin-bottom: 5px;">Gi* confidence</div>{legend_rows}</div>'
+    ))
+    folium.LayerControl(collapsed=True).add_to(m_hot)
+    return m_hot.get_root().render()
+
+start_section("hotspots")
+st.header("🎯 LST Hot and Cold Spots")
+st.markdown(f"""
+Clusters of unusually hot or cool land surface, from the Getis-Ord Gi* statistic on every 1 km MODIS pixel
+for the satellite date range. Each pixel is compared with its neighbours within {HOTSPOT_DISTANCE_KM:.0f} km.
+A hot spot is a pixel whose neighbourhood is significantly hotter than the region as a whole.
+""")
+
+if district_index is None:
+    st.warning("⚠️ District boundaries are needed for the hotspot analysis")
+else:
+    try:
+        hotspots = default_view(
+            'lst_hotspots', (selected_region, boundaries_key, modis_start_date, modis_end_date),
+            lambda: lst_hotspots(selected_region, boundaries_key, modis_start_date, modis_end_date, district_index),
+            is_default=modis_is_default, label="LST hotspots"
+        )
+        df_hotspots = hotspots['summary']
+        
+        col1, col2, col3 = st.columns(3, gap="small")
+        with col1:
+            st.metric("Hot Spot Area", f"{(hotspots['classes'] >= 2).sum() * hotspots['pixel_km2']:,.0f} km²")
+        with col2:
+            st.metric("Cold Spot Area", f"{(hotspots['classes'] <= -2).sum() * hotspots['pixel_km2']:,.0f} km²")
+        with col3:
+            st.metric("Global Moran's I", f"{hotspots['moran']:.2f}", f"z = {hotspots['moran_z']:.1f}", delta_color="off")
+        
+        st.iframe(
+            render_hotspot_map(selected_region, boundaries_key, modis_start_date, modis_end_date, district_index),
+            height=550
+        )
+        
+        st.subheader("Hotspots by District")
+        st.dataframe(
+            df_hotspots.round({'Mean LST (°C)': 1, 'Mean Gi* z': 2, 'Hot Spot %': 1, 'Cold Spot %': 1}),
+            width='stretch'
+        )
+        if not df_hotspots.empty and df_hotspots['Hot Spot %'].max() > 0:
+            top = df_hotspots['Hot Spot %'].idxmax()
+            st.info(f"🔥 **{top}** has the largest share of hot spots: {df_hotspots.loc[top, 'Hot Spot %']:.0f}% of its area at 95% confidence or more")
+        st.caption(f"{hotspots['pixels']:,} pixels, {hotspots['links']:,} neighbour links. Areas count pixels at 95% confidence or more. "
+                   "A Moran's I above 0 means similar temperatures cluster together.")
+    except UpstreamDeadlineExceeded as e:
+        st.warning(f"⚠️ {str(e)}")
+    except Exception as e:
+        st.error(f"Error in hotspot analysis: {str(e)}")
+
+# ==================== Heat Zones ====================
+
+# Contiguous areas where the period's LST reaches a threshold: connected pixels
+# of the hotspot section's LST grid, traced into simplified polygons
+HEAT_ZONE_THRESHOLDS = list(range(30, 51))
+HEAT_ZONE_DEFAULT_THRESHOLD = 40
+# Zones smaller than this many pixels (about 0.8 km² each) are left out as noise
+HEAT_ZONE_MIN_PIXELS = 3
+# Simplification tolerance in pixels; removes the raster staircase
+HEAT_ZONE_SIMPLIFY_PIXELS = 0.5
+HEAT_ZONE_PRECISION = 1e-5
+
+# Outline the areas of a period's LST at or above a threshold
+@instrumented_cache('heat_zones', ttl=EE_RESULT_TTL, max_entries=32, show_spinner=False)
+def heat_zones(region_name, boundaries_key, start_date, end_date, threshold, _district_index):
+    """GeoDataFrame of heat zones, largest first, with area, LST and the districts each one touches"""
+    import geopandas as gpd
+    import shapely
+    from scipy import ndimage
+    
+    grid = fetch_lst_grid(region_name, boundaries_key, start_date, end_date, _district_index)
+    lst, lons, lats = grid['lst'], grid['lons'], grid['lats']
+    columns = ['Zone', 'Area (km²)', 'Pixels', 'Mean LST (°C)', 'Max LST (°C)', 'Districts', 'geometry']
+    
+    # Pixels touching at a corner belong to the same zone
+    labels, count = ndimage.label(np.nan_to_num(lst, nan=-np.inf) >= threshold, structure=np.ones((3, 3)))
+    if count == 0:
+        return gpd.GeoDataFrame(columns=columns, geometry='geometry', crs='EPSG:4326'), float(np.nanmax(lst))
+    sizes = np.bincount(labels.ravel(), minlength=count + 1)
+    labels[sizes[labels] < HEAT_ZONE_MIN_PIXELS] = 0
+    
+    # Pixel squares grouped by zone, unioned as a coverage since they never overlap
+    rows, cols = np.nonzero(labels)
+    zone_of = labels[rows, cols]
+    order = np.argsort(zone_of, kind='stable')
+    rows, cols, zone_of = rows[order], cols[order], zone_of[order]
+    half = HOTSPOT_PIXEL_DEGREES / 2
+    squares = shapely.box(lons[cols] - half, lats[rows] - half, lons[cols] + half, lats[rows] + half)
+    _, starts = np.unique(zone_of, return_index=True)
+    bounds = np.append(starts, len(zone_of))
+    outlines = [shapely.coverage_union_all(squares[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+    outlines = shapely.simplify(outlines, HEAT_ZONE_SIMPLIFY_PIXELS * HOTSPOT_PIXEL_DEGREES, preserve_topology=True)
+    outlines = shapely.set_precision(outlines, HEAT_ZONE_PRECISION)
+    
+    values = lst[rows, cols].astype(np.float64)
+    pixel_counts = np.diff(bounds)
+    km_per_degree = np.radians(EARTH_RADIUS_KM)
+    pixel_km2 = (HOTSPOT_PIXEL_DEGREES * km_per_degree) ** 2 * np.cos(np.radians(lats[rows]))
+    df_zones = gpd.GeoDataFrame({
+        'Area (km²)': np.add.reduceat(pixel_km2, bounds[:-1]),
+        'Pixels': pixel_counts,
+        'Mean LST (°C)': np.add.reduceat(values, bounds[:-1]) / pixel_counts,
+        'Max LST (°C)': np.maximum.reduceat(values, bounds[:-1]),
+        'Districts': [", ".join(_district_index.intersecting(outline)) for outline in outlines],
+    }, geometry=outlines, crs='EPSG:4326')
+    df_zones = df_zones.sort_values('Area (km²)', ascending=False).reset_index(drop=True)
+    df_zones.insert(0, 'Zone', np.arange(1, len(df_zones) + 1))
+    return df_zones[columns], float(np.nanmax(lst))
+
+# Build the heat zone map and serialize it
+@instrumented_cache('heat_zone_map_html', max_entries=16, show_spinner=False)
+def render_heat_zone_map(region_name, boundaries_key, start_date, end_date, threshold, _district_index):
+    """Render the heat zone outlines over the district boundaries to HTML"""
+    df_zones, _ = heat_zones(region_name, boundaries_key, start_date, end_date, threshold, _district_index)
+    min_lon, min_lat, max_lon, max_lat = _district_index.shape.bounds
+    m_zones = folium.Map(location=[28.6139, 77.2090], zoom_start=10)
+    m_zones.fit_bounds([[min_lat, min_lon], [max_lat, max_lon]])
+    
+    folium.GeoJson(
+        _district_index.gdf[['District', 'geometry']],
+        name="District Boundaries",
+        style_function=lambda feature: {'color': '#444444', 'weight': 1, 'fillOpacity': 0},
+    ).add_to(m_zones)
+    if not df_zones.empty:
+        folium.GeoJson(
+            df_zones.round({'Area (km²)': 1, 'Mean LST (°C)': 1, 'Max LST (°C)': 1}),
+            name=f"🔥 Heat Zones (≥ {threshold}°C)",
+            style_function=lambda feature: {'color': '#8b0000', 'weight': 2, 'fillColor': '#ff4500', 'fillOpacity': 0.45},
+            tooltip=folium.GeoJsonTooltip(fields=['Zone', 'Area (km²)', 'Mean LST (°C)', 'Max LST (°C)', 'Districts']),
+        ).add_to(m_zones)
+    folium.LayerControl(collapsed=True).add_to(m_zones)
+    return m_zones.get_root().render()
+
+start_section("heat_zones")
+st.header("🗺️ Heat Zones")
+st.markdown("""
+Contiguous areas where the mean land surface temperature over the satellite date range reaches a threshold,
+traced from the same 1 km MODIS grid as the hotspot analysis.
+""")
+
+if district_index is None:
+    st.warning("⚠️ District boundaries are needed for the heat zone analysis")
+else:
+    heat_zone_threshold = st.select_slider(
+        "LST threshold (°C)", options=HEAT_ZONE_THRESHOLDS, value=HEAT_ZONE_DEFAULT_THRESHOLD, key='heat_zone_threshold'
+    )
+    try:
+        df_zones, lst_peak = default_view(
+            'heat_zones', (selected_region, boundaries_key, modis_start_date, modis_end_date, heat_zone_threshold),
+            lambda: heat_zones(selected_region, boundaries_key, modis_start_date, modis_end_date,
+                               heat_zone_threshold, district_index),
+            is_default=modis_is_default and heat_zone_threshold == HEAT_ZONE_DEFAULT_THRESHOLD, label="Heat zones"
+        )
+        if df_zones.empty:
+            st.info(f"ℹ️ No area of {HEAT_ZONE_MIN_PIXELS} or more pixels reaches {heat_zone_threshold}°C in this period "
+                    f"(hottest pixel: {lst_peak:.1f}°C)")
+        else:
+            col1, col2, col3 = st.columns(3, gap="small")
+            with col1:
+                st.metric("Heat Zones", len(df_zones))
+            with col2:
+                st.metric("Total Area", f"{df_zones['Area (km²)'].sum():,.0f} km²")
+            with col3:
+                st.metric("Largest Zone", f"{df_zones['Area (km²)'].iloc[0]:,.0f} km²")
+            
+            st.iframe(
+                render_heat_zone_map(selected_region, boundaries_key, modis_start_date, modis_end_date,
+                                     heat_zone_threshold, district_index),
+                height=550
+            )
+            st.dataframe(
+                pd.DataFrame(df_zones.drop(columns='geometry')).round({'Area (km²)': 1, 'Mean LST (°C)': 1, 'Max LST (°C)': 1}),
+                width='stretch', hide_index=True
+            )
+            st.caption(f"Zones join pixels that touch, including at corners. Zones under {HEAT_ZONE_MIN_PIXELS} pixels are left out.")
+    except UpstreamDeadlineExceeded as e:
+        st.warning(f"⚠️ {str(e)}")
+    except Exception as e:
+        st.error(f"Error in heat zone analysis: {str(e)}")
+
+start_section("alerts")
+st.subheader(f"Live Heat Alerts for {selected_region}")
+# Alert levels come from the alert engine; the page only reads them
+alert_states = alert_engine.current(selected_region)
+for w in df_districts.round(2).to_dict('records'):
+    state = alert_states.get(w['District'])
+    alert_text = ""
+    if state is not None:
+        alert_text = f" — {HEAT_ALERT_LEVELS[state['level']][1]} (since {datetime.fromtimestamp(state['since'], IST).strftime('%H:%M')} IST)"
+    st.write(f"**{w['District']}**: {w['Temperature']} °C, Feels Like: {w['Feels Like']} °C, Humidity: {w['Humidity']} %{alert_text}")
+
+alert_history = alert_engine.recent(selected_region)
+with st.expander(f"📜 Alert History ({len(alert_history)} changes)"):
+    if alert_history:
+        df_history = pd.DataFrame(alert_history).drop(columns='Region')
+        df_history.insert(0, 'Time (IST)', pd.to_datetime(df_history.pop('Time'), unit='s', utc=True).dt.tz_convert(IST).dt.strftime('%Y-%m-%d %H:%M'))
+        st.dataframe(df_history.round({'Temperature': 1}), width='stretch', hide_index=True)
+    else:
+        st.caption(f"No alert level changes yet. Levels change after {ALERT_DEBOUNCE_SNAPSHOTS} consecutive weather snapshots agree, and are lowered only {ALERT_HYSTERESIS_C}°C below their threshold.")
+
+# Charts read the history rollup that fits the span, never the raw readings
+st.markdown("#### 📈 Weather History")
+history_col1, history_col2 = st.columns(2)
+with history_col1:
+    history_span = st.selectbox("Period", list(WEATHER_HISTORY_SPANS), index=1, key='weather_history_span')
+with history_col2:
+    history_field = st.radio("Variable", WEATHER_HISTORY_FIELDS, horizontal=True, key='weather_history_field')
+history_end = time.time()
+df_weather_history, history_level = weather_history.query(
+    df_districts['District'].tolist(), history_end - WEATHER_HISTORY_SPANS[history_span].total_seconds(), history_end
+)
+history_status = weather_history.status()
+if df_weather_history.empty:
+    st.info("ℹ️ No weather history for this period yet. Readings are recorded as the dashboard receives new weather snapshots.")
+else:
+    st.plotly_chart(build_weather_history_figure(df_weather_history, history_field), width='stretch')
+    st.caption(f"{history_level.capitalize()} means (IST) from the weather history: {history_status['readings']:,} readings for "
+               f"{history_status['districts']} districts in {history_status['bytes'] / 2 ** 20:.1f} MB")
+
+st.markdown("#### 🔮 Temperature Nowcast")
+nowcast_districts, nowcast_values, nowcast_spread, nowcast_last, nowcast_hours = nowcaster.forecast(df_districts['District'].tolist())
+if not nowcast_districts:
+    st.info("ℹ️ No nowcast yet. Forecasts start once the model has received weather readings.")
+else:
+    df_nowcast = pd.DataFrame({'District': nowcast_districts})
+    for i, hours in enumerate(NOWCAST_HORIZONS):
+        df_nowcast[f"+{hours} h"] = [
+            f"{value:.1f}" if np.isnan(spread) else f"{value:.1f} ± {spread:.1f}"
+            for value, spread in zip(nowcast_values[:, i], nowcast_spread[:, i])
+        ]
+    st.dataframe(df_nowcast, width='stretch', hide_index=True)
+    
+    # Warn about districts forecast to cross an alert threshold they are below now
+    for district, values in zip(nowcast_districts, nowcast_values):
+        level = alert_states.get(district, {}).get('level', len(HEAT_ALERT_LEVELS) - 1)
+        for threshold, message in HEAT_ALERT_LEVELS[:level]:
+            reached = np.nonzero(values >= threshold)[0]
+            if len(reached):
+                st.warning(f"⚠️ **{district}** is forecast to reach {threshold}°C in about {NOWCAST_HORIZONS[reached[0]]} h")
+                break
+    
+    caption = f"°C forecast from each district's last reading ({datetime.fromtimestamp(nowcast_last.max(), IST).strftime('%H:%M')} IST)"
+    if np.isnan(nowcast_spread).all():
+        caption += f". 95% ranges appear once {NOWCAST_MIN_SCORED} hourly forecasts per horizon have been checked against readings"
+    else:
+        caption += ", with 95% ranges from how far the model's past forecasts missed"
+    if nowcast_hours.min() < NOWCAST_WARMUP_HOURS:
+        caption += f". The model is still learning the daily cycle ({nowcast_hours.min():.0f} of {NOWCAST_WARMUP_HOURS} h of readings)"
+    st.caption(caption)
 
 st.caption("Satellite Data Source: MODIS LST | Weather Data Source: OpenWeather API")
+
+# Rerun the page when a refinement finishes so progressive views update in place
+if progressive_pending:
+    @st.fragment(run_every=PROGRESSIVE_POLL_SECONDS)
+    def refine_progressive_views():
+        """Poll this run's pending refinements; rerun once any of them finishes or fails"""
+        if any(future.done() for _, future in progressive_pending):
+            # Failures are noted first, so the rerun shows them rather than retrying;
+            # once nothing is pending the poll is not set up again
+            record_progressive_failures(progressive_pending)
+            st.rerun()
+    
+    refine_progressive_views()
+
+finish_run()
+if DEBUG_PANEL_ENABLED:
+    render_debug_panel()
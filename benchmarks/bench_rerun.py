@@ -0,0 +1,211 @@
+"""Offline rerun benchmark for the dashboard.
+
+Runs app.py headlessly through Streamlit's AppTest against the in-process
+fakes in fakes.py and reports, per dashboard section, the wall time and the
+Earth Engine / HTTP calls it made, for a cold run (empty caches) followed by
+warm reruns. Peak resident memory is reported for the whole process; pass
+--trace-memory for the Python-level peak from tracemalloc, which slows the
+run down noticeably.
+
+    python benchmarks/bench_rerun.py
+    python benchmarks/bench_rerun.py --warm-runs 5 --save baseline.json
+    python benchmarks/bench_rerun.py --compare baseline.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+
+class SectionTimer:
+    """Marks section boundaries whenever the app renders a title or header"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.marks = []
+
+    def start(self):
+        self.marks = [("startup", time.perf_counter())]
+        self.recorder.set_section("startup")
+
+    def mark(self, name):
+        name = str(name).strip()
+        self.marks.append((name, time.perf_counter()))
+        self.recorder.set_section(name)
+
+    def finish(self):
+        self.marks.append((None, time.perf_counter()))
+
+    def durations(self):
+        totals = {}
+        for (name, started), (_, ended) in zip(self.marks, self.marks[1:]):
+            totals[name] = totals.get(name, 0.0) + (ended - started)
+        return totals
+
+    def install(self):
+        import streamlit as st
+
+        for attr in ('title', 'header', 'subheader'):
+            original = getattr(st, attr)
+
+            def wrapped(body, *args, _original=original, **kwargs):
+                self.mark(body)
+                return _original(body, *args, **kwargs)
+            setattr(st, attr, wrapped)
+
+
+def summarize_run(timer, recorder, wall):
+    """Per-section wall time and upstream call counts for one run"""
+    sections = {name: {'seconds': seconds, 'ee_calls': 0, 'http_calls': 0, 'bytes': 0, 'upstream_seconds': 0.0}
+                for name, seconds in timer.durations().items()}
+    for call in recorder.calls:
+        entry = sections.setdefault(call['section'], {'seconds': 0.0, 'ee_calls': 0, 'http_calls': 0, 'bytes': 0, 'upstream_seconds': 0.0})
+        entry['ee_calls' if call['service'] == 'ee' else 'http_calls'] += 1
+        entry['bytes'] += call['bytes']
+        entry['upstream_seconds'] += call['seconds']
+    return {'wall_seconds': wall, 'sections': sections}
+
+
+def run_benchmark(warm_runs=3, latency_scale=1.0, trace_memory=False, timeout=600):
+    """Cold run followed by warm reruns; returns a JSON-serializable report"""
+    recorder = fakes.CallRecorder()
+    fakes.install(recorder=recorder, latency_scale=latency_scale)
+
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    timer = SectionTimer(recorder)
+    timer.install()
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    for key, value in fakes.FAKE_SECRETS.items():
+        at.secrets[key] = value
+
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+    if trace_memory:
+        tracemalloc.start()
+    runs = []
+    for index in range(1 + warm_runs):
+        recorder.reset()
+        timer.start()
+        started = time.perf_counter()
+        at.run()
+        wall = time.perf_counter() - started
+        timer.finish()
+        if at.exception:
+            raise RuntimeError(f"app raised during run {index}: {at.exception[0].value}")
+        runs.append(summarize_run(timer, recorder, wall))
+    peak_traced = None
+    if trace_memory:
+        peak_traced = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+
+    warm = runs[1:]
+    return {
+        'app': APP_PATH,
+        'latency_scale': latency_scale,
+        'cold': runs[0],
+        'warm': warm,
+        'warm_median_seconds': statistics.median(r['wall_seconds'] for r in warm) if warm else None,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'peak_traced_mb': peak_traced,
+        'errors': [e.value for e in at.error],
+        'warnings': [w.value for w in at.warning],
+    }
+
+
+def print_report(report):
+    cold = report['cold']['sections']
+    warm_runs = report['warm']
+    names = list(cold)
+    for run in warm_runs:
+        names.extend(n for n in run['sections'] if n not in names)
+
+    print(f"{'section':<62} {'cold s':>8} {'warm s':>8} {'ee':>4} {'http':>5} {'kB':>8}")
+    print('-' * 100)
+    for name in names:
+        c = cold.get(name, {})
+        warm_seconds = [r['sections'][name]['seconds'] for r in warm_runs if name in r['sections']]
+        warm_median = statistics.median(warm_seconds) if warm_seconds else 0.0
+        print(f"{name[:62]:<62} {c.get('seconds', 0.0):>8.3f} {warm_median:>8.3f} "
+              f"{c.get('ee_calls', 0):>4} {c.get('http_calls', 0):>5} {c.get('bytes', 0) / 1024:>8.1f}")
+    print('-' * 100)
+    totals = lambda run, key: sum(s[key] for s in run['sections'].values())
+    print(f"cold rerun: {report['cold']['wall_seconds']:.2f}s, "
+          f"{totals(report['cold'], 'ee_calls')} EE calls, {totals(report['cold'], 'http_calls')} HTTP calls")
+    if warm_runs:
+        print(f"warm rerun (median of {len(warm_runs)}): {report['warm_median_seconds']:.2f}s, "
+              f"{totals(warm_runs[-1], 'ee_calls')} EE calls, {totals(warm_runs[-1], 'http_calls')} HTTP calls")
+    print(f"peak resident memory: {report['peak_rss_mb']:.1f} MB")
+    if report['peak_traced_mb'] is not None:
+        print(f"peak traced memory: {report['peak_traced_mb']:.1f} MB")
+    for message in report['errors']:
+        print(f"app error: {message}")
+
+
+def compare(report, baseline, tolerance):
+    """List regressions of wall time or upstream call counts against a baseline"""
+    regressions = []
+    checks = [('cold rerun seconds', report['cold']['wall_seconds'], baseline['cold']['wall_seconds'])]
+    if report['warm_median_seconds'] is not None and baseline.get('warm_median_seconds') is not None:
+        checks.append(('warm rerun seconds', report['warm_median_seconds'], baseline['warm_median_seconds']))
+    for label, current, previous in checks:
+        if previous > 0 and current > previous * (1 + tolerance):
+            regressions.append(f"{label}: {previous:.2f} -> {current:.2f}")
+
+    for phase in ('cold', 'warm'):
+        current_run = report[phase] if phase == 'cold' else (report['warm'] or [None])[-1]
+        previous_run = baseline[phase] if phase == 'cold' else (baseline['warm'] or [None])[-1]
+        if not current_run or not previous_run:
+            continue
+        for key in ('ee_calls', 'http_calls'):
+            current = sum(s[key] for s in current_run['sections'].values())
+            previous = sum(s[key] for s in previous_run['sections'].values())
+            if current > previous:
+                regressions.append(f"{phase} {key}: {previous} -> {current}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--warm-runs', type=int, default=3)
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help="multiplier for simulated upstream latency; 0 disables sleeping")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="also report the tracemalloc peak (slower)")
+    parser.add_argument('--save', help="write the JSON report to this path")
+    parser.add_argument('--compare', help="baseline JSON report to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed relative slowdown before a timing counts as a regression")
+    args = parser.parse_args()
+
+    report = run_benchmark(warm_runs=args.warm_runs, latency_scale=args.latency_scale, trace_memory=args.trace_memory)
+    print_report(report)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
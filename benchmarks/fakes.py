@@ -0,0 +1,406 @@
+"""In-process stand-ins for Earth Engine and the OpenWeather API.
+
+The fake ``ee`` module records every chained call (``ImageCollection(...)
+.filterDate(...).mean()`` and so on) and only does work when a server
+round-trip would happen: ``getInfo()``, ``getMapId()`` and
+``ee.data.computePixels()``. Those sleep for a latency modelled on the real
+service and return payloads shaped and sized like the real responses.
+
+Weather requests are intercepted at the ``requests`` transport adapter, so
+pooled sessions and plain ``requests.get`` calls are both served locally.
+
+Every upstream call is reported to a ``CallRecorder`` so harnesses can
+attribute counts, bytes and time to dashboard sections.
+"""
+import json
+import random
+import sys
+import threading
+import time
+import types
+from datetime import date, datetime
+from unittest import mock
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+
+# Seconds per upstream call before latency_scale is applied
+EE_LATENCY = {
+    'getMapId': 0.35,
+    'minMax': 0.9,
+    'frequencyHistogram': 1.2,
+    'mean': 0.8,
+    'toList': 2.0,
+    'sample': 1.8,
+    'stratifiedSample': 2.2,
+    'sampleRegions': 1.0,
+    'reduceRegions': 1.5,
+    'computePixels': 1.2,
+    'getInfo': 0.5,
+}
+# Extra seconds per returned feature, day or pixel
+EE_LATENCY_PER_ITEM = {
+    'toList': 0.02,
+    'sample': 0.002,
+    'stratifiedSample': 0.002,
+    'sampleRegions': 0.005,
+    'reduceRegions': 0.05,
+}
+WEATHER_LATENCY = 0.15
+
+# Attribute names Streamlit and pandas probe on arbitrary objects; the fake
+# must not pretend to implement them
+_PROBED_NAMES = {
+    'collect', 'compute', 'to_pandas', 'toPandas', 'to_arrow', 'to_df', 'df',
+    'execute', 'to_numpy', 'head', 'shape', 'columns', 'dtypes', 'data',
+    'values', 'to_dict', 'keys', 'items', 'dataframe', 'to_list', 'tolist',
+    'read', 'fetchall',
+}
+
+WORLDCOVER_CLASSES = [10, 20, 30, 40, 50, 60, 80, 90]
+WORLDCOVER_WEIGHTS = [0.12, 0.02, 0.08, 0.18, 0.52, 0.05, 0.02, 0.01]
+
+
+class CallRecorder:
+    """Thread-safe log of upstream calls attributed to the current section"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.section = "startup"
+        self.calls = []
+
+    def set_section(self, name):
+        self.section = name
+
+    def record(self, service, operation, seconds, payload_bytes):
+        with self.lock:
+            self.calls.append({
+                'section': self.section,
+                'service': service,
+                'operation': operation,
+                'seconds': seconds,
+                'bytes': payload_bytes,
+                'at': time.perf_counter(),
+            })
+
+    def reset(self):
+        with self.lock:
+            self.calls = []
+            self.section = "startup"
+
+
+class FakeEnvironment:
+    """Latency and recording settings shared by the fake services"""
+
+    def __init__(self, recorder=None, latency_scale=1.0, seed=42):
+        self.recorder = recorder or CallRecorder()
+        self.latency_scale = latency_scale
+        self.seed = seed
+
+    def wait(self, seconds):
+        if self.latency_scale > 0:
+            time.sleep(seconds * self.latency_scale)
+        return seconds * self.latency_scale
+
+
+ENV = FakeEnvironment()
+
+
+def _walk(value):
+    """Yield FakeComputed objects nested in call arguments"""
+    if isinstance(value, FakeComputed):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _walk(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _walk(item)
+
+
+class FakeComputed:
+    """Chainable placeholder for any ee object; records the call chain"""
+
+    def __init__(self, chain=()):
+        self._chain = tuple(chain)
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name in _PROBED_NAMES:
+            raise AttributeError(name)
+
+        def method(*args, **kwargs):
+            return FakeComputed(self._chain + ((name, args, kwargs),))
+        return method
+
+    def __repr__(self):
+        return f"FakeComputed({'.'.join(op for op, _, _ in self._chain)})"
+
+    def ops(self):
+        """Every operation name in this chain and in nested arguments"""
+        names = []
+        for op, args, kwargs in self._chain:
+            names.append(op)
+            for nested in _walk(list(args) + list(kwargs.values())):
+                names.extend(nested.ops())
+        return names
+
+    def find(self, op):
+        """Arguments of the last call named op anywhere in the chain"""
+        found = None
+        for name, args, kwargs in self._chain:
+            if name == op:
+                found = (args, kwargs)
+            for nested in _walk(list(args) + list(kwargs.values())):
+                inner = nested.find(op)
+                if inner is not None:
+                    found = inner
+        return found
+
+    def serialize(self):
+        return json.dumps(self._describe(), default=str, sort_keys=True)
+
+    def _describe(self):
+        def describe(value):
+            if isinstance(value, FakeComputed):
+                return value._describe()
+            if callable(value):
+                # Mapped functions are serialized by name, like EE serializes their body
+                return f"<function {value.__qualname__}>"
+            if isinstance(value, (list, tuple)):
+                return [describe(v) for v in value]
+            return value
+        return [[op, describe(args), {k: describe(v) for k, v in kwargs.items()}] for op, args, kwargs in self._chain]
+
+    def _rng(self):
+        return random.Random(f"{ENV.seed}:{self.serialize()}")
+
+    def getMapId(self, vis_params=None):
+        started = time.perf_counter()
+        ENV.wait(EE_LATENCY['getMapId'])
+        token = abs(hash(self.serialize() + json.dumps(vis_params, default=str))) % 10 ** 12
+        url = f"https://earthengine.googleapis.com/v1/projects/fake/maps/{token:012d}/tiles/{{z}}/{{x}}/{{y}}"
+        payload = {'mapid': f"projects/fake/maps/{token:012d}", 'token': '', 'tile_fetcher': types.SimpleNamespace(url_format=url)}
+        ENV.recorder.record('ee', 'getMapId', time.perf_counter() - started, len(url) + 64)
+        return payload
+
+    def getInfo(self):
+        started = time.perf_counter()
+        operation, payload, items = self._payload()
+        ENV.wait(EE_LATENCY.get(operation, EE_LATENCY['getInfo']) + EE_LATENCY_PER_ITEM.get(operation, 0.0) * items)
+        ENV.recorder.record('ee', operation, time.perf_counter() - started, len(json.dumps(payload, default=str)))
+        return payload
+
+    def _date_span(self):
+        found = self.find('filterDate')
+        if not found:
+            return 30
+        start, end = (datetime.fromisoformat(str(d)[:10]).date() for d in found[0][:2])
+        return max((end - start).days, 1)
+
+    def _payload(self):
+        ops = self.ops()
+        last = self._chain[-1][0] if self._chain else ''
+        rng = self._rng()
+
+        if last == 'get' or last == 'getNumber':
+            return 'getInfo', 0.15 + rng.random() * 0.4, 1
+        if 'toList' in ops:
+            days = self._date_span()
+            base = date.fromisoformat(str(self.find('filterDate')[0][0])[:10]) if self.find('filterDate') else date(2026, 1, 1)
+            features = [
+                {'type': 'Feature', 'geometry': None, 'properties': {
+                    'date': date.fromordinal(base.toordinal() + i).isoformat(),
+                    'mean_lst': None if rng.random() < 0.15 else 22 + 6 * np.sin(i / 9) + rng.gauss(0, 1.2),
+                }}
+                for i in range(days)
+            ]
+            return 'toList', features, days
+        if last == 'stratifiedSample' and self._chain[-1][2].get('classValues'):
+            kwargs = self._chain[-1][2]
+            # Rare classes run out of pixels the way they do over the real region
+            classes = []
+            for value, points in zip(kwargs['classValues'], kwargs['classPoints']):
+                weight = WORLDCOVER_WEIGHTS[WORLDCOVER_CLASSES.index(value)] if value in WORLDCOVER_CLASSES else 0
+                classes += [value] * min(int(points), int(weight * 6000))
+            return last, self._sample_features(rng, len(classes), kwargs.get('geometries', False), classes), len(classes)
+        if last in ('sample', 'stratifiedSample'):
+            kwargs = self._chain[-1][2]
+            count = kwargs.get('numPixels') or sum(kwargs.get('classPoints') or []) or kwargs.get('numPoints') or 500
+            return last, self._sample_features(rng, int(count), kwargs.get('geometries', False)), int(count)
+        if last == 'sampleRegions':
+            collection = self._chain[-1][2].get('collection')
+            features = []
+            if collection is not None:
+                found = collection.find('FeatureCollection')
+                members = found[0][0] if found and found[0] and isinstance(found[0][0], list) else []
+                for member in members:
+                    props = dict(member._chain[0][1][1]) if len(member._chain[0][1]) > 1 else {}
+                    props['nd'] = 0.05 + rng.random() * 0.5
+                    features.append({'type': 'Feature', 'geometry': None, 'properties': props})
+            return 'sampleRegions', {'type': 'FeatureCollection', 'features': features}, len(features)
+        if last == 'reduceRegions':
+            collection = self._chain[-1][2].get('collection') or (self._chain[-1][1][0] if self._chain[-1][1] else None)
+            members = [None] * 11
+            if isinstance(collection, FakeComputed):
+                found = collection.find('FeatureCollection')
+                if found and found[0] and isinstance(found[0][0], list):
+                    members = found[0][0]
+            features = []
+            for i, member in enumerate(members):
+                props = dict(member._chain[0][1][1]) if member is not None and len(member._chain[0][1]) > 1 else {}
+                props.update({'mean': 24 + rng.gauss(0, 2), 'LST': 24 + rng.gauss(0, 2), 'NDVI': 0.2 + rng.random() * 0.2, 'index': i})
+                features.append({'type': 'Feature', 'geometry': None, 'properties': props})
+            return 'reduceRegions', {'type': 'FeatureCollection', 'features': features}, len(features)
+        if 'frequencyHistogram' in ops:
+            return 'frequencyHistogram', {'Map': self._histogram(rng)}, 1
+        if 'minMax' in ops:
+            low = 14 + rng.random() * 4
+            return 'minMax', {'LST_Day_1km_min': low, 'LST_Day_1km_max': low + 12 + rng.random() * 4}, 1
+        if 'sum' in ops and 'count' in ops and 'reduceRegion' in ops:
+            count = rng.randint(2000, 4000)
+            means = {'LST_Day_1km': 24 + rng.gauss(0, 1), 'LST': 24 + rng.gauss(0, 1), 'NDVI': 0.2 + rng.random() * 0.1}
+            payload = {}
+            for band, mean in means.items():
+                payload[f'{band}_sum'] = mean * count
+                payload[f'{band}_count'] = count
+            return 'mean', payload, 1
+        if 'group' in ops and 'reduceRegion' in ops:
+            groups = [{'LandCover': c, 'mean': [31 - (4 if c in (10, 80) else 0) + rng.gauss(0, 1), 0.2 + rng.random() * 0.3]}
+                      for c in WORLDCOVER_CLASSES]
+            return 'mean', {'groups': groups}, 1
+        if 'mean' in ops and 'reduceRegion' in ops:
+            return 'mean', {'LST_Day_1km': 24 + rng.gauss(0, 1), 'LST': 24 + rng.gauss(0, 1), 'NDVI': 0.2 + rng.random() * 0.1}, 1
+        return 'getInfo', None, 1
+
+    def _histogram(self, rng):
+        total = 1.5e5
+        return {str(c): round(total * w * (0.9 + rng.random() * 0.2), 1) for c, w in zip(WORLDCOVER_CLASSES, WORLDCOVER_WEIGHTS)}
+
+    def _sample_features(self, rng, count, geometries, classes=None):
+        features = []
+        for i in range(count):
+            land_cover = classes[i] if classes else rng.choices(WORLDCOVER_CLASSES, WORLDCOVER_WEIGHTS)[0]
+            ndvi = min(max(rng.gauss(0.45 if land_cover in (10, 20, 30, 40) else 0.15, 0.12), -0.2), 0.9)
+            lst = 31 - 9 * ndvi + (2.5 if land_cover == 50 else 0) - (4 if land_cover == 80 else 0) + rng.gauss(0, 1.1)
+            feature = {'type': 'Feature', 'properties': {'LST': lst, 'NDVI': ndvi, 'LandCover': land_cover}}
+            feature['geometry'] = {'type': 'Point', 'coordinates': [76.85 + rng.random() * 0.5, 28.41 + rng.random() * 0.47]} if geometries else None
+            features.append(feature)
+        return {'type': 'FeatureCollection', 'features': features}
+
+
+class _Namespace(FakeComputed):
+    """Root object such as ee.Geometry or ee.Reducer whose methods start chains"""
+
+    def __init__(self, name):
+        super().__init__(((name, (), {}),))
+
+
+def _constructor(name):
+    def construct(*args, **kwargs):
+        return FakeComputed(((name, args, kwargs),))
+    construct.__name__ = name
+    return construct
+
+
+def _compute_pixels(params):
+    """Stand-in for ee.data.computePixels returning a NUMPY_NDARRAY grid"""
+    started = time.perf_counter()
+    grid = params.get('grid', {})
+    dims = grid.get('dimensions', {'width': 64, 'height': 64})
+    width, height = int(dims['width']), int(dims['height'])
+    ENV.wait(EE_LATENCY['computePixels'] + 1e-5 * width * height)
+    rng = np.random.default_rng(ENV.seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    field = 26 + 6 * np.exp(-(((xx - width * 0.55) / (width * 0.25)) ** 2 + ((yy - height * 0.45) / (height * 0.2)) ** 2))
+    field = field + rng.normal(0, 0.8, size=field.shape)
+    bands = params.get('bandIds') or ['LST']
+    out = np.zeros((height, width), dtype=[(b, 'f8') for b in bands])
+    for band in bands:
+        out[band] = field
+    ENV.recorder.record('ee', 'computePixels', time.perf_counter() - started, out.nbytes)
+    return out
+
+
+def make_fake_ee():
+    """Build a module object that can replace ``ee`` in sys.modules"""
+    ee = types.ModuleType('ee')
+    for name in ['Image', 'ImageCollection', 'Feature', 'FeatureCollection', 'Date',
+                 'Number', 'List', 'Dictionary', 'String', 'Array', 'Kernel']:
+        setattr(ee, name, _constructor(name))
+    for name in ['Geometry', 'Reducer', 'Filter', 'Algorithms', 'Terrain']:
+        setattr(ee, name, _Namespace(name))
+    ee.Initialize = lambda *args, **kwargs: None
+    ee.Authenticate = lambda *args, **kwargs: None
+    ee.data = types.SimpleNamespace(
+        computePixels=_compute_pixels,
+        getAlgorithms=lambda: {},
+    )
+    ee.EEException = type('EEException', (Exception,), {})
+    ee.__version__ = 'fake'
+    return ee
+
+
+class FakeWeatherAdapter(HTTPAdapter):
+    """Transport adapter answering OpenWeather current-weather requests locally"""
+
+    def send(self, request, **kwargs):
+        started = time.perf_counter()
+        ENV.wait(WEATHER_LATENCY)
+        query = dict(part.split('=', 1) for part in request.url.split('?', 1)[-1].split('&') if '=' in part)
+        rng = random.Random(f"{ENV.seed}:{query.get('lat')}:{query.get('lon')}:{int(time.time() // 300)}")
+        temp = 22 + rng.random() * 8
+        payload = {
+            'coord': {'lon': float(query.get('lon', 77.2)), 'lat': float(query.get('lat', 28.6))},
+            'weather': [{'id': 721, 'main': 'Haze', 'description': 'haze', 'icon': '50d'}],
+            'base': 'stations',
+            'main': {
+                'temp': round(temp, 2), 'feels_like': round(temp + rng.uniform(-1.5, 2.5), 2),
+                'temp_min': round(temp - 1, 2), 'temp_max': round(temp + 1, 2),
+                'pressure': 1012, 'humidity': rng.randint(25, 85),
+            },
+            'visibility': 3000,
+            'wind': {'speed': round(rng.random() * 4, 2), 'deg': rng.randint(0, 359)},
+            'dt': int(time.time()),
+            'name': 'Delhi',
+            'cod': 200,
+        }
+        body = json.dumps(payload).encode()
+        response = Response()
+        response.status_code = 200
+        response._content = body
+        response.url = request.url
+        response.request = request
+        response.headers['Content-Type'] = 'application/json'
+        response.encoding = 'utf-8'
+        ENV.recorder.record('http', 'weather', time.perf_counter() - started, len(body))
+        return response
+
+
+class _Credentials:
+    """Placeholder for service account credentials"""
+
+
+def install(recorder=None, latency_scale=1.0, seed=42):
+    """Swap in the fake services for the rest of the process"""
+    ENV.recorder = recorder or ENV.recorder
+    ENV.latency_scale = latency_scale
+    ENV.seed = seed
+
+    sys.modules['ee'] = make_fake_ee()
+    mock.patch.object(requests.Session, 'get_adapter', lambda self, url: FakeWeatherAdapter()).start()
+
+    from google.oauth2 import service_account
+    mock.patch.object(
+        service_account.Credentials, 'from_service_account_info',
+        classmethod(lambda cls, info, **kwargs: _Credentials())
+    ).start()
+    return ENV
+
+
+FAKE_SECRETS = {
+    'OPENWEATHER_API_KEY': 'offline-benchmark',
+    'GEE_SERVICE_ACCOUNT': 'benchmark@example.iam.gserviceaccount.com',
+    'GEE_PRIVATE_KEY': 'offline-benchmark',
+}
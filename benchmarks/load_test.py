@@ -0,0 +1,252 @@
+"""Multi-session load test for the dashboard.
+
+Simulates N open dashboards in one process, each rerunning the app on the
+autorefresh interval, against the in-process fakes in fakes.py. Sessions
+share Streamlit's caches exactly as they do on a real server, so the report
+shows how well caching absorbs the load:
+
+- p50/p95/p99 rerun latency, cold (first load) and refresh reruns
+- Earth Engine and HTTP request rates, and calls per rerun
+- process memory growth per session, measured after a priming run has
+  loaded every import and with the shared caches starting empty
+
+Time is compressed by --speedup: a 5 minute autorefresh at --speedup 20
+fires every 15 real seconds, and cache TTLs expire on the same compressed
+clock. Upstream latency is not compressed.
+
+--alignment controls the autorefresh phase of the sessions: 1.0 means every
+dashboard was opened at the same moment and refreshes in lockstep (the
+event-day worst case), 0.0 spreads the phases evenly over the interval.
+
+    python benchmarks/load_test.py --sessions 20 --duration 1800 --speedup 20
+    python benchmarks/load_test.py --sessions 50 --alignment 0 --json load.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+AUTOREFRESH_SECONDS = 300
+
+
+class CompressedClock:
+    """Monotonic clock running --speedup times faster than real time"""
+
+    def __init__(self, speedup):
+        self.speedup = speedup
+        self.origin = time.monotonic()
+
+    def __call__(self):
+        return self.origin + (time.monotonic() - self.origin) * self.speedup
+
+    def sleep_until(self, simulated):
+        remaining = (simulated - self()) / self.speedup
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(values):
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None, 'count': 0}
+    arr = np.asarray(values)
+    return {
+        'p50': float(np.percentile(arr, 50)),
+        'p95': float(np.percentile(arr, 95)),
+        'p99': float(np.percentile(arr, 99)),
+        'max': float(arr.max()),
+        'count': len(values),
+    }
+
+
+def share_script_bytecode():
+    """Compile app.py once for all sessions, as the real server does
+
+    AppTest compiles the script on every run, and concurrent ast.parse calls
+    are not thread-safe on every Python version.
+    """
+    from streamlit.runtime.scriptrunner import script_cache
+
+    lock = threading.Lock()
+    compiled = {}
+    original = script_cache.ScriptCache.get_bytecode
+
+    def get_bytecode(self, script_path):
+        with lock:
+            if script_path not in compiled:
+                compiled[script_path] = original(self, script_path)
+            return compiled[script_path]
+    script_cache.ScriptCache.get_bytecode = get_bytecode
+
+
+def prime_process(args):
+    """Run the app once so imports are loaded before memory is measured"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    for key, value in fakes.FAKE_SECRETS.items():
+        at.secrets[key] = value
+    at.run()
+
+
+def run_session(index, offset, args, clock, start, results, memory_samples):
+    """Open one dashboard and rerun it on its autorefresh schedule"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    for key, value in fakes.FAKE_SECRETS.items():
+        at.secrets[key] = value
+
+    rng = random.Random(index)
+    due = start + offset
+    cycle = 0
+    while due < start + args.duration:
+        clock.sleep_until(due)
+        started = time.perf_counter()
+        try:
+            at.run()
+            failed = bool(at.exception)
+        except Exception:
+            failed = True
+        latency = time.perf_counter() - started
+        results.append({'session': index, 'cycle': cycle, 'latency': latency, 'failed': failed,
+                        'at': clock() - start})
+        memory_samples.append(current_rss_mb())
+        cycle += 1
+        jitter = rng.uniform(-args.jitter, args.jitter) if args.jitter else 0.0
+        due = start + offset + cycle * args.refresh_interval + jitter
+
+
+def run_load_test(args):
+    recorder = fakes.CallRecorder()
+    fakes.install(recorder=recorder, latency_scale=args.latency_scale)
+
+    # Caches created from here on expire on the compressed clock
+    from streamlit.runtime.caching import cache_utils
+    clock = CompressedClock(args.speedup)
+    cache_utils.TTLCACHE_TIMER = clock
+
+    import streamlit as st
+    share_script_bytecode()
+    prime_process(args)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    recorder.reset()
+
+    baseline_rss = current_rss_mb()
+    results, memory_samples = [], []
+    start, real_start = clock(), time.monotonic()
+    spread = (1.0 - args.alignment) * args.refresh_interval
+    threads = []
+    for index in range(args.sessions):
+        offset = spread * index / args.sessions
+        thread = threading.Thread(target=run_session, name=f"session-{index}",
+                                  args=(index, offset, args, clock, start, results, memory_samples), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    elapsed_real = time.monotonic() - real_start
+    elapsed_simulated = max(clock() - start, 1e-9)
+
+    cold = [r['latency'] for r in results if r['cycle'] == 0 and not r['failed']]
+    refresh = [r['latency'] for r in results if r['cycle'] > 0 and not r['failed']]
+    reruns = max(len(results), 1)
+    calls = {service: [c for c in recorder.calls if c['service'] == service] for service in ('ee', 'http')}
+    peak_rss = max(memory_samples, default=baseline_rss)
+
+    return {
+        'sessions': args.sessions,
+        'alignment': args.alignment,
+        'refresh_interval': args.refresh_interval,
+        'speedup': args.speedup,
+        'simulated_seconds': elapsed_simulated,
+        'real_seconds': elapsed_real,
+        'reruns': len(results),
+        'failed_reruns': sum(r['failed'] for r in results),
+        'latency_cold': percentiles(cold),
+        'latency_refresh': percentiles(refresh),
+        'upstream': {
+            service: {
+                'calls': len(items),
+                'per_minute': len(items) / elapsed_simulated * 60,
+                'per_rerun': len(items) / reruns,
+                'bytes': sum(c['bytes'] for c in items),
+            }
+            for service, items in calls.items()
+        },
+        'memory': {
+            'baseline_rss_mb': baseline_rss,
+            'peak_rss_mb': peak_rss,
+            'per_session_mb': (peak_rss - baseline_rss) / args.sessions,
+        },
+    }
+
+
+def print_report(report):
+    print(f"{report['sessions']} sessions, alignment {report['alignment']:.2f}, "
+          f"refresh every {report['refresh_interval']:.0f}s, "
+          f"{report['simulated_seconds'] / 60:.1f} simulated min in {report['real_seconds']:.0f}s")
+    print(f"reruns: {report['reruns']} ({report['failed_reruns']} failed)")
+    for label in ('cold', 'refresh'):
+        stats = report[f'latency_{label}']
+        if stats['count']:
+            print(f"{label:>8} rerun latency  p50 {stats['p50']:6.2f}s  p95 {stats['p95']:6.2f}s  "
+                  f"p99 {stats['p99']:6.2f}s  max {stats['max']:6.2f}s  (n={stats['count']})")
+    for service, stats in report['upstream'].items():
+        print(f"{service:>8} requests  {stats['calls']:5d} total  {stats['per_minute']:7.1f}/min  "
+              f"{stats['per_rerun']:5.2f}/rerun  {stats['bytes'] / 1024:8.1f} kB")
+    memory = report['memory']
+    print(f"  memory  baseline {memory['baseline_rss_mb']:.0f} MB  peak {memory['peak_rss_mb']:.0f} MB  "
+          f"{memory['per_session_mb']:.1f} MB/session")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=1800,
+                        help="simulated seconds to run for")
+    parser.add_argument('--refresh-interval', type=float, default=AUTOREFRESH_SECONDS,
+                        help="simulated seconds between autorefresh reruns")
+    parser.add_argument('--alignment', type=float, default=1.0,
+                        help="1.0 = all sessions refresh together, 0.0 = phases spread evenly")
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help="random +/- simulated seconds added to each refresh")
+    parser.add_argument('--speedup', type=float, default=20.0,
+                        help="how much faster than real time the simulated clock runs")
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help="multiplier for simulated upstream latency; 0 disables sleeping")
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--json', help="write the JSON report to this path")
+    args = parser.parse_args()
+    if not 0.0 <= args.alignment <= 1.0:
+        parser.error("--alignment must be between 0 and 1")
+
+    report = run_load_test(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
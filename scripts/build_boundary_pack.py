@@ -0,0 +1,124 @@
+"""Build the bundled district boundary pack for the dashboard.
+
+Combines Delhi's 11 districts from delhi_admin.geojson with the 24 Haryana,
+Uttar Pradesh and Rajasthan districts of the National Capital Region from a
+geoBoundaries India ADM2 file, simplifies every outline once, and writes
+ncr_districts.geojson next to app.py. The dashboard loads this pack at
+startup instead of the full-resolution sources and builds its spatial index
+from it, so neither the raw files nor any simplification work is needed at
+runtime.
+
+The geoBoundaries file (IND, ADM2) can be downloaded from
+https://www.geoboundaries.org. Without --adm2 the pack holds the Delhi
+districts only and the dashboard's NCR option stays unavailable.
+
+    python scripts/build_boundary_pack.py --adm2 geoBoundaries-IND-ADM2_simplified.geojson
+    python scripts/build_boundary_pack.py --tolerance 0.001 --output /tmp/pack.geojson
+"""
+import argparse
+import json
+import os
+import sys
+
+import geopandas as gpd
+import shapely
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The 24 districts outside Delhi that make up the National Capital Region
+NCR_DISTRICTS = {
+    'Haryana': ['Faridabad', 'Gurugram', 'Nuh', 'Rohtak', 'Sonipat', 'Rewari', 'Jhajjar', 'Panipat',
+                'Palwal', 'Bhiwani', 'Charkhi Dadri', 'Mahendragarh', 'Jind', 'Karnal'],
+    'Uttar Pradesh': ['Meerut', 'Ghaziabad', 'Gautam Budh Nagar', 'Bulandshahr', 'Baghpat', 'Hapur',
+                      'Shamli', 'Muzaffarnagar'],
+    'Rajasthan': ['Alwar', 'Bharatpur'],
+}
+
+# Older or alternative spellings found in geoBoundaries releases
+DISTRICT_ALIASES = {
+    'Gurgaon': 'Gurugram',
+    'Mewat': 'Nuh',
+    'Sonepat': 'Sonipat',
+    'Gautam Buddha Nagar': 'Gautam Budh Nagar',
+    'Mahendergarh': 'Mahendragarh',
+    'Bagpat': 'Baghpat',
+}
+
+
+def load_delhi(path):
+    """Delhi's districts with District and State columns"""
+    gdf = gpd.read_file(path).to_crs('EPSG:4326')
+    if 'STATE' in gdf.columns:
+        gdf = gdf[gdf['STATE'].str.contains('DELHI', case=False, na=False)]
+    names = gdf['District'] if 'District' in gdf.columns else gdf['Name']
+    return gpd.GeoDataFrame({'District': names.astype(str).str.title().values, 'State': 'Delhi'},
+                            geometry=gdf.geometry.values, crs='EPSG:4326')
+
+
+def load_ncr(path):
+    """NCR districts outside Delhi from a geoBoundaries ADM2 file"""
+    gdf = gpd.read_file(path).to_crs('EPSG:4326')
+    state_of = {name: state for state, names in NCR_DISTRICTS.items() for name in names}
+    names = gdf['shapeName'].astype(str).str.strip().replace(DISTRICT_ALIASES)
+    keep = names.isin(state_of)
+    ncr = gpd.GeoDataFrame({'District': names[keep].values, 'State': names[keep].map(state_of).values},
+                           geometry=gdf.geometry[keep].values, crs='EPSG:4326')
+    # Some releases split a district into several features
+    ncr = ncr.dissolve(by=['District', 'State'], as_index=False)
+
+    missing = sorted(set(state_of) - set(ncr['District']))
+    if missing:
+        print(f"warning: not found in {path}: {', '.join(missing)}", file=sys.stderr)
+    return ncr
+
+
+def simplify(gdf, tolerance, precision):
+    """Simplified 2D outlines with coordinates snapped to precision degrees"""
+    geometries = shapely.force_2d(shapely.make_valid(gdf.geometry.values))
+    geometries = shapely.simplify(geometries, tolerance, preserve_topology=True)
+    return gdf.set_geometry(shapely.set_precision(geometries, precision))
+
+
+def to_feature(row):
+    return {
+        'type': 'Feature',
+        'bbox': [round(v, 5) for v in row.geometry.bounds],
+        'properties': {'District': row.District, 'State': row.State,
+                       'Region': 'Delhi' if row.State == 'Delhi' else 'NCR'},
+        'geometry': shapely.geometry.mapping(row.geometry),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--delhi', default=os.path.join(ROOT, 'delhi_admin.geojson'),
+                        help="Delhi district boundaries")
+    parser.add_argument('--adm2', help="geoBoundaries India ADM2 GeoJSON for the rest of the NCR")
+    parser.add_argument('--tolerance', type=float, default=0.0005,
+                        help="simplification tolerance in degrees (0.0005 is about 50 m)")
+    parser.add_argument('--precision', type=float, default=1e-5,
+                        help="coordinate grid in degrees")
+    parser.add_argument('--output', default=os.path.join(ROOT, 'ncr_districts.geojson'))
+    args = parser.parse_args()
+
+    parts = [load_delhi(args.delhi)]
+    if args.adm2:
+        parts.append(load_ncr(args.adm2))
+    districts = simplify(gpd.pd.concat(parts, ignore_index=True), args.tolerance, args.precision)
+
+    pack = {
+        'type': 'FeatureCollection',
+        'bbox': [round(v, 5) for v in districts.total_bounds],
+        'tolerance': args.tolerance,
+        'features': [to_feature(row) for row in districts.itertuples(index=False)],
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(pack, f, separators=(',', ':'))
+
+    counts = districts['State'].value_counts().to_dict()
+    print(f"wrote {len(districts)} districts ({counts}) to {args.output}, "
+          f"{os.path.getsize(args.output) / 1024:.0f} kB")
+
+
+if __name__ == '__main__':
+    main()
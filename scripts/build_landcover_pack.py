@@ -0,0 +1,170 @@
+"""Build the static land-cover composition pack for the dashboard.
+
+ESA WorldCover v200 is a fixed 2021 product, so its composition only has to
+be computed once. This script downloads the WorldCover class raster on its
+native grid (1/12000 degree, about 10 m) for the extent of the districts in
+ncr_districts.geojson. It assigns every pixel to the district that contains
+the pixel centre and writes landcover_pack.npz next to app.py with:
+
+- exact pixel counts per district and class at native resolution; the
+  whole-region counts are the sum over its districts
+- the class raster for the Delhi extent, for local analysis
+
+The dashboard reads the counts at startup and makes no Earth Engine calls
+for land-use statistics. Rebuild the pack whenever ncr_districts.geojson
+changes.
+
+    python scripts/build_landcover_pack.py --key gee-service-account.json
+    python scripts/build_landcover_pack.py --chunk 1024 --workers 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ee
+import geopandas as gpd
+import numpy as np
+import shapely
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRODUCT = 'ESA/WorldCover/v200'
+BAND = 'Map'
+CLASS_VALUES = [10, 20, 30, 40, 50, 60, 70, 80, 90, 95, 100]
+# WorldCover's native grid: 1/12000 degree pixels aligned to whole degrees
+PIXEL_DEGREES = 1 / 12000
+
+
+def initialize(key_path):
+    """Initialize Earth Engine from a service account key, or default credentials"""
+    if key_path:
+        with open(key_path, encoding='utf-8') as f:
+            email = json.load(f)['client_email']
+        ee.Initialize(ee.ServiceAccountCredentials(email, key_path))
+    else:
+        ee.Initialize()
+
+
+def native_grid(bounds):
+    """Origin and size in pixels of the native grid covering bounds"""
+    min_x, min_y, max_x, max_y = bounds
+    col0, row0 = int(np.floor(min_x / PIXEL_DEGREES)), int(np.floor(-max_y / PIXEL_DEGREES))
+    col1, row1 = int(np.ceil(max_x / PIXEL_DEGREES)), int(np.ceil(-min_y / PIXEL_DEGREES))
+    return col0 * PIXEL_DEGREES, -row0 * PIXEL_DEGREES, col1 - col0, row1 - row0
+
+
+def fetch_classes(image, origin_x, origin_y, width, height, chunk, workers):
+    """Class raster on the native grid, downloaded in chunks with computePixels"""
+    classes = np.zeros((height, width), dtype=np.uint8)
+
+    def fetch(row, col):
+        rows, cols = min(chunk, height - row), min(chunk, width - col)
+        for attempt in range(5):
+            try:
+                block = ee.data.computePixels({
+                    'expression': image,
+                    'fileFormat': 'NUMPY_NDARRAY',
+                    'bandIds': [BAND],
+                    'grid': {
+                        'dimensions': {'width': cols, 'height': rows},
+                        'affineTransform': {
+                            'scaleX': PIXEL_DEGREES, 'shearX': 0, 'translateX': origin_x + col * PIXEL_DEGREES,
+                            'shearY': 0, 'scaleY': -PIXEL_DEGREES, 'translateY': origin_y - row * PIXEL_DEGREES,
+                        },
+                        'crsCode': 'EPSG:4326',
+                    },
+                })
+                break
+            except ee.EEException:
+                if attempt == 4:
+                    raise
+                time.sleep(2 ** attempt)
+        classes[row:row + rows, col:col + cols] = np.nan_to_num(block[BAND]).astype(np.uint8)
+
+    jobs = [(row, col) for row in range(0, height, chunk) for col in range(0, width, chunk)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for done, _ in enumerate(pool.map(lambda job: fetch(*job), jobs), start=1):
+            print(f"\r  {done}/{len(jobs)} chunks", end='', flush=True)
+    print()
+    return classes
+
+
+def label_districts(districts, origin_x, origin_y, width, height):
+    """Index of the district containing each pixel centre, -1 outside all of them"""
+    labels = np.full((height, width), -1, dtype=np.int16)
+    for index, geometry in enumerate(districts.geometry.values):
+        shapely.prepare(geometry)
+        min_x, min_y, max_x, max_y = geometry.bounds
+        col0, col1 = int((min_x - origin_x) / PIXEL_DEGREES), int(np.ceil((max_x - origin_x) / PIXEL_DEGREES))
+        row0, row1 = int((origin_y - max_y) / PIXEL_DEGREES), int(np.ceil((origin_y - min_y) / PIXEL_DEGREES))
+        col0, row0 = max(col0, 0), max(row0, 0)
+        col1, row1 = min(col1, width), min(row1, height)
+        xs = origin_x + (np.arange(col0, col1) + 0.5) * PIXEL_DEGREES
+        ys = origin_y - (np.arange(row0, row1) + 0.5) * PIXEL_DEGREES
+        inside = shapely.contains_xy(geometry, *np.meshgrid(xs, ys))
+        window = labels[row0:row1, col0:col1]
+        # Where simplified outlines overlap, the first district listed keeps the pixel
+        window[inside & (window < 0)] = index
+    return labels
+
+
+def count_classes(labels, classes, n_districts):
+    """Pixel counts per district (rows) and WorldCover class (columns)"""
+    lookup = np.full(256, -1, dtype=np.int64)
+    lookup[CLASS_VALUES] = np.arange(len(CLASS_VALUES))
+    class_index = lookup[classes]
+    valid = (labels >= 0) & (class_index >= 0)
+    flat = labels[valid].astype(np.int64) * len(CLASS_VALUES) + class_index[valid]
+    return np.bincount(flat, minlength=n_districts * len(CLASS_VALUES)).reshape(n_districts, len(CLASS_VALUES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--key', help="Earth Engine service account key file")
+    parser.add_argument('--boundaries', default=os.path.join(ROOT, 'ncr_districts.geojson'))
+    parser.add_argument('--raster-region', default='Delhi',
+                        help="Region value of the districts whose extent the stored raster covers")
+    parser.add_argument('--chunk', type=int, default=2048, help="computePixels block size in pixels")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--output', default=os.path.join(ROOT, 'landcover_pack.npz'))
+    args = parser.parse_args()
+
+    initialize(args.key)
+    districts = gpd.read_file(args.boundaries).reset_index(drop=True)
+    origin_x, origin_y, width, height = native_grid(districts.total_bounds)
+    print(f"{len(districts)} districts, {width} x {height} native pixels")
+
+    image = ee.ImageCollection(PRODUCT).first().select(BAND)
+    classes = fetch_classes(image, origin_x, origin_y, width, height, args.chunk, args.workers)
+    labels = label_districts(districts, origin_x, origin_y, width, height)
+    counts = count_classes(labels, classes, len(districts))
+
+    # Crop the stored raster to the extent of the raster region's districts
+    region = districts[districts['Region'] == args.raster_region]
+    crop_x, crop_y, crop_width, crop_height = native_grid(region.total_bounds)
+    col = int(round((crop_x - origin_x) / PIXEL_DEGREES))
+    row = int(round((origin_y - crop_y) / PIXEL_DEGREES))
+    raster = classes[row:row + crop_height, col:col + crop_width]
+
+    with open(args.boundaries, 'rb') as f:
+        boundaries_sha256 = hashlib.sha256(f.read()).hexdigest()
+    np.savez_compressed(
+        args.output,
+        product=np.array(PRODUCT),
+        districts=np.array(districts['District'].tolist()),
+        class_values=np.array(CLASS_VALUES, dtype=np.uint8),
+        counts=counts,
+        raster=raster,
+        raster_transform=np.array([PIXEL_DEGREES, 0, crop_x, 0, -PIXEL_DEGREES, crop_y]),
+        boundaries_sha256=np.array(boundaries_sha256),
+    )
+    print(f"wrote {counts.sum():,} classified pixels for {len(districts)} districts and a "
+          f"{raster.shape[1]} x {raster.shape[0]} raster to {args.output}, "
+          f"{os.path.getsize(args.output) / 2 ** 20:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
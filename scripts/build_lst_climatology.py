@@ -0,0 +1,161 @@
+"""Build or update the daily MODIS LST climatology pack for the dashboard.
+
+For every district in ncr_districts.geojson and every day since March 2000,
+the script extracts the district's mean daytime land surface temperature
+from MODIS MOD11A1 and stores it in lst_climatology.npz next to app.py.
+The dashboard derives its normals from this daily record: for a date range,
+each district's mean over the same days of year in every other year.
+
+The first run downloads the full record. Later runs only fetch the days
+after the last stored one, so the pack can be kept current from a daily
+cron job:
+
+    python scripts/build_lst_climatology.py --key gee-service-account.json
+    python scripts/build_lst_climatology.py --rebuild --workers 8
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import ee
+import geopandas as gpd
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRODUCT = 'MODIS/061/MOD11A1'
+BAND = 'LST_Day_1km'
+FIRST_DATE = date(2000, 3, 1)
+SCALE = 1000
+# Days of year are positions in a leap year, so 29 February has its own slot
+# and 1 March is the same slot in every year
+DAYS = 366
+# A district-day counts only when this share of its pixels is cloud-free
+MIN_CLEAR_FRACTION = 0.3
+
+
+def initialize(key_path):
+    """Initialize Earth Engine from a service account key, or default credentials"""
+    if key_path:
+        with open(key_path, encoding='utf-8') as f:
+            email = json.load(f)['client_email']
+        ee.Initialize(ee.ServiceAccountCredentials(email, key_path))
+    else:
+        ee.Initialize()
+
+
+def day_of_year(day):
+    """Slot 0-365 of a date in a leap-year calendar"""
+    return (date(2000, day.month, day.day) - date(2000, 1, 1)).days
+
+
+def district_features(districts):
+    """Districts as an EE FeatureCollection with their name and expected pixel count"""
+    pixels = districts.geometry.to_crs('EPSG:6933').area / SCALE ** 2
+    return ee.FeatureCollection([
+        ee.Feature(ee.Geometry(geometry.__geo_interface__), {'District': name, 'pixels': float(count)})
+        for name, geometry, count in zip(districts['District'], districts.geometry.simplify(0.001), pixels)
+    ])
+
+
+def fetch_days(collection, start, end):
+    """(date, district, mean LST) for every clear-enough district-day in [start, end)"""
+    def per_image(image):
+        celsius = image.select(BAND).multiply(0.02).subtract(273.15)
+        stats = celsius.reduceRegions(
+            collection=collection,
+            reducer=ee.Reducer.mean().combine(ee.Reducer.count(), sharedInputs=True),
+            scale=SCALE,
+        )
+        return stats.map(lambda f: f.set('date', image.date().format('YYYY-MM-dd')))
+
+    images = ee.ImageCollection(PRODUCT).filterDate(start.isoformat(), end.isoformat())
+    for attempt in range(5):
+        try:
+            features = ee.FeatureCollection(images.map(per_image)).flatten().getInfo()['features']
+            break
+        except ee.EEException:
+            if attempt == 4:
+                raise
+            time.sleep(2 ** attempt)
+    rows = []
+    for feature in features:
+        props = feature['properties']
+        if props.get('mean') is not None and props.get('count', 0) >= MIN_CLEAR_FRACTION * props['pixels']:
+            rows.append((date.fromisoformat(props['date']), props['District'], props['mean']))
+    return rows
+
+
+def months(start, end):
+    """[start, end) split into calendar months, keeping each request under EE's collection limit"""
+    while start < end:
+        following = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        yield start, min(following, end)
+        start = following
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--key', help="Earth Engine service account key file")
+    parser.add_argument('--boundaries', default=os.path.join(ROOT, 'ncr_districts.geojson'))
+    parser.add_argument('--rebuild', action='store_true', help="download the full record even if a pack exists")
+    parser.add_argument('--until', type=date.fromisoformat, default=date.today() - timedelta(days=2),
+                        help="last day to include (MOD11A1 is published with a delay of a day or two)")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--output', default=os.path.join(ROOT, 'lst_climatology.npz'))
+    args = parser.parse_args()
+
+    initialize(args.key)
+    districts = gpd.read_file(args.boundaries).reset_index(drop=True)
+    with open(args.boundaries, 'rb') as f:
+        boundaries_sha256 = hashlib.sha256(f.read()).hexdigest()
+    names = districts['District'].tolist()
+    years = np.arange(FIRST_DATE.year, args.until.year + 1)
+
+    observations = np.full((len(names), len(years), DAYS), np.nan, dtype=np.float32)
+    start, last_date = FIRST_DATE, FIRST_DATE - timedelta(days=1)
+    if os.path.exists(args.output) and not args.rebuild:
+        with np.load(args.output, allow_pickle=False) as pack:
+            if str(pack['boundaries_sha256']) != boundaries_sha256:
+                parser.error(f"{args.boundaries} changed since the pack was built; run with --rebuild")
+            stored_years = pack['years']
+            observations[:, :len(stored_years)] = pack['observations']
+            last_date = date.fromisoformat(str(pack['last_date']))
+            start = last_date + timedelta(days=1)
+    if start > args.until:
+        print(f"{args.output} is up to date (last day {start - timedelta(days=1)})")
+        return
+
+    collection = district_features(districts)
+    jobs = list(months(start, args.until + timedelta(days=1)))
+    print(f"{len(names)} districts, fetching {start} to {args.until} in {len(jobs)} requests")
+    position = {name: i for i, name in enumerate(names)}
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for done, rows in enumerate(pool.map(lambda job: fetch_days(collection, *job), jobs), start=1):
+            for day, district, lst in rows:
+                slot = day_of_year(day)
+                observations[position[district], day.year - years[0], slot] = lst
+                last_date = max(last_date, day)
+            print(f"\r  {done}/{len(jobs)} months", end='', flush=True)
+    print()
+
+    np.savez_compressed(
+        args.output,
+        product=np.array(PRODUCT),
+        districts=np.array(names),
+        years=years,
+        observations=observations,
+        # Days not yet published, or clouded over everywhere, are fetched again next time
+        last_date=np.array(last_date.isoformat()),
+        boundaries_sha256=np.array(boundaries_sha256),
+    )
+    print(f"wrote {np.isfinite(observations).sum():,} district-days to {args.output}, "
+          f"{os.path.getsize(args.output) / 2 ** 20:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()